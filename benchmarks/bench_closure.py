@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the ancestor and descendant sets of a Gene Ontology graph. Reports the time taken by
+:func:`gocats.dag.OboGraph.compute_closure` to compute the transitive closure of the whole graph, the time taken to read
+every node's ancestors and descendants from the closure, and the time taken to evaluate them lazily node by node
+without it. The sets read from the closure are compared to the lazily evaluated sets. Also reports the time taken to
+build the reachability index of :func:`gocats.dag.OboGraph.is_ancestor` and to answer random is-ancestor queries with
+it, and the size of the index in intervals compared with the number of members in every node's descendant set.
+Finally, random edges are removed from the graph and restored one at a time, and the ancestors and descendants of their
+nodes requested after each change, to time the re-evaluation of only the sets which the change made out of date.
+
+Usage:
+    bench_closure.py <database_file> [--repeat=<n> --queries=<n> --edits=<n> --supergraph_namespace=<namespace> --allowed_relationships=<relationships>]
+    bench_closure.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    --repeat=<n>                             Number of timed runs of each method; the fastest is reported. [default: 3]
+    --queries=<n>                            Number of random is-ancestor queries. [default: 100000]
+    --edits=<n>                              Number of edges removed and restored. [default: 100]
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+"""
+import os
+import random
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser
+
+
+def reset_nodes(graph):
+    """Discards the graph's closure and every node's cached ancestor and descendant sets.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    graph._discard_indexes()
+    for node in graph.node_list:
+        node._descendants = node._ancestors = None
+        node._descendants_closure = node._ancestors_closure = None
+
+
+def node_sets(graph):
+    """Requests the ancestor and descendant sets of every node in the graph.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object.
+    :return: A :py:obj:`list` of (ancestors, descendants) :py:obj:`tuple` entries in the order of the graph's node list.
+    :rtype: :py:obj:`list`
+    """
+    return [(node.ancestors, node.descendants) for node in graph.node_list]
+
+
+def main(args):
+    database_file = args['<database_file>']
+    repeat = int(args['--repeat'])
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    print("{}: {} nodes, namespace filter: {}, allowed relationships: {}".format(database_file, len(graph.node_list), namespace, allowed_relationships))
+
+    lazy_time = closure_time = read_time = None
+    for _ in range(repeat):
+        reset_nodes(graph)
+        start = time.perf_counter()
+        lazy_sets = node_sets(graph)
+        elapsed = time.perf_counter() - start
+        lazy_time = elapsed if lazy_time is None else min(lazy_time, elapsed)
+
+        reset_nodes(graph)
+        start = time.perf_counter()
+        graph.compute_closure()
+        computed = time.perf_counter()
+        closure_sets = node_sets(graph)
+        read = time.perf_counter()
+        closure_time = computed - start if closure_time is None else min(closure_time, computed - start)
+        read_time = read - computed if read_time is None else min(read_time, read - computed)
+
+    print("{:<28}{:>12}".format("method", "seconds"))
+    print("{:<28}{:>12.3f}".format("lazy, per node", lazy_time))
+    print("{:<28}{:>12.3f}".format("compute_closure", closure_time))
+    print("{:<28}{:>12.3f}".format("read from closure", read_time))
+    print("identical: {}".format(closure_sets == lazy_sets))
+
+    query_count = int(args['--queries'])
+    random.seed(0)
+    query_pairs = [(random.choice(graph.node_list), random.choice(graph.node_list)) for _ in range(query_count)]
+    index_time = query_time = None
+    for _ in range(repeat):
+        graph._discard_indexes()
+        start = time.perf_counter()
+        graph.is_ancestor(graph.node_list[0], graph.node_list[0])
+        built = time.perf_counter()
+        answers = [graph.is_ancestor(ancestor_node, node) for ancestor_node, node in query_pairs]
+        answered = time.perf_counter()
+        index_time = built - start if index_time is None else min(index_time, built - start)
+        query_time = answered - built if query_time is None else min(query_time, answered - built)
+    index = graph.reachability_index
+    print("{:<28}{:>12.3f}".format("reachability index", index_time))
+    print("{:<28}{:>12.3f}".format("{:,} is_ancestor queries".format(query_count), query_time))
+    print("identical: {}".format(answers == [ancestor_node in node.ancestors for ancestor_node, node in query_pairs]))
+    print("index intervals: {:,}, descendant set members: {:,}".format(sum(len(starts) for starts in index.interval_starts.values()),
+                                                                        sum(len(descendants) for _, descendants in closure_sets)))
+
+    # Every node's sets are up to date here, so each change re-evaluates only the sets above and below its edge.
+    edit_count = int(args['--edits'])
+    edited_edges = random.sample(graph.edge_list, min(edit_count, len(graph.edge_list)))
+    start = time.perf_counter()
+    for edge in edited_edges:
+        graph.remove_edge(edge)
+        edge.child_node.ancestors, edge.parent_node.descendants
+        edge.connect_nodes(edge.node_pair, graph.allowed_relationships)
+        graph.add_edge(edge)
+        edge.child_node.ancestors, edge.parent_node.descendants
+    edit_time = time.perf_counter() - start
+    print("{:<28}{:>12.3f}".format("{:,} edits and queries".format(2 * len(edited_edges)), edit_time))
+    print("identical: {}".format(node_sets(graph) == closure_sets))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
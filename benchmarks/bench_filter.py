@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the selection of the nodes which seed subgraphs. For each row of a keyword file, reports the number of nodes
+selected by :func:`gocats.dag.OboGraph.filter_nodes` when keywords are matched as separate words and when they are
+matched as phrases, and the total time taken by each, including the time taken to build the postings index used for
+phrases.
+
+Usage:
+    bench_filter.py <database_file> <keyword_file> [--repeat=<n> --supergraph_namespace=<namespace> --allowed_relationships=<relationships>]
+    bench_filter.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    <keyword_file>                           GO term keywords used to create subgraphs, as given to create_subgraphs.
+    --repeat=<n>                             Number of timed runs of each method; the fastest is reported. [default: 3]
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+"""
+import csv
+import os
+import re
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser
+
+
+def filter_rows(graph, keyword_rows, match_phrases):
+    """Selects the seed nodes of every keyword row, as :func:`gocats.subdag.SubGraph.from_filtered_graph` does.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object.
+    :param keyword_rows: A :py:obj:`list` of (category name, keyword list) :py:obj:`tuple` entries.
+    :param bool match_phrases: Whether keywords are matched as phrases.
+    :return: A :py:obj:`list` of the number of nodes selected for each row.
+    :rtype: :py:obj:`list`
+    """
+    return [len(graph.filter_nodes([keyword.lower() for keyword in keyword_list], match_phrases)) for _, keyword_list in keyword_rows]
+
+
+def main(args):
+    database_file = args['<database_file>']
+    repeat = int(args['--repeat'])
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    with open(args['<keyword_file>'], newline='') as keyword_file:
+        keyword_rows = [(row[0], re.split(';', row[1])) for row in csv.reader(keyword_file, delimiter=',', quoting=csv.QUOTE_MINIMAL)]
+    print("{}: {} nodes, {} keyword rows".format(database_file, len(graph.node_list), len(keyword_rows)))
+
+    word_time = phrase_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        word_sizes = filter_rows(graph, keyword_rows, False)
+        elapsed = time.perf_counter() - start
+        word_time = elapsed if word_time is None else min(word_time, elapsed)
+
+        graph._postings_index = None
+        start = time.perf_counter()
+        phrase_sizes = filter_rows(graph, keyword_rows, True)
+        elapsed = time.perf_counter() - start
+        phrase_time = elapsed if phrase_time is None else min(phrase_time, elapsed)
+
+    print("{:<28}{:>12}{:>12}".format("category", "words", "phrases"))
+    for (name, _), word_size, phrase_size in zip(keyword_rows, word_sizes, phrase_sizes):
+        print("{:<28}{:>12,}{:>12,}".format(name, word_size, phrase_size))
+    print("{:<28}{:>12.3f}{:>12.3f}".format("seconds", word_time, phrase_time))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the memory used by a Gene Ontology graph. Reports the memory allocated while parsing the database file,
+and for each node, edge and relationship class the number of objects in the graph and their size in bytes, compared
+with the size the same objects would have if they stored their attributes in a per-instance dictionary instead of
+slots. Subgraph nodes are included when a keyword file is given.
+
+Usage:
+    bench_memory.py <database_file> [<keyword_file>] [--supergraph_namespace=<namespace> --allowed_relationships=<relationships>]
+    bench_memory.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    <keyword_file>                           GO term keywords used to create subgraphs, as given to create_subgraphs.
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+"""
+import csv
+import os
+import re
+import sys
+import tracemalloc
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser, subdag
+
+
+def slot_names(obj):
+    """Returns the names of all slots of an object's class and its base classes, except those which a subclass
+    replaced with a property.
+
+    :param obj: A slotted object.
+    :return: A :py:obj:`list` of slot names.
+    :rtype: :py:obj:`list`
+    """
+    names = [name for cls in type(obj).__mro__ for name in cls.__dict__.get('__slots__', ())]
+    return [name for name in names if not isinstance(getattr(type(obj), name), property)]  # e.g. SubGraphNode.id
+
+
+def object_sizes(objects):
+    """Measures the size of objects, as they are and with their attributes copied into a per-instance dictionary.
+    Only the objects themselves are measured, not the sets and strings they reference, which are the same either way.
+
+    :param list objects: Objects of one class.
+    :return: The total size in bytes of the objects, and of their dictionary-based equivalents.
+    :rtype: :py:obj:`tuple`
+    """
+    # A new stand-in class for each measured class lets its instances share dictionary keys, as instances of one class do.
+    dict_class = type('DictObject', (object,), {})
+    slotted_size = 0
+    dict_size = 0
+    for obj in objects:
+        slotted_size += sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+        equivalent = dict_class()
+        for name in slot_names(obj):
+            if hasattr(obj, name):
+                setattr(equivalent, name, getattr(obj, name))
+        dict_size += sys.getsizeof(equivalent) + sys.getsizeof(equivalent.__dict__)
+    return slotted_size, dict_size
+
+
+def main(args):
+    database_file = args['<database_file>']
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    tracemalloc.start()
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    graph_memory, graph_peak = tracemalloc.get_traced_memory()
+    subgraphs = list()
+    if args['<keyword_file>']:
+        with open(args['<keyword_file>'], newline='') as keyword_file:
+            for row in csv.reader(keyword_file, delimiter=',', quoting=csv.QUOTE_MINIMAL):
+                subgraphs.append(subdag.SubGraph.from_filtered_graph(graph, row[0], re.split(';', row[1]), namespace))
+    total_memory, total_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("{}: namespace filter: {}, allowed relationships: {}".format(database_file, namespace, allowed_relationships))
+    print("graph: {:,.1f} MB allocated ({:,.1f} MB peak while parsing)".format(graph_memory / 2**20, graph_peak / 2**20))
+    if subgraphs:
+        print("graph and {} subgraphs: {:,.1f} MB allocated".format(len(subgraphs), total_memory / 2**20))
+    print("{:<26}{:>10}{:>14}{:>14}{:>14}".format("class", "objects", "bytes/object", "with __dict__", "saved (MB)"))
+    object_groups = [('GoGraphNode', graph.node_list), ('AbstractEdge', graph.edge_list),
+                     ('DirectionalRelationship', list(graph.relationship_index.values()))]
+    if subgraphs:
+        object_groups.append(('SubGraphNode', [node for subgraph in subgraphs for node in subgraph.node_list if type(node) is subdag.SubGraphNode]))
+    for class_name, objects in object_groups:
+        slotted_size, dict_size = object_sizes(objects)
+        count = max(len(objects), 1)
+        print("{:<26}{:>10,}{:>14.0f}{:>14.0f}{:>14.2f}".format(class_name, len(objects), slotted_size / count, dict_size / count, (dict_size - slotted_size) / 2**20))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the parsing engines of :class:`gocats.ontologyparser.GoParser` on a Gene Ontology database file and reports
+parse throughput in lines per second. Graphs built by every engine are compared to the graph built by the first engine
+listed. When the same release is also given in the OBO Graphs JSON format, it is parsed by
+:class:`gocats.ontologyparser.GoJsonParser` and compared in the same way, although in any order and without term
+definitions, which the OBO engines end at the first escaped quotation mark.
+
+Usage:
+    bench_parse.py <database_file> [--engines=<engines> --repeat=<n> --jobs=<n> --supergraph_namespace=<namespace> --allowed_relationships=<relationships> --json_file=<file>]
+    bench_parse.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    --engines=<engines>                      Comma separated parsing engines to benchmark. [default: regex,dispatch,mmap]
+    --repeat=<n>                             Number of timed parses for each engine; the fastest is reported. [default: 3]
+    --jobs=<n>                               Comma separated worker process counts to benchmark the mmap engine with. [default: 1]
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+    --json_file=<file>                       The same release in the OBO Graphs JSON format (go.json), to benchmark against the OBO engines.
+"""
+import os
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser
+
+
+def graph_contents(graph):
+    """Summarizes the contents of a graph so that graphs built by different engines can be compared.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object.
+    :return: A :py:obj:`tuple` of node, edge and root node descriptions.
+    :rtype: :py:obj:`tuple`
+    """
+    nodes = [(node.id, node.name, node.namespace, node.definition, node.obsolete) for node in graph.node_list]
+    edges = [(edge.node_pair_id, edge.relationship_id) for edge in graph.edge_list]
+    roots = [node.id for node in graph.root_nodes]
+    return nodes, edges, roots
+
+
+def unordered_contents(graph):
+    """Summarizes the contents of a graph as :func:`graph_contents` does, but sorted and without term definitions, so
+    that graphs parsed from different formats can be compared.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object.
+    :return: A :py:obj:`tuple` of sorted node, edge and root node descriptions.
+    :rtype: :py:obj:`tuple`
+    """
+    nodes = sorted((node.id, node.name, node.namespace, node.obsolete) for node in graph.node_list)
+    edges = sorted((edge.node_pair_id, edge.relationship_id, edge.relationship.direction) for edge in graph.edge_list)
+    roots = sorted(node.id for node in graph.root_nodes)
+    return nodes, edges, roots
+
+
+def time_engine(database_file, engine, jobs, namespace, allowed_relationships, repeat):
+    """Parses the database file `repeat` times with the given engine and number of jobs.
+
+    :return: The fastest parse time in seconds and the graph built by the final parse.
+    :rtype: :py:obj:`tuple`
+    """
+    best_time = None
+    for _ in range(repeat):
+        graph = godag.GoGraph(namespace, list(allowed_relationships) if allowed_relationships else None)
+        with open(database_file, 'r') as database:
+            start = time.perf_counter()
+            if engine == 'json':
+                ontologyparser.GoJsonParser(database, graph).parse()
+            else:
+                ontologyparser.GoParser(database, graph, engine=engine, jobs=jobs).parse()
+            elapsed = time.perf_counter() - start
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    return best_time, graph
+
+
+def main(args):
+    database_file = args['<database_file>']
+    engines = args['--engines'].split(",")
+    job_counts = [int(jobs) for jobs in args['--jobs'].split(",")]
+    repeat = int(args['--repeat'])
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    with open(database_file, 'r') as database:
+        line_count = sum(1 for _ in database)
+    print("{}: {} lines, namespace filter: {}, allowed relationships: {}".format(database_file, line_count, namespace, allowed_relationships))
+    print("{:<12}{:>6}{:>12}{:>16}{:>10}{:>12}".format("engine", "jobs", "seconds", "lines/s", "speedup", "identical"))
+
+    reference = None
+    reference_time = None
+    unordered_reference = None
+    for engine in engines:
+        for jobs in (job_counts if engine == 'mmap' else [1]):
+            elapsed, graph = time_engine(database_file, engine, jobs, namespace, allowed_relationships, repeat)
+            contents = graph_contents(graph)
+            if reference is None:
+                reference = contents
+                reference_time = elapsed
+            print("{:<12}{:>6}{:>12.3f}{:>16,.0f}{:>9.2f}x{:>12}".format(engine, jobs, elapsed, line_count / elapsed, reference_time / elapsed, str(contents == reference)))
+            if unordered_reference is None:
+                unordered_reference = unordered_contents(graph)
+
+    if args['--json_file']:
+        # Throughput is given in lines of the OBO file, so that it compares directly with the OBO engines.
+        elapsed, graph = time_engine(args['--json_file'], 'json', 1, namespace, allowed_relationships, repeat)
+        identical = unordered_contents(graph) == unordered_reference
+        print("{:<12}{:>6}{:>12.3f}{:>16,.0f}{:>9.2f}x{:>12}".format('json', 1, elapsed, line_count / elapsed, reference_time / elapsed, str(identical)))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
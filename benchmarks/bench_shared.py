@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the start of worker processes which need the ontology graph. Reports the time taken by a pool of workers to
+each parse the ontology and find the ancestors of a share of the terms, and the time taken when the graph is exported
+once with :func:`gocats.sharedgraph.export_graph` and each worker attaches to it with
+:func:`gocats.sharedgraph.attach_graph` instead, including the export.
+
+Usage:
+    bench_shared.py <database_file> [--workers=<n> --supergraph_namespace=<namespace> --allowed_relationships=<relationships>]
+    bench_shared.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    --workers=<n>                            Number of worker processes. [default: 4]
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+"""
+import multiprocessing
+import os
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser, sharedgraph
+
+
+def parse(database_file, namespace, allowed_relationships):
+    """Parses the ontology into a graph.
+
+    :param database_file: GO term database (go.obo).
+    :param str namespace: The namespace filter of the graph.
+    :param list allowed_relationships: The relationships of the graph, or :py:obj:`None` for all of them.
+    :return: A :class:`gocats.godag.GoGraph` object.
+    :rtype: :class:`gocats.godag.GoGraph`
+    """
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    return graph
+
+
+def parsing_worker(arguments):
+    """Parses the ontology and counts the ancestors of every `step`-th term, starting at `start`.
+
+    :param tuple arguments: The database file, namespace, allowed relationships, start and step.
+    :return: The number of ancestors.
+    :rtype: :py:obj:`int`
+    """
+    database_file, namespace, allowed_relationships, start, step = arguments
+    graph = parse(database_file, namespace, allowed_relationships)
+    return sum(len(node.ancestors) for node in graph.node_list[start::step])
+
+
+def attaching_worker(arguments):
+    """Attaches to the shared graph and counts the ancestors of every `step`-th term, starting at `start`.
+
+    :param tuple arguments: The name of the shared graph, start and step.
+    :return: The number of ancestors.
+    :rtype: :py:obj:`int`
+    """
+    name, start, step = arguments
+    with sharedgraph.attach_graph(name) as shared:
+        return sum(len(shared.ancestors(position)) for position in range(start, len(shared), step))
+
+
+def main(args):
+    database_file = args['<database_file>']
+    workers = int(args['--workers'])
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    with multiprocessing.Pool(workers) as pool:
+        start = time.perf_counter()
+        parsed_count = sum(pool.map(parsing_worker, [(database_file, namespace, allowed_relationships, worker, workers) for worker in range(workers)]))
+        print("{:<28}{:>12.3f}".format("each worker parses", time.perf_counter() - start))
+
+        graph = parse(database_file, namespace, allowed_relationships)
+        start = time.perf_counter()
+        with sharedgraph.export_graph(graph) as shared:
+            export_time = time.perf_counter() - start
+            shared_count = sum(pool.map(attaching_worker, [(shared.name, worker, workers) for worker in range(workers)]))
+            print("{:<28}{:>12.3f}".format("export, workers attach", time.perf_counter() - start))
+            print("{:<28}{:>12.3f}".format("export", export_time))
+    print("{:,} terms, {:,} ancestors ({:,} shared)".format(len(graph.node_list), parsed_count, shared_count))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
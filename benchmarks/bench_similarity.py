@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the semantic similarity of Gene Ontology terms and of the genes of a Gene Annotation File (GAF). Reports the
+time taken to count the genes annotated to every term with :func:`gocats.similarity.gaf_information_content`, to build a
+:class:`gocats.similarity.SemanticSimilarity` from the counts, to compare random pairs of terms by each measure, and to
+compare every pair of the first genes of the GAF by best-match average.
+
+Usage:
+    bench_similarity.py <database_file> <gaf_file> [--pairs=<n> --genes=<n> --supergraph_namespace=<namespace> --allowed_relationships=<relationships>]
+    bench_similarity.py (-h | --help)
+
+Options:
+    -h --help                                Shows this screen.
+    <database_file>                          GO term database (go.obo).
+    <gaf_file>                               Gene annotation format file.
+    --pairs=<n>                              Number of random term pairs. [default: 100000]
+    --genes=<n>                              Number of genes compared pairwise. [default: 1000]
+    --supergraph_namespace=<namespace>       Filters the graph to a given namespace.
+    --allowed_relationships=<relationships>  Comma separated relationship types allowed in the graph.
+"""
+import collections
+import os
+import random
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser, tools
+from gocats.similarity import MEASURES, SemanticSimilarity, gaf_information_content
+
+
+def main(args):
+    database_file = args['<database_file>']
+    namespace = args['--supergraph_namespace']
+    allowed_relationships = args['--allowed_relationships'].split(",") if args['--allowed_relationships'] else None
+
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    graph.compute_closure()
+    gaf = tools.parse_gaf(args['<gaf_file>'])
+    gene_terms = collections.OrderedDict()
+    for line in gaf:
+        gene_terms.setdefault(line[1], set()).add(line[4])
+    print("{}: {} nodes, {} genes, {} annotations".format(database_file, len(graph.node_list), len(gene_terms), len(gaf)))
+
+    start = time.perf_counter()
+    information = gaf_information_content(graph, gaf)
+    print("{:<28}{:>12.3f}".format("information content", time.perf_counter() - start))
+    start = time.perf_counter()
+    similarity = SemanticSimilarity(graph, dict(zip(information.term_ids, information.annotation_counts)), propagated=True)
+    print("{:<28}{:>12.3f}".format("build", time.perf_counter() - start))
+
+    random.seed(0)
+    term_ids = [node.id for node in graph.node_list]
+    term_pairs = [(random.choice(term_ids), random.choice(term_ids)) for _ in range(int(args['--pairs']))]
+    for measure in MEASURES:
+        start = time.perf_counter()
+        similarity.term_similarity(term_pairs, measure)
+        print("{:<28}{:>12.3f}".format("{:,} pairs, {}".format(len(term_pairs), measure), time.perf_counter() - start))
+
+    genes = list(gene_terms)[:int(args['--genes'])]
+    start = time.perf_counter()
+    similarity.gene_similarity_matrix({gene: gene_terms[gene] for gene in genes})
+    print("{:<28}{:>12.3f}".format("{:,} genes, all pairs".format(len(genes)), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the comparison of relationship configurations, e.g. is_a only, is_a and part_of, and is_a, part_of and
+has_part. Reports the time taken to parse the ontology once for each configuration and compute the transitive closure
+of each graph, and the time taken to parse it once with every relationship and compute the closure of a
+:class:`gocats.dag.RelationshipView` for each configuration, with the mean number of ancestors of a term in each.
+
+Usage:
+    bench_views.py <database_file> [--configurations=<configurations> --supergraph_namespace=<namespace>]
+    bench_views.py (-h | --help)
+
+Options:
+    -h --help                            Shows this screen.
+    <database_file>                      GO term database (go.obo).
+    --configurations=<configurations>    Semicolon separated relationship configurations, each comma separated. [default: is_a;is_a,part_of;is_a,part_of,has_part]
+    --supergraph_namespace=<namespace>   Filters the graph to a given namespace.
+"""
+import os
+import sys
+import time
+import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gocats import godag, ontologyparser
+
+
+def parse(database_file, namespace, allowed_relationships):
+    """Parses the ontology into a graph with the given relationships.
+
+    :param database_file: GO term database (go.obo).
+    :param str namespace: The namespace filter of the graph.
+    :param list allowed_relationships: The relationships of the graph, or :py:obj:`None` for all of them.
+    :return: A :class:`gocats.godag.GoGraph` object.
+    :rtype: :class:`gocats.godag.GoGraph`
+    """
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        ontologyparser.GoParser(database, graph, engine='mmap').parse()
+    return graph
+
+
+def mean_ancestors(closure):
+    """Returns the mean number of ancestors of the nodes of a transitive closure.
+
+    :param closure: A :class:`gocats.dag.TransitiveClosure`.
+    :return: The mean number of ancestors.
+    :rtype: :py:obj:`float`
+    """
+    return sum(bin(bits).count('1') for bits in closure.ancestor_bits) / max(1, len(closure.node_list))
+
+
+def main(args):
+    database_file = args['<database_file>']
+    namespace = args['--supergraph_namespace']
+    configurations = [configuration.split(",") for configuration in args['--configurations'].split(";")]
+
+    print("{:<28}{:>12}{:>12}".format("configuration", "seconds", "ancestors"))
+    start = time.perf_counter()
+    for configuration in configurations:
+        closure = parse(database_file, namespace, list(configuration)).compute_closure()
+        print("{:<28}{:>12}{:>12.2f}".format(",".join(configuration), "", mean_ancestors(closure)))
+    print("{:<28}{:>12.3f}".format("one parse per configuration", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    graph = parse(database_file, namespace, None)
+    for configuration in configurations:
+        closure = graph.relationship_view(configuration).closure
+        print("{:<28}{:>12}{:>12.2f}".format(",".join(configuration), "", mean_ancestors(closure)))
+    print("{:<28}{:>12.3f}".format("one parse, views", time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(docopt.docopt(__doc__))
@@ -10,9 +10,9 @@ for evaluating those subgraphs.
 Command line implementation::
 
     Usage:
-        gocats create_subgraphs <database_file> <keyword_file> <output_directory> [--supergraph_namespace=<namespace> --subgraph_namespace=<namespace> --supergraph_relationships=<relationships> --subgraph_relationships=<relationships> --network_table_name=<name> --map_supersets --output_termlist --go_basic_scoping --test]
+        gocats create_subgraphs <database_file> <keyword_file> <output_directory> [--supergraph_namespace=<namespace> --subgraph_namespace=<namespace> --supergraph_relationships=<relationships> --subgraph_relationships=<relationships> --network_table_name=<name> --jobs=<n> --cache_dir=<directory> --map_supersets --match_phrases --output_termlist --go_basic_scoping --test]
         gocats categorize_dataset <dataset_file> <term_mapping> <output_directory> <mapped_dataset_filename> [--dataset_type=<GAF> --entity_col=<entity> --go_col=<go> --retain_unmapped_annotations]
-        gocats remap_goterms <go_database> <goa_gaf> <ancestor_filename> <namespace_filename> [--allowed_relationships=<relationships> --identifier_column=<column>]
+        gocats remap_goterms <go_database> <goa_gaf> <ancestor_filename> <namespace_filename> [--allowed_relationships=<relationships> --identifier_column=<column> --jobs=<n> --cache_dir=<directory>]
         gocats (-h | --help)
         gocats --version
 
@@ -26,8 +26,9 @@ Command line implementation::
         --subgraph_namespace=<namespace>            Filters the subgraph to a given namespace.
         --supergraph_relationships=<relationships>  Comma separated relationship types defining which allowed in the supergraph. [default: is_a,part_of,has_part]
         --subgraph_relationships=<relationships>    Comma separated relationship types denote which relationships are allowed in the subgraph. [default: is_a,part_of,has_part]
-        --network_table_name=<name>                 Custom name for the output NetworkTable.csv to be used with Cytoscape. [default: NetworkTable.csv]
+        --network_table_name=<name>                 Custom name for the output Network_table.csv to be used with Cytoscape. [default: Network_table.csv]
         --map_supersets                             Maps all terms to all root nodes, regardless of if a root node subsumes another.
+        --match_phrases                             Seeds subgraphs with the terms containing each keyword as a phrase, instead of any of its words.
         --output_termlist                           Outputs a list of all terms in the supergraph as a JsonPickle file in the output directory.
         --go_basic_scoping                          Creates a GO graph similar to go-basic with only scoping-type relationships (is_a and part_of). WARNING, this supersedes relationship definitions.
         <dataset_file>                              A GO dataset file.
@@ -43,6 +44,8 @@ Command line implementation::
         <namespace_filename>                        Where to save the JSONized GO Term to namespace relationships to
         --allowed_relationships=<relationships>     Comma separated string of term-to-term relationships to allow [default: is_a,part_of,has_part]
         --identifier_column=<column>                Which column has the gene identifiers [default: 1]
+        --jobs=<n>                                  Number of worker processes used to parse the ontology. [default: 1]
+        --cache_dir=<directory>                     Directory of compiled ontology graphs. The graph is loaded from here if the same ontology file was parsed with the same settings before, and saved here otherwise.
         --test                                      Outputs json files to compare versions of GOcats.
 """
 
@@ -76,6 +79,10 @@ def main(args):
             map_supersets = True
         else:
             map_supersets = False
+        if args['--match_phrases']:
+            match_phrases = True
+        else:
+            match_phrases = False
         if args['--output_termlist']:
             output_termlist = True
         else:
@@ -86,8 +93,14 @@ def main(args):
             go_basic_scoping = False
         if args['--test']:
             test = True
-        
-        gocats.create_subgraphs(database_file, keyword_file, output_directory, supergraph_namespace=None, subgraph_namespace=None, supergraph_relationships=['is_a', 'part_of', 'has_part'], subgraph_relationships=['is_a', 'part_of', 'has_part'], map_supersets=False, output_termlist=False, go_basic_scoping=False, network_table_name=None, test=False)
+        else:
+            test = False
+        if args['--jobs']:
+            jobs = int(args['--jobs'])
+        else:
+            jobs = 1
+
+        gocats.create_subgraphs(database_file, keyword_file, output_directory, supergraph_namespace=supergraph_namespace, subgraph_namespace=subgraph_namespace, supergraph_relationships=supergraph_relationships, subgraph_relationships=subgraph_relationships, map_supersets=map_supersets, match_phrases=match_phrases, output_termlist=output_termlist, go_basic_scoping=go_basic_scoping, network_table_name=args['--network_table_name'], test=test, jobs=jobs, cache_dir=args['--cache_dir'])
 
     elif args['categorize_dataset']:
       
@@ -128,8 +141,12 @@ def main(args):
             identifier_column = int(args['--identifier_column'])
         else:
             identifier_column = 1
+        if args['--jobs']:
+            jobs = int(args['--jobs'])
+        else:
+            jobs = 1
 
-        gocats.remap_goterms(go_database, goa_gaf, ancestor_filename, namespace_filename, allowed_relationships, identifier_column)
+        gocats.remap_goterms(go_database, goa_gaf, ancestor_filename, namespace_filename, allowed_relationships, identifier_column, jobs, args['--cache_dir'])
 
 if __name__ == '__main__':
     args = docopt.docopt(__doc__, help=True, version=str('GOcats Version ') + __version__)
@@ -0,0 +1,198 @@
+# !/usr/bin/python3
+"""
+An array representation of the topology of a :class:`gocats.dag.OboGraph`. Every node is given a dense integer index
+(its position in the graph's node list), and the parent and child node sets of all nodes are stored as NumPy arrays in
+compressed sparse row (CSR) form, with a parallel array of relationship codes. Traversals such as ancestor, descendant
+and depth searches then expand a whole frontier of nodes with a few array operations instead of visiting node objects
+one at a time.
+
+The arrays are a snapshot of the graph when they were built; node and edge objects remain the graph's primary
+representation. NumPy is an optional dependency of GOcats (``pip install gocats[numpy]``), needed only by this module.
+"""
+from operator import attrgetter
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; CsrGraph reports its absence when used.
+    numpy = None
+
+
+class CsrGraph(object):
+
+    """Parent and child adjacency of a graph's nodes in compressed sparse row form. The parents of the node at index `i`
+    are ``parent_indices[parent_indptr[i]:parent_indptr[i + 1]]``, and ``parent_relationships`` holds, for each of them, a
+    bit mask of the relationships linking the two nodes: bit `r` is set if the relationship ``relationship_ids[r]``
+    links them. Children are stored in the same way.
+    """
+
+    def __init__(self, graph):
+        """`CsrGraph` initializer. Builds the arrays from the parent and child node sets of the graph's nodes, and the
+        relationship codes from the graph's edges.
+
+        :param graph: A :class:`gocats.dag.OboGraph` object, e.g. a :class:`gocats.godag.GoGraph` or :class:`gocats.subdag.SubGraph`.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if numpy is None:
+            raise Exception("NumPy is required for the array graph backend.\nPlease install it, e.g. with: pip install gocats[numpy]")
+        self.node_list = list(graph.node_list)
+        self.node_position = {node: position for position, node in enumerate(self.node_list)}
+        id_position = {node.id: position for position, node in enumerate(self.node_list)}
+
+        # Edges of subgraphs reference supergraph nodes, so edge endpoints are matched to graph nodes by ID.
+        self.relationship_ids = sorted(set(edge.relationship_id for edge in graph.edge_list))
+        relationship_codes = {relationship_id: code for code, relationship_id in enumerate(self.relationship_ids)}
+        pair_relationships = dict()
+        edge_parents = list()
+        edge_children = list()
+        for edge in graph.edge_list:
+            if edge.relationship is None or edge.node_pair is None:  # Never connected to nodes.
+                edge_parents.append(-1)
+                edge_children.append(-1)
+                continue
+            direction = edge.relationship.direction
+            parent_node, child_node = edge.node_pair[direction], edge.node_pair[1 - direction]
+            pair = (id_position.get(child_node.id, -1), id_position.get(parent_node.id, -1))
+            edge_children.append(pair[0])
+            edge_parents.append(pair[1])
+            if -1 not in pair:
+                pair_relationships[pair] = pair_relationships.get(pair, 0) | 1 << relationship_codes[edge.relationship_id]
+        self.edge_list = list(graph.edge_list)
+        self.edge_parents = numpy.array(edge_parents, dtype=numpy.int64)
+        self.edge_children = numpy.array(edge_children, dtype=numpy.int64)
+        self.edge_relationships = numpy.array([relationship_codes[edge.relationship_id] for edge in self.edge_list], dtype=numpy.int64)
+
+        node_position = self.node_position
+        parent_lists = [[node_position[parent] for parent in node.parent_node_set if parent in node_position] for node in self.node_list]
+        child_lists = [[node_position[child] for child in node.child_node_set if child in node_position] for node in self.node_list]
+        self.parent_indptr, self.parent_indices = _csr_arrays(parent_lists)
+        self.child_indptr, self.child_indices = _csr_arrays(child_lists)
+        self.parent_relationships = numpy.array([pair_relationships.get((child, parent), 0) for child, parents in enumerate(parent_lists) for parent in parents], dtype=numpy.int64)
+        self.child_relationships = numpy.array([pair_relationships.get((child, parent), 0) for parent, children in enumerate(child_lists) for child in children], dtype=numpy.int64)
+        self.root_mask = numpy.zeros(len(self.node_list), dtype=bool)
+        self.root_mask[[self.node_position[node] for node in graph.root_nodes if node in self.node_position]] = True
+
+    def __len__(self):
+        return len(self.node_list)
+
+    def ancestor_indices(self, position):
+        """Returns the indices of all nodes reachable from a node through parent node sets.
+
+        :param int position: The index of the node.
+        :return: A sorted array of node indices.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._reachable(self.parent_indptr, self.parent_indices, position)
+
+    def descendant_indices(self, position):
+        """Returns the indices of all nodes reachable from a node through child node sets.
+
+        :param int position: The index of the node.
+        :return: A sorted array of node indices.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._reachable(self.child_indptr, self.child_indices, position)
+
+    def ancestors(self, node):
+        """Returns the ancestors of a node, as :py:attr:`gocats.dag.AbstractNode.ancestors` does.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return set(self.node_list[position] for position in self.ancestor_indices(self.node_position[node]).tolist())
+
+    def descendants(self, node):
+        """Returns the descendants of a node, as :py:attr:`gocats.dag.AbstractNode.descendants` does.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return set(self.node_list[position] for position in self.descendant_indices(self.node_position[node]).tolist())
+
+    def node_depth(self, node):
+        """Returns the depth of a node as :func:`gocats.dag.OboGraph.node_depth` does: 0 for a root node, otherwise the
+        number of parent levels searched before one of them contains a root node (or no parents remain).
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Depth level.
+        :rtype: :py:obj:`int`
+        """
+        position = self.node_position[node]
+        if self.root_mask[position]:
+            return 0
+        depth = 1
+        frontier = self.parent_indices[self.parent_indptr[position]:self.parent_indptr[position + 1]]
+        while frontier.size:
+            if self.root_mask[frontier].any():
+                break
+            depth += 1
+            frontier = numpy.unique(_gather(self.parent_indptr, self.parent_indices, frontier))
+        return depth
+
+    def filter_edges(self, filtered_nodes, allowed_relationships=None):
+        """Returns the edges whose parent and child nodes are both among the filtered nodes, as
+        :func:`gocats.dag.OboGraph.filter_edges` does.
+
+        :param filtered_nodes: An iterable of :class:`gocats.dag.AbstractNode` objects.
+        :param list allowed_relationships: Optional - Only edges of these relationships are returned.
+        :return: A list of :class:`gocats.dag.AbstractEdge` objects, sorted by their index_key.
+        :rtype: :py:obj:`list`
+        """
+        node_mask = numpy.zeros(len(self.node_list) + 1, dtype=bool)  # Index -1, the last entry, marks nodes outside the graph.
+        node_mask[[self.node_position[node] for node in filtered_nodes if node in self.node_position]] = True
+        edge_mask = node_mask[self.edge_parents] & node_mask[self.edge_children]
+        if allowed_relationships:
+            allowed_codes = [code for code, relationship_id in enumerate(self.relationship_ids) if relationship_id in allowed_relationships]
+            edge_mask &= numpy.isin(self.edge_relationships, allowed_codes)
+        return sorted((self.edge_list[position] for position in numpy.flatnonzero(edge_mask).tolist()), key=attrgetter('index_key'))
+
+    def _reachable(self, indptr, indices, position):
+        """Breadth-first search over one direction of the adjacency, one whole level at a time.
+
+        :param indptr: The row pointer array of the adjacency.
+        :param indices: The column index array of the adjacency.
+        :param int position: The index of the start node, which is only included if it lies on a cycle.
+        :return: A sorted array of the indices of the reached nodes.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        visited = numpy.zeros(len(self.node_list), dtype=bool)
+        frontier = indices[indptr[position]:indptr[position + 1]]
+        while frontier.size:
+            frontier = frontier[~visited[frontier]]
+            visited[frontier] = True
+            frontier = _gather(indptr, indices, numpy.unique(frontier))
+        return numpy.flatnonzero(visited)
+
+
+def _csr_arrays(adjacency_lists):
+    """Packs lists of neighbor indices into CSR row pointer and column index arrays.
+
+    :param list adjacency_lists: A :py:obj:`list` of neighbor index lists, one for each node.
+    :return: The row pointer and column index arrays.
+    :rtype: :py:obj:`tuple`
+    """
+    indptr = numpy.zeros(len(adjacency_lists) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(neighbors) for neighbors in adjacency_lists], out=indptr[1:])
+    indices = numpy.fromiter((neighbor for neighbors in adjacency_lists for neighbor in neighbors), dtype=numpy.int64, count=int(indptr[-1]))
+    return indptr, indices
+
+
+def _gather(indptr, indices, rows):
+    """Concatenates the neighbors of several nodes of a CSR adjacency without a Python loop.
+
+    :param indptr: The row pointer array of the adjacency.
+    :param indices: The column index array of the adjacency.
+    :param rows: An array of node indices.
+    :return: An array of the neighbors of all of the nodes, with repeats.
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return indices[:0]
+    # Each neighbor's position in `indices` is its row's start plus its offset within the row.
+    offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    return indices[numpy.repeat(starts, lengths) + offsets]
@@ -3,7 +3,12 @@
 Contains necessary objects for creating a Directed Acyclic Graph (DAG) object to represent Open Biomedical Ontologies
 (OBO).
 """
+import bisect
 import re
+from array import array
+from operator import attrgetter
+
+WORD_SPLIT = re.compile(r"[\w\'\-]+")  # Splits node names and definitions into the words of the vocabulary index.
 
 
 class OboGraph(object):
@@ -21,9 +26,13 @@ class OboGraph(object):
         """
         self.namespace_filter = namespace_filter
         self.allowed_relationships = allowed_relationships
-        self.word_split = re.compile(r"[\w\'\-]+")
-        self.node_list = list()
-        self.edge_list = list()
+        self.word_split = WORD_SPLIT
+        self._node_list = list()
+        self._removed_nodes = set()
+        self._edge_list = list()
+        self._removed_edges = set()
+        self.edge_index = dict()
+        self.relationship_edge_index = dict()
         self.id_index = dict()
         self.vocab_index = dict()
         self.relationship_index = dict()
@@ -33,35 +42,253 @@ class OboGraph(object):
         self._orphans = None
         self._leaves = None
         self._modified = True
+        self._csr_graph = None
+        self._closure = None
+        self._reachability_index = None
+        self._depths = None
+        self._postings_index = None
+        self._relationship_adjacency = None
+        self._relationship_views = dict()
 
         if self.allowed_relationships:
             if 'is_a' not in self.allowed_relationships:
                 print("WARNING: 'is_a' is a required relationship type within OBO ontologies.\nAdding 'is_a' to the allowed_relationships list.")
                 self.allowed_relationships.append('is_a')
 
+    @property
+    def node_list(self):
+        """:py:obj:`property` holding the :py:obj:`list` of nodes in the graph, in the order they were added. Nodes
+        removed by :func:`remove_node` and :func:`remove_nodes` are dropped from the list in one pass when it is next
+        read, so removing a node costs no more than disconnecting it.
+
+        :return: List of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:obj:`list`
+        """
+        if self._removed_nodes:
+            self._node_list[:] = [node for node in self._node_list if node not in self._removed_nodes]
+            self._removed_nodes.clear()
+        return self._node_list
+
+    @property
+    def edge_list(self):
+        """:py:obj:`property` holding the :py:obj:`list` of edges in the graph, in the order they were added. As with
+        :func:`node_list`, removed edges are dropped from the list in one pass when it is next read. Edges are added with
+        :func:`add_edge` rather than appended to the list, which would leave them out of :attr:`edge_index` and
+        :attr:`relationship_edge_index`.
+
+        :return: List of :class:`gocats.dag.AbstractEdge` objects.
+        :rtype: :py:obj:`list`
+        """
+        if self._removed_edges:
+            self._edge_list[:] = [edge for edge in self._edge_list if edge not in self._removed_edges]
+            self._removed_edges.clear()
+        return self._edge_list
+
     @property
     def orphans(self):
-        """:py:obj:`property` defining a set of nodes in the graph which have no parents. When the graph is modified,
-        calls :func:`_update_graph` to repopulate the sets of orphan and leaf nodes.
+        """:py:obj:`property` defining a set of nodes in the graph which have no parents. The set is populated by
+        :func:`_update_graph` when first read, and is then kept up to date as nodes and edges are added and removed (see
+        :func:`_update_node_status`). A frozen copy of the set is returned, so it does not change when the graph is modified
+        afterwards.
 
-        :return: Set of 'orphan' :class:`gocats.dag.AbstractNode` objects.
-        :rtype: :py:class:`set`
+        :return: Frozen set of 'orphan' :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`frozenset`
         """
-        if self._modified:
+        if self._orphans is None:
             self._update_graph()
-        return self._orphans
+        return frozenset(self._orphans)
 
     @property
     def leaves(self):
-        """:py:obj:`property` defining a set of nodes in the graph which have no children. When the graph is modified,
-        calls :func:`_update_graph` to repopulate the sets of orphan and leaf nodes.
+        """:py:obj:`property` defining a set of nodes in the graph which have no children. The set is populated by
+        :func:`_update_graph` when first read, and is then kept up to date as nodes and edges are added and removed (see
+        :func:`_update_node_status`). A frozen copy of the set is returned, so it does not change when the graph is modified
+        afterwards.
 
-        :return: Set of 'leaf' :class:`gocats.dag.AbstractNode` objects.
-        :rtype: :py:class:`set`
+        :return: Frozen set of 'leaf' :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`frozenset`
         """
-        if self._modified:
+        if self._leaves is None:
             self._update_graph()
-        return self._leaves
+        return frozenset(self._leaves)
+
+    @property
+    def csr_graph(self):
+        """:py:obj:`property` holding the array backend of the graph, a :class:`gocats.csrgraph.CsrGraph` built by
+        :func:`use_array_backend`, or :py:obj:`None` if the backend is not in use or the graph was modified since it was
+        built.
+
+        :return: The array backend.
+        :rtype: :class:`gocats.csrgraph.CsrGraph` or :py:obj:`None`
+        """
+        return self._csr_graph
+
+    def use_array_backend(self):
+        """Builds a :class:`gocats.csrgraph.CsrGraph` of the graph's current topology, which :func:`node_depth` and
+        :func:`filter_edges` then search instead of the node objects. Requires NumPy. The backend is dropped by the
+        graph's methods which add or remove nodes and edges; changes made directly to node objects are not detected, so
+        call this again after making them.
+
+        :return: The array backend.
+        :rtype: :class:`gocats.csrgraph.CsrGraph`
+        """
+        from .csrgraph import CsrGraph  # NumPy is only imported when the array backend is used.
+        self._csr_graph = CsrGraph(self)
+        return self._csr_graph
+
+    @property
+    def closure(self):
+        """:py:obj:`property` holding the transitive closure of the graph, a :class:`gocats.dag.TransitiveClosure` built
+        by :func:`compute_closure`, or :py:obj:`None` if it was not computed or the graph was modified since (nodes
+        which were not affected by the modification still read from it).
+
+        :return: The transitive closure.
+        :rtype: :class:`gocats.dag.TransitiveClosure` or :py:obj:`None`
+        """
+        return self._closure
+
+    def compute_closure(self, descendants_only=False):
+        """Computes the ancestors and descendants of every node in the graph in one pass over the nodes in topological
+        order, after which the nodes' :py:attr:`gocats.dag.AbstractNode.ancestors` and
+        :py:attr:`gocats.dag.AbstractNode.descendants` are read from the closure instead of searching the graph. When
+        the graph is modified, nodes whose ancestors or descendants change stop reading them from the closure, and the
+        other nodes keep doing so. Changes made directly to node parent and child sets are not detected.
+
+        :param bool descendants_only: Optional - Computes the descendants alone, for callers which never read ancestors, in half the memory. Ancestors are then still evaluated lazily, and the closure is not held in :py:attr:`closure`. Defaults to :py:obj:`False`.
+        :return: The transitive closure.
+        :rtype: :class:`gocats.dag.TransitiveClosure`
+        """
+        closure = TransitiveClosure(self.node_list, descendants_only=descendants_only)
+        for node in self.node_list:
+            node._descendants = None  # The node's sets are read from the closure when next requested.
+            node._descendants_closure = closure
+            if not descendants_only:
+                node._ancestors = None
+                node._ancestors_closure = closure
+        if not descendants_only:
+            self._closure = closure
+        return closure
+
+    @property
+    def depths(self):
+        """:py:obj:`property` holding the depths of the graph's nodes, a :class:`gocats.dag.NodeDepths` built by
+        :func:`compute_depths`, or :py:obj:`None` if they were not computed or the graph was modified since.
+
+        :return: The node depths.
+        :rtype: :class:`gocats.dag.NodeDepths` or :py:obj:`None`
+        """
+        return self._depths
+
+    def compute_depths(self):
+        """Computes the minimum and maximum depth of every node below the graph's root nodes in one pass over the
+        nodes in topological order, after which :func:`node_depth` looks depths up instead of searching the graph, until
+        the graph is next modified. Changes made directly to the root node list or to node parent and child sets are not
+        detected.
+
+        :return: The node depths.
+        :rtype: :class:`gocats.dag.NodeDepths`
+        """
+        self._depths = NodeDepths(self.node_list, self.root_nodes)
+        return self._depths
+
+    @property
+    def reachability_index(self):
+        """:py:obj:`property` holding the reachability index of the graph, a :class:`gocats.dag.ReachabilityIndex`
+        built by :func:`is_ancestor` or :func:`ancestors_among` when first needed, or :py:obj:`None` if it was not built
+        or the graph was modified since.
+
+        :return: The reachability index.
+        :rtype: :class:`gocats.dag.ReachabilityIndex` or :py:obj:`None`
+        """
+        return self._reachability_index
+
+    def is_ancestor(self, ancestor_node, node):
+        """Returns whether a node is an ancestor of another, i.e. whether `node` is under `ancestor_node` in the graph,
+        without building the ancestor set of `node`. Builds the graph's :class:`gocats.dag.ReachabilityIndex` if it was
+        not built since the graph was last modified; changes made directly to node objects are not detected.
+
+        :param ancestor_node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: True if `ancestor_node` is in the ancestors of `node`, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        if self._reachability_index is None:
+            self._reachability_index = ReachabilityIndex(self.node_list)
+        return self._reachability_index.is_ancestor(ancestor_node, node)
+
+    def ancestors_among(self, node, candidate_nodes):
+        """Returns those of the candidate nodes which are ancestors of a node, e.g. the categories a term belongs to,
+        as :func:`is_ancestor` would for each candidate.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :param candidate_nodes: An iterable of :class:`gocats.dag.AbstractNode` objects of the graph.
+        :return: A :py:obj:`list` of the candidate nodes which are ancestors of `node`, in the order given.
+        :rtype: :py:obj:`list`
+        """
+        if self._reachability_index is None:
+            self._reachability_index = ReachabilityIndex(self.node_list)
+        return self._reachability_index.ancestors_among(node, candidate_nodes)
+
+    @property
+    def postings_index(self):
+        """:py:obj:`property` holding the inverted index of the words in the graph's node names and definitions, a
+        :class:`gocats.dag.PostingsIndex` built by :func:`search` when first needed, or :py:obj:`None` if it was not
+        built or nodes were added or removed since.
+
+        :return: The postings index.
+        :rtype: :class:`gocats.dag.PostingsIndex` or :py:obj:`None`
+        """
+        return self._postings_index
+
+    def search(self, any_of=None, all_of=None, none_of=None):
+        """Returns the nodes whose name or definition contains any of the phrases in `any_of`, all of the phrases in
+        `all_of` and none of the phrases in `none_of`. A phrase is one or more words, split as the vocabulary index
+        splits them, which must appear consecutively in the node's name or in its definition. Leave `any_of` and
+        `all_of` as :py:obj:`None` to search every node. Builds the graph's :class:`gocats.dag.PostingsIndex` if it was
+        not built since nodes were last added or removed.
+
+        :param list any_of: Optional - Phrases of which a node must contain at least one.
+        :param list all_of: Optional - Phrases which a node must all contain.
+        :param list none_of: Optional - Phrases which a node must not contain.
+        :return: A :py:obj:`list` of :class:`gocats.dag.AbstractNode` objects, in the order of the node list.
+        :rtype: :py:obj:`list`
+        """
+        if self._postings_index is None:
+            self._postings_index = PostingsIndex(self.node_list)
+        return self._postings_index.search(any_of, all_of, none_of)
+
+    def relationship_view(self, allowed_relationships):
+        """Returns a view of the graph which follows only the edges of some of its relationships, e.g. ['is_a'] or
+        ['is_a', 'part_of'], so that relationship configurations can be compared on one parsed graph instead of parsing
+        the ontology once for each. The graph should be built with every relationship used by its views, e.g. with
+        `allowed_relationships` left as :py:obj:`None`. The relationships of the graph's edges are recorded as bit masks
+        in a :class:`gocats.dag.RelationshipAdjacency` when the first view is made, and each view keeps its own
+        transitive closure. Views are reused until the graph is next modified.
+
+        :param list allowed_relationships: The IDs of the relationships followed by the view.
+        :return: The view.
+        :rtype: :class:`gocats.dag.RelationshipView`
+        """
+        key = frozenset(allowed_relationships)
+        view = self._relationship_views.get(key)
+        if view is None:
+            if self._relationship_adjacency is None:
+                self._relationship_adjacency = RelationshipAdjacency(self.node_list, self.allowed_relationships)
+            view = self._relationship_views[key] = RelationshipView(self._relationship_adjacency, key)
+        return view
+
+    def _discard_indexes(self):
+        """Drops the graph's references to its transitive closure, reachability index, node depths and relationship
+        views, which no longer describe the whole graph once it is modified.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self._closure = None
+        self._reachability_index = None
+        self._depths = None
+        self._relationship_adjacency = None
+        self._relationship_views = dict()
 
     def valid_node(self, node):
         """Defines condition of a valid node. Node is valid if it is not obsolete and is contained within the given
@@ -88,77 +315,189 @@ class OboGraph(object):
         return False
 
     def _update_graph(self):
-        """Repopulates graph orphans and leaves sets.
+        """Repopulates graph orphans and leaves sets. Called when they are first read, and after nodes are connected in
+        bulk, e.g. by :func:`instantiate_valid_edges`.
 
         :return: None
         :rtype: :py:obj:`None`
         """
         self._orphans = set([node for node in self.node_list if not node.obsolete and not node.parent_node_set and node not in self.root_nodes])
         self._leaves = set([node for node in self.node_list if not node.obsolete and not node.child_node_set and node.parent_node_set])
-        self._modified = False
 
-    def add_node(self, node):
+    def _update_node_status(self, nodes):
+        """Moves nodes into or out of the graph's orphans and leaves sets after their parents, children, obsolescence or
+        root status change, or they are added to or removed from the graph. Only the given nodes are visited. Does
+        nothing while the sets are waiting to be repopulated by :func:`_update_graph`.
+
+        :param nodes: An iterable of :class:`gocats.dag.AbstractNode` objects.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self._orphans is None or self._leaves is None:
+            return
+        for node in nodes:
+            self._orphans.discard(node)
+            self._leaves.discard(node)
+            if node.obsolete or self.id_index.get(node.id) is not node:
+                continue
+            if not node.parent_node_set:
+                if node not in self.root_nodes:
+                    self._orphans.add(node)
+            elif not node.child_node_set:
+                self._leaves.add(node)
+
+    def add_node(self, node, vocabulary=None):
         """Adds a node object to the graph, adds an object pointer to the vocabulary index to reference nodes to every
         word in the node name and definition. Sets modification state to :py:obj:`True`.
 
         :param node: A :class:`gocats.dag.AbstractNode` object.
+        :param list vocabulary: Optional - The words of the node name and definition, if they have already been split by :data:`WORD_SPLIT` e.g. in a parsing worker process.
         :return: None
         :rtype: :py:obj:`None`
         """
-        self.node_list.append(node)
+        if node in self._removed_nodes:
+            self._removed_nodes.discard(node)  # The node is still in the list, at its original position.
+        else:
+            self._node_list.append(node)
         self.id_index[node.id] = node
-        for word in re.findall(r"[\w\'\-]+", node.name + " " + node.definition):
+        self._postings_index = None
+        if vocabulary is None:
+            vocabulary = WORD_SPLIT.findall(node.name + " " + node.definition)
+        for word in vocabulary:
             try:
                 self.vocab_index[word].add(node)
             except KeyError:
                 self.vocab_index[word] = set([node])  # Don't replace with set literal
+        self._update_node_status([node])
         self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
 
     def remove_node(self, node):
-        """Removes a node from the graph and deletes node references from all entries in the vocabulary index. Sets
-        modification state to :py:obj:`True`.
+        """Removes a node from the graph and deletes node references from all entries in the vocabulary index. Only the
+        node's own parents, children and edges are visited. Sets modification state to :py:obj:`True`.
 
         :param node: A :class:`gocats.dag.AbstractNode` object.
         :return: None
         :rtype: :py:obj:`None`
         """
-        if node not in self.node_list:
-            pass
-        else:
-            for graph_node in self.node_list:
-                if node in graph_node.parent_node_set:
-                    graph_node.parent_node_set.remove(node)
-                elif node in graph_node.child_node_set:
-                    graph_node.child_node_set.remove(node)
-                for edge in graph_node.edges:
-                    if node is edge.parent_node or node is edge.child_node:
-                        graph_node.edges.remove(edge)
-            for word in re.findall(r"[\w\'\-]+", node.name + " " + node.definition):
-                try:
-                    self.vocab_index[word].remove(node)
-                except KeyError:
-                    pass
-                else:
-                    if not self.vocab_index[word]:
+        self.remove_nodes([node])
+
+    def remove_nodes(self, nodes):
+        """Removes several nodes from the graph, as :func:`remove_node` does. The node list and the graph's derived
+        indexes are updated once for all of the nodes. Sets modification state to :py:obj:`True`.
+
+        :param nodes: An iterable of :class:`gocats.dag.AbstractNode` objects. Nodes which are not in the graph are ignored.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        removed_nodes = set(node for node in nodes if self.id_index.get(node.id) is node)
+        for node in removed_nodes:
+            for parent_node in node.parent_node_set:
+                parent_node._invalidate_descendants()
+            for child_node in node.child_node_set:
+                child_node._invalidate_ancestors()
+            # Only nodes connected to the removed node can reference it.
+            for parent_node in node.parent_node_set:
+                parent_node.child_node_set.discard(node)
+            for child_node in node.child_node_set:
+                child_node.parent_node_set.discard(node)
+            for edge in node.edges:
+                for edge_node in edge.node_pair:
+                    if edge_node is not node:
+                        edge_node.edges.discard(edge)
+            for word in WORD_SPLIT.findall(node.name + " " + node.definition):
+                word_nodes = self.vocab_index.get(word)
+                if word_nodes is not None:
+                    word_nodes.discard(node)
+                    if not word_nodes:
                         del self.vocab_index[word]
             del self.id_index[node.id]
-            self.node_list.remove(node)
+        self._removed_nodes.update(removed_nodes)
+        self._update_node_status(removed_nodes.union(*[node.parent_node_set | node.child_node_set for node in removed_nodes]))
+        self._postings_index = None
         self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
 
     def add_edge(self, edge):
-        """Adds an edge object to the graph, and counts the edge relationship type. Sets modification state to
-        :py:obj:`True`.
+        """Adds an edge object to the graph, and counts the edge relationship type. An edge which is already in the graph
+        is counted again but not stored twice. Sets modification state to :py:obj:`True`.
 
         :param edge: A :class:`gocats.dag.AbstractEdge` object.
         :return: None
         :rtype: :py:obj:`None`
         """
-        self.edge_list.append(edge)
+        self._store_edge(edge)
         try:
             self.relationship_count[edge.relationship_id] += 1
         except KeyError:
             self.relationship_count[edge.relationship_id] = 1
+        if edge.node_pair:
+            self._update_node_status(edge.node_pair)
         self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
+
+    def has_edge(self, edge):
+        """Returns whether an edge object is in the graph, in constant time.
+
+        :param edge: A :class:`gocats.dag.AbstractEdge` object.
+        :return: :py:obj:`True` if the edge is in the graph, :py:obj:`False` otherwise.
+        :rtype: :py:obj:`bool`
+        """
+        return edge in self.relationship_edge_index.get(edge.relationship_id, ())
+
+    def get_edge(self, node1_id, node2_id, relationship_id):
+        """Returns the edge of the graph between two nodes with the given relationship, as they appear in the ontology
+        file's relationship line, e.g. the child term's ID, then the parent term's ID for 'is_a'.
+
+        :param str node1_id: The ID of the first term referenced from the ontology file's relationship line.
+        :param str node2_id: The ID of the second term referenced from the ontology file's relationship line.
+        :param str relationship_id: The ID of the relationship in the ontology file's relationship line.
+        :return: A :class:`gocats.dag.AbstractEdge` object, or :py:obj:`None` if the graph has no such edge.
+        :rtype: :class:`gocats.dag.AbstractEdge` or :py:obj:`None`
+        """
+        return self.edge_index.get((node1_id, node2_id, relationship_id))
+
+    def _store_edge(self, edge):
+        """Adds an edge object to the graph's edge list, :attr:`edge_index` and :attr:`relationship_edge_index`, unless
+        it is already in the graph.
+
+        :param edge: A :class:`gocats.dag.AbstractEdge` object.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        try:
+            relationship_edges = self.relationship_edge_index[edge.relationship_id]
+        except KeyError:
+            relationship_edges = self.relationship_edge_index[edge.relationship_id] = set()
+        if edge in relationship_edges:
+            return
+        relationship_edges.add(edge)
+        self.edge_index[edge.index_key] = edge
+        if edge in self._removed_edges:
+            self._removed_edges.discard(edge)  # The edge is still in the list, at its original position.
+        else:
+            self._edge_list.append(edge)
+
+    def _discard_edge(self, edge):
+        """Removes an edge object from the graph's edge list, :attr:`edge_index` and :attr:`relationship_edge_index`, if
+        it is in the graph.
+
+        :param edge: A :class:`gocats.dag.AbstractEdge` object.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        relationship_edges = self.relationship_edge_index.get(edge.relationship_id)
+        if not relationship_edges or edge not in relationship_edges:
+            return
+        relationship_edges.discard(edge)
+        if not relationship_edges:
+            del self.relationship_edge_index[edge.relationship_id]
+        if self.edge_index.get(edge.index_key) is edge:
+            del self.edge_index[edge.index_key]
+        self._removed_edges.add(edge)
 
     def remove_edge(self, edge):
         """Removes an edge object from the graph, and removes references to that edge from the node objects involved.
@@ -170,8 +509,29 @@ class OboGraph(object):
         """
         self.id_index[edge.parent_id].remove_edge(edge)
         self.id_index[edge.child_id].remove_edge(edge)
-        self.edge_list.remove(edge)
+        self._discard_edge(edge)
+        self._update_node_status([self.id_index[edge.parent_id], self.id_index[edge.child_id]])
         self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
+
+    def remove_edges(self, edges):
+        """Removes several edge objects from the graph, as :func:`remove_edge` does. Sets modification state to
+        :py:obj:`True`.
+
+        :param edges: An iterable of :class:`gocats.dag.AbstractEdge` objects.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        edges = set(edges)
+        for edge in edges:
+            self.id_index[edge.parent_id].remove_edge(edge)
+            self.id_index[edge.child_id].remove_edge(edge)
+            self._discard_edge(edge)
+        self._update_node_status(set(self.id_index[node_id] for edge in edges for node_id in (edge.parent_id, edge.child_id)))
+        self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
 
     def add_relationship(self, relationship):
         """Adds a :class:`gocats.dag.AbstractRelationship` object to the graph's relationship index, referenced by
@@ -201,8 +561,11 @@ class OboGraph(object):
             else:
                 del_edges.add(edge)
         for edge in del_edges:
-            self.edge_list.remove(edge)
+            self._discard_edge(edge)
+        self._orphans = self._leaves = None  # Repopulated by _update_graph when next read.
         self._modified = True
+        self._csr_graph = None
+        self._discard_indexes()
 
     def node_depth(self, sample_node):
         """Returns an integer representing how many nodes are between the given node and the root node of the graph
@@ -212,6 +575,12 @@ class OboGraph(object):
         :return: Depth level.
         :rtype: :py:obj:`int`
         """
+        if self._depths is not None:
+            depth = self._depths.node_depth(sample_node)
+            if depth is not None:
+                return depth
+        if self._csr_graph is not None:
+            return self._csr_graph.node_depth(sample_node)
         if sample_node in self.root_nodes:
             return 0
         depth = 1
@@ -224,31 +593,45 @@ class OboGraph(object):
             parent_set = set().union(*[parent.parent_node_set for parent in parent_set])
         return depth
 
-    def filter_nodes(self, search_string_list):
+    def filter_nodes(self, search_string_list, match_phrases=False):
         """Returns a list of node objects that contain vocabulary matching the keywords provided in the search string
-        list. Nodes are selected by searching through the vocablary index.
+        list. Nodes are selected by searching through the vocablary index. With `match_phrases`, a search string of
+        several words instead selects only the nodes which contain those words as a phrase, found by :func:`search`.
 
         :param search_string_list: A :py:obj:`list` of search strings provided in the keyword_file provided to :func:`gocats.gocats.create_subgraphs`.
+        :param bool match_phrases: Optional - Whether search strings are matched as phrases rather than as separate words. Defaults to :py:obj:`False`.
         :return: A list of :class:`gocats.dag.AbstractNode` objects.
         :rtype: :py:obj:`list`
         """
-        search_string_list_words = [re.findall(self.word_split, word) for word in search_string_list]
-        search_string_word_set = set([word for sublist in search_string_list_words for word in sublist])
-        filtered_nodes = set.union(*[node_set for node_set in [self.vocab_index[word] for word in search_string_word_set if word in self.vocab_index]])
+        if match_phrases:
+            filtered_nodes = set(self.search(any_of=search_string_list))
+        else:
+            search_string_list_words = [re.findall(self.word_split, word) for word in search_string_list]
+            search_string_word_set = set([word for sublist in search_string_list_words for word in sublist])
+            filtered_nodes = set().union(*[self.vocab_index[word] for word in search_string_word_set if word in self.vocab_index])
         if self.namespace_filter:
             filtered_nodes = [node for node in filtered_nodes if node.namespace == self.namespace_filter]
         return filtered_nodes
 
     def filter_edges(self, filtered_nodes):
-        """Returns a list of edges in the graph that connect the nodes provided in the filtered nodes list.
+        """Returns a list of edges in the graph that connect the nodes provided in the filtered nodes list. Only the
+        edges of the filtered nodes are visited, rather than every edge in the graph. The edges are sorted by their
+        :py:attr:`gocats.dag.AbstractEdge.index_key`, so that the order does not depend on set iteration, nor on whether
+        the array backend is used.
 
         :param filtered_nodes: List of filtered nodes provided by :func:`filter_nodes`.
         :return: A list of :class:`gocats.dag.AbstractEdge` objects.
         :rtype: :py:obj:`list`
         """
-        filtered_edges = [edge for edge in self.edge_list if edge.parent_node in filtered_nodes and edge.child_node in filtered_nodes]
+        if self._csr_graph is not None:
+            return self._csr_graph.filter_edges(filtered_nodes, self.allowed_relationships)
+        filtered_node_set = set(filtered_nodes)
+        # Each edge is taken from its child node only, so that an edge between two filtered nodes is listed once.
+        filtered_edges = [edge for node in dict.fromkeys(filtered_nodes) for edge in node.edges
+                          if edge.child_id == node.id and edge.parent_node in filtered_node_set and self.has_edge(edge)]
         if self.allowed_relationships:
             filtered_edges = [edge for edge in filtered_edges if edge.relationship_id in self.allowed_relationships]
+        filtered_edges.sort(key=attrgetter('index_key'))
         return filtered_edges
 
     def nodes_between(self, start_node, end_node):
@@ -273,6 +656,11 @@ class AbstractNode(object):
     information from the database file can be added to the object.
     """
 
+    # Nodes are created for every term of an ontology, so they store their attributes in slots rather than a per-instance
+    # dictionary. Subclasses which add attributes must declare their own slots to keep the saving.
+    __slots__ = ('id', 'name', 'definition', 'namespace', 'edges', 'parent_node_set', 'child_node_set', 'obsolete',
+                 '_descendants', '_ancestors', '_descendants_closure', '_ancestors_closure')
+
     def __init__(self):
         """`AbstractNode` initializer
         """
@@ -284,51 +672,43 @@ class AbstractNode(object):
         self.parent_node_set = set()
         self.child_node_set = set()
         self.obsolete = False
-        self._modified = True
         self._descendants = None
         self._ancestors = None
+        self._descendants_closure = None
+        self._ancestors_closure = None
         # Will add new sets for equivalence, actor/actee, ordinal, etc
 
     @property
     def descendants(self):
         """:py:obj:`property` defining a set of nodes in the graph that are recursively reverse of a node with a
-        scoping-type relationship. When the node is modified, calls :func:`gocats.dag.AbstractNode._update_node` to
-        repopulate the sets of descendants and ancestors. This represents a "lazy" evaluation of node descendants.
+        scoping-type relationship. When the set is out of date, calls :func:`gocats.dag.AbstractNode._update_descendants`
+        to repopulate it. This represents a "lazy" evaluation of node descendants.
 
         :return: Set of :class:`gocats.dag.AbstractNode` objects
         :rtype: :py:class:`set`
         """
-        if self._modified:
-            self._update_node()
+        if self._descendants is None:
+            self._update_descendants()
         return self._descendants
 
     @property
     def ancestors(self):
         """:py:obj:`property` defining a set of nodes in the graph that are recursively forward of a node with a
-        scoping-type relationship. When the node is modified, calls :func:`gocats.dag.AbstractNode._update_node` to
-        repopulate the sets of descendants and ancestors. This represents a "lazy" evaluation of node ancestors.
+        scoping-type relationship. When the set is out of date, calls :func:`gocats.dag.AbstractNode._update_ancestors`
+        to repopulate it. This represents a "lazy" evaluation of node ancestors.
 
         :return: Set of :class:`gocats.dag.AbstractNode` objects
         :rtype: :py:class:`set`
         """
-        if self._modified:
-            self._update_node()
+        if self._ancestors is None:
+            self._update_ancestors()
         return self._ancestors
 
-    def _update_node(self):
-        """Repopulates ancestor and descendant sets for a node. Sets modification state to :py:obj:`True`.
-
-        :return: None
-        :rtype: :py:obj:`None`
-        """
-        self._update_descendants()
-        self._update_ancestors()
-        self._modified = False
-
     def add_edge(self, edge, allowed_relationships):
         """Adds a given :class:`gocats.dag.AbstractEdge` to a each :class:`gocats.dag.AbstractNode` objects that the
         edge connects. If there is a filter for the types of relationships allowed, edges with non-allowed relationship
-        types are not processed. Sets modification state to :py:obj:`True`.
+        types are not processed. A new parent or child marks the ancestor sets of this node and its descendants, or the
+        descendant sets of this node and its ancestors, as out of date.
 
         :return: None
         :rtype: :py:obj:`None`
@@ -336,71 +716,806 @@ class AbstractNode(object):
         # TODO: Need to capture non-parent/child relationship types, such as actor/actee and equivalence
         # FIXME: Should we add edges that represent non-allowed relationships?
         self.edges.add(edge)
-        if not allowed_relationships:
-            if edge.child_id == self.id:
-                self.parent_node_set.add(edge.parent_node)
-            elif edge.parent_id == self.id:
-                self.child_node_set.add(edge.child_node)
-        else:
-            if edge.child_id == self.id and edge.relationship_id in allowed_relationships:
+        if edge.child_id == self.id and (not allowed_relationships or edge.relationship_id in allowed_relationships):
+            if edge.parent_node not in self.parent_node_set:
+                self._invalidate_ancestors()
                 self.parent_node_set.add(edge.parent_node)
-            elif edge.parent_id == self.id and edge.relationship_id in allowed_relationships:
+        elif edge.parent_id == self.id and (not allowed_relationships or edge.relationship_id in allowed_relationships):
+            if edge.child_node not in self.child_node_set:
+                self._invalidate_descendants()
                 self.child_node_set.add(edge.child_node)
-        self._modified = True
 
     def remove_edge(self, edge):
         """Removes a given :class:`gocats.dag.AbstractEdge` the :class:`gocats.dag.AbstractNode` object. Also removes
-        parent or child node references that the edge referenced. Sets modification state to :py:obj:`True`.
+        parent or child node references that the edge referenced, unless another edge still references them, which
+        marks the ancestor sets of this node and its descendants, or the descendant sets of this node and its ancestors,
+        as out of date.
 
         :return: None
         :rtype: :py:obj:`None`
         """
+        self.edges.discard(edge)  # A self-referencing edge is removed from its node twice.
+        # Another edge may still connect the same pair of nodes, e.g. with both is_a and part_of relationships.
         if edge.child_id == self.id:
-            self.parent_node_set.remove(edge.parent_node)
+            if edge.parent_node in self.parent_node_set and not any(other.child_id == self.id and other.parent_node is edge.parent_node for other in self.edges):
+                self._invalidate_ancestors()
+                self.parent_node_set.discard(edge.parent_node)
         elif edge.parent_id == self.id:
-            self.child_node_set.remove(edge.child_node)
-        self.edges.remove(edge)
-        self._modified = True
+            if edge.child_node in self.child_node_set and not any(other.parent_id == self.id and other.child_node is edge.child_node for other in self.edges):
+                self._invalidate_descendants()
+                self.child_node_set.discard(edge.child_node)
+
+    def _invalidate_descendants(self):
+        """Marks the descendant sets of this node and its ancestors as out of date, e.g. before the node gains or loses
+        a child. The search up the graph stops at nodes which are already out of date, as their ancestors are too (see
+        :func:`_update_descendants`), so it only visits nodes with a set to discard.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        _invalidate_relatives(self, 'descendants', 'parent_node_set')
+
+    def _invalidate_ancestors(self):
+        """Marks the ancestor sets of this node and its descendants as out of date, e.g. before the node gains or loses
+        a parent. The search down the graph stops at nodes which are already out of date, as their descendants are too
+        (see :func:`_update_ancestors`), so it only visits nodes with a set to discard.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        _invalidate_relatives(self, 'ancestors', 'child_node_set')
 
     def _update_descendants(self):
         """Used for the lazy evaluation of graph descendants of the current :class:`gocats.dag.AbstractNode` object.
-        Creates internal :py:obj:`set` variable, descendant_set. Iterates through node children until the bottom of the
-        graph is reached. The descendant_set is a set of all nodes across all paths encountered from the current node.
+        Reads the set from the graph's transitive closure (see :func:`gocats.dag.OboGraph.compute_closure`) if it is
+        still valid for this node. Otherwise, the out of date descendant sets of the node's descendants are evaluated
+        first, from the bottom of the graph up, and each node's set is the union of its children and their sets. Every
+        descendant of a node with an up to date descendant set therefore has one too.
 
         :return: None
         :rtype: :py:obj:`None`
         """
-        descendant_set = set()
-        children = list(self.child_node_set)
-        while len(children) > 0:
-            child = children[0]
-            descendant_set.add(child)
-            if not child._modified:
-                descendant_set.update(child._descendants)
-            else:
-                children.extend([new_child for new_child in child.child_node_set if new_child not in descendant_set and new_child not in children])
-            children.remove(child)
-        self._descendants = descendant_set
+        _update_relatives(self, 'descendants', 'child_node_set')
 
     def _update_ancestors(self):
         """Used for the lazy evaluation of graph ancestors of the current :class:`gocats.dag.AbstractNode` object.
-        Creates internal :py:obj:`set` variable, ancestors_set. Iterates through node parents until the top of the graph
-        is reached. The ancestors_set is a set of all nodes across all paths encountered from the current node.
+        Reads the set from the graph's transitive closure (see :func:`gocats.dag.OboGraph.compute_closure`) if it is
+        still valid for this node. Otherwise, the out of date ancestor sets of the node's ancestors are evaluated first,
+        from the top of the graph down, and each node's set is the union of its parents and their sets. Every ancestor
+        of a node with an up to date ancestor set therefore has one too.
 
         :return: None
         :rtype: :py:obj:`None`
         """
-        ancestors_set = set()
-        parents = list(self.parent_node_set)
-        while len(parents) > 0:
-            parent = parents[0]
-            ancestors_set.add(parent)
-            if not parent._modified:
-                ancestors_set.update(parent._ancestors)
+        _update_relatives(self, 'ancestors', 'parent_node_set')
+
+
+def _stale(node, relation):
+    """Returns whether a node's set of relatives, 'descendants' or 'ancestors', is out of date: neither held by the
+    node nor readable from a transitive closure.
+
+    :param node: A :class:`gocats.dag.AbstractNode` object.
+    :param str relation: 'descendants' or 'ancestors'.
+    :return: True if the set is out of date, False otherwise.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    return getattr(node, '_' + relation) is None and getattr(node, '_' + relation + '_closure') is None
+
+
+def _invalidate_relatives(start_node, relation, search_set):
+    """Discards the descendant or ancestor sets of a node and of the nodes above or below it, as
+    :func:`gocats.dag.AbstractNode._invalidate_descendants` and :func:`gocats.dag.AbstractNode._invalidate_ancestors` do.
+
+    :param start_node: A :class:`gocats.dag.AbstractNode` object.
+    :param str relation: The sets to discard, 'descendants' or 'ancestors'.
+    :param str search_set: The node attribute followed through the graph, 'parent_node_set' or 'child_node_set'.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    nodes = [start_node]
+    while nodes:
+        node = nodes.pop()
+        if _stale(node, relation):
+            continue
+        setattr(node, '_' + relation, None)
+        setattr(node, '_' + relation + '_closure', None)
+        nodes.extend(getattr(node, search_set))
+
+
+def _update_relatives(start_node, relation, relative_set):
+    """Evaluates the descendant or ancestor set of a node, as :func:`gocats.dag.AbstractNode._update_descendants` and
+    :func:`gocats.dag.AbstractNode._update_ancestors` do.
+
+    :param start_node: A :class:`gocats.dag.AbstractNode` object whose set is out of date.
+    :param str relation: The set to evaluate, 'descendants' or 'ancestors'.
+    :param str relative_set: The node attribute holding the node's children or parents, 'child_node_set' or 'parent_node_set'.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    closure = getattr(start_node, '_' + relation + '_closure')
+    if closure is not None:
+        setattr(start_node, '_' + relation, getattr(closure, relation)(start_node))
+        return
+    # Depth-first search through out of date relatives; a node's set is made once all of its relatives have sets.
+    searching = {start_node}
+    stack = [(start_node, iter(getattr(start_node, relative_set)))]
+    while stack:
+        node, relatives = stack[-1]
+        for relative in relatives:
+            if _stale(relative, relation):
+                if relative in searching:  # A cycle, whose nodes are all relatives of one another.
+                    _search_stale_relatives(start_node, relation, relative_set)
+                    return
+                searching.add(relative)
+                stack.append((relative, iter(getattr(relative, relative_set))))
+                break
+        else:
+            stack.pop()
+            searching.discard(node)
+            relative_nodes = set(getattr(node, relative_set))
+            for relative in getattr(node, relative_set):
+                relative_nodes.update(getattr(relative, relation))
+            setattr(node, '_' + relation, relative_nodes)
+
+
+def _search_stale_relatives(start_node, relation, relative_set):
+    """Evaluates the descendant or ancestor sets of a node and of its out of date relatives when they include a cycle,
+    by searching the graph from each of them. Relatives with up to date sets are not searched past.
+
+    :param start_node: A :class:`gocats.dag.AbstractNode` object whose set is out of date.
+    :param str relation: The sets to evaluate, 'descendants' or 'ancestors'.
+    :param str relative_set: The node attribute holding the node's children or parents, 'child_node_set' or 'parent_node_set'.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    stale_nodes = [start_node]
+    found = {start_node}
+    for node in stale_nodes:  # The list grows as out of date relatives are found.
+        for relative in getattr(node, relative_set):
+            if relative not in found and _stale(relative, relation):
+                found.add(relative)
+                stale_nodes.append(relative)
+    relative_sets = list()
+    for node in stale_nodes:
+        relative_nodes = set()
+        relatives = list(getattr(node, relative_set))
+        while relatives:
+            relative = relatives.pop()
+            if relative in relative_nodes:
+                continue
+            relative_nodes.add(relative)
+            if _stale(relative, relation):
+                relatives.extend(getattr(relative, relative_set))
             else:
-                parents.extend([new_parent for new_parent in parent.parent_node_set if new_parent not in ancestors_set and new_parent not in parents])
-            parents.remove(parent)
-        self._ancestors = ancestors_set
+                relative_nodes.update(getattr(relative, relation))
+        relative_sets.append(relative_nodes)
+    for node, relative_nodes in zip(stale_nodes, relative_sets):
+        setattr(node, '_' + relation, relative_nodes)
+
+
+class TransitiveClosure(object):
+
+    """The ancestors and descendants of every node of a graph, built by :func:`gocats.dag.OboGraph.compute_closure`.
+    Nodes are numbered in topological order, parents before children, so that each node's ancestors are complete once
+    its parents' are, and its descendants once its children's are. The ancestors and descendants of a node are held as
+    bitsets: Python :py:obj:`int` objects in which bit i is set when the i-th node in :py:attr:`node_list` is a member.
+    """
+
+    def __init__(self, node_list, parent_sets=None, child_sets=None, descendants_only=False):
+        """`TransitiveClosure` initializer. Relationships to nodes which are not in `node_list` are not followed.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph.
+        :param dict parent_sets: Optional - The set of parents of each node, e.g. through some of the graph's relationships only (see :class:`gocats.dag.RelationshipView`). Defaults to the nodes' parent_node_set.
+        :param dict child_sets: Optional - The set of children of each node, given with `parent_sets`. Defaults to the nodes' child_node_set.
+        :param bool descendants_only: Optional - Computes the descendants alone, leaving :py:attr:`ancestor_bits` as :py:obj:`None`, e.g. for :func:`descendant_count`.
+        """
+        parents = parent_sets.__getitem__ if parent_sets is not None else attrgetter('parent_node_set')
+        children = child_sets.__getitem__ if child_sets is not None else attrgetter('child_node_set')
+        self.node_list, ordered_count = self._topological_order(node_list, parents, children)
+        self.node_position = {node: position for position, node in enumerate(self.node_list)}
+        self.ancestor_bits = None if descendants_only else [0] * len(self.node_list)
+        self.descendant_bits = [0] * len(self.node_list)
+        # Nodes on or below a cycle come last. Their parents may be anywhere, but their children are also on or below the
+        # cycle, so only they are passed over repeatedly, until none of their bitsets change.
+        ordered = range(ordered_count)
+        unordered = range(ordered_count, len(self.node_list))
+        if not descendants_only:
+            self._propagate(self.ancestor_bits, parents, ordered)
+            while self._propagate(self.ancestor_bits, parents, unordered):
+                pass
+        while self._propagate(self.descendant_bits, children, reversed(unordered)):
+            pass
+        self._propagate(self.descendant_bits, children, reversed(ordered))
+
+    @staticmethod
+    def _topological_order(node_list, parents=attrgetter('parent_node_set'), children=attrgetter('child_node_set')):
+        """Orders nodes so that every node comes after its parents (Kahn's algorithm). Nodes which are on, or below, a
+        cycle of parent relationships cannot be ordered, and are appended at the end in their original order.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph.
+        :param parents: Optional - A function returning the set of parents of a node (defaults to its parent_node_set).
+        :param children: Optional - A function returning the set of children of a node (defaults to its child_node_set).
+        :return: The :py:obj:`list` of nodes, and the number of nodes at its start which are in topological order.
+        :rtype: :py:obj:`tuple`
+        """
+        node_set = set(node_list)
+        parent_counts = {node: len(parents(node) & node_set) for node in node_list}
+        order = [node for node in node_list if not parent_counts[node]]
+        for node in order:  # The list grows as nodes are released by their last parent.
+            for child in children(node):
+                if child in parent_counts:
+                    parent_counts[child] -= 1
+                    if not parent_counts[child]:
+                        order.append(child)
+        ordered_count = len(order)
+        if ordered_count < len(node_list):
+            ordered = set(order)
+            order.extend(node for node in node_list if node not in ordered)
+        return order, ordered_count
+
+    def _propagate(self, bitsets, relatives, positions):
+        """Adds the bitsets of each node's parents or children, and the relatives themselves, to the node's bitset.
+
+        :param list bitsets: :py:attr:`ancestor_bits` or :py:attr:`descendant_bits`.
+        :param relatives: A function returning the parents or children of a node.
+        :param positions: The node positions to update, in order.
+        :return: Whether any bitset changed.
+        :rtype: :py:obj:`bool`
+        """
+        node_list = self.node_list
+        node_position = self.node_position
+        changed = False
+        for position in positions:
+            bits = bitsets[position]
+            for relative in relatives(node_list[position]):
+                relative_position = node_position.get(relative)
+                if relative_position is not None:
+                    bits |= bitsets[relative_position] | (1 << relative_position)
+            if bits != bitsets[position]:
+                bitsets[position] = bits
+                changed = True
+        return changed
+
+    def nodes(self, bits):
+        """Returns the nodes of a bitset.
+
+        :param int bits: A bitset of node positions in :py:attr:`node_list`.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        # The binary string is scanned in C, so only set bits cost a Python step.
+        digits = bin(bits)
+        last_digit = len(digits) - 1
+        node_set = set()
+        digit = digits.find('1', 2)
+        while digit != -1:
+            node_set.add(self.node_list[last_digit - digit])
+            digit = digits.find('1', digit + 1)
+        return node_set
+
+    @staticmethod
+    def positions(bits):
+        """Returns the node positions of a bitset, as :func:`nodes` finds them.
+
+        :param int bits: A bitset of node positions in :py:attr:`node_list`.
+        :return: A :py:obj:`list` of positions in :py:attr:`node_list`, highest first.
+        :rtype: :py:obj:`list`
+        """
+        digits = bin(bits)
+        last_digit = len(digits) - 1
+        positions = list()
+        digit = digits.find('1', 2)
+        while digit != -1:
+            positions.append(last_digit - digit)
+            digit = digits.find('1', digit + 1)
+        return positions
+
+    def ancestors(self, node):
+        """Returns the ancestors of a node, as :py:attr:`gocats.dag.AbstractNode.ancestors` does.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.nodes(self.ancestor_bits[self.node_position[node]])
+
+    def descendants(self, node):
+        """Returns the descendants of a node, as :py:attr:`gocats.dag.AbstractNode.descendants` does.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.nodes(self.descendant_bits[self.node_position[node]])
+
+    def descendant_count(self, node):
+        """Returns the number of descendants of a node without building the set of them.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Number of descendants.
+        :rtype: :py:obj:`int`
+        """
+        return bin(self.descendant_bits[self.node_position[node]]).count('1')
+
+
+class ReachabilityIndex(object):
+
+    """Answers whether one node of a graph is an ancestor of another without storing every node's ancestors, built by
+    :func:`gocats.dag.OboGraph.is_ancestor`. A depth-first search down the graph's children numbers the nodes in
+    post-order, so that the nodes of each subtree of the search's spanning forest have consecutive numbers. A node's
+    descendants are then the numbers within a short, sorted list of intervals: the interval of its own subtree, merged
+    with the intervals of its children, which add the descendants reached through nodes with several parents. Checking
+    a node takes a binary search of one interval list, and most lists hold a single interval.
+    """
+
+    def __init__(self, node_list):
+        """`ReachabilityIndex` initializer. Relationships to nodes which are not in `node_list` are not followed.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph.
+        """
+        order, ordered_count = TransitiveClosure._topological_order(node_list)
+        self.post_order = self._number_nodes(order)
+        self.interval_starts = dict()
+        self.interval_ends = dict()
+        self.cyclic_nodes = set()
+        # Nodes on or below a cycle come last, and may reach one another, so their intervals are merged until none of
+        # them change. Their children are also on or below the cycle, but the other nodes may have them as children.
+        unordered = order[ordered_count:]
+        while any([self._merge_intervals(node) for node in reversed(unordered)]):
+            pass
+        self.cyclic_nodes.update(node for node in unordered if any(child is node or self.is_ancestor(child, node) for child in node.child_node_set if child in self.post_order))
+        for node in reversed(order[:ordered_count]):
+            self._merge_intervals(node)
+
+    @staticmethod
+    def _number_nodes(order):
+        """Numbers nodes in the post-order of a depth-first search of their children, starting from the nodes in the
+        given order that were not reached from an earlier node.
+
+        :param list order: The :class:`gocats.dag.AbstractNode` objects of a graph, parents before children where possible.
+        :return: A :py:obj:`dict` of nodes and their post-order numbers.
+        :rtype: :py:obj:`dict`
+        """
+        node_set = set(order)
+        post_order = dict()
+        visited = set()
+        for root in order:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(root.child_node_set))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in visited and child in node_set:
+                        visited.add(child)
+                        stack.append((child, iter(child.child_node_set)))
+                        break
+                else:
+                    stack.pop()
+                    post_order[node] = len(post_order)
+        return post_order
+
+    def _merge_intervals(self, node):
+        """Sets the intervals of a node to its own subtree's interval merged with the intervals of its children.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Whether the node's intervals changed.
+        :rtype: :py:obj:`bool`
+        """
+        post_order = self.post_order
+        intervals = [(post_order[node], post_order[node])]
+        for child in node.child_node_set:
+            if child in self.interval_starts:
+                intervals.extend(zip(self.interval_starts[child], self.interval_ends[child]))
+            elif child in post_order:
+                intervals.append((post_order[child], post_order[child]))
+        intervals.sort()
+        starts = [intervals[0][0]]
+        ends = [intervals[0][1]]
+        for start, end in intervals[1:]:
+            if start <= ends[-1] + 1:  # Overlapping or adjacent intervals are joined.
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        starts, ends = tuple(starts), tuple(ends)
+        if self.interval_starts.get(node) == starts and self.interval_ends.get(node) == ends:
+            return False
+        self.interval_starts[node] = starts
+        self.interval_ends[node] = ends
+        return True
+
+    def is_ancestor(self, ancestor_node, node):
+        """Returns whether a node is an ancestor of another, as :func:`gocats.dag.OboGraph.is_ancestor` does.
+
+        :param ancestor_node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: True if `ancestor_node` is in the ancestors of `node`, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        if ancestor_node is node:
+            return node in self.cyclic_nodes
+        number = self.post_order[node]
+        starts = self.interval_starts[ancestor_node]
+        interval = bisect.bisect_right(starts, number) - 1
+        return interval >= 0 and self.interval_ends[ancestor_node][interval] >= number
+
+    def ancestors_among(self, node, candidate_nodes):
+        """Returns those of the candidate nodes which are ancestors of a node, as
+        :func:`gocats.dag.OboGraph.ancestors_among` does.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :param candidate_nodes: An iterable of :class:`gocats.dag.AbstractNode` objects of the graph.
+        :return: A :py:obj:`list` of the candidate nodes which are ancestors of `node`, in the order given.
+        :rtype: :py:obj:`list`
+        """
+        number = self.post_order[node]
+        ancestors = list()
+        for candidate in candidate_nodes:
+            if candidate is node:
+                if node in self.cyclic_nodes:
+                    ancestors.append(candidate)
+                continue
+            starts = self.interval_starts[candidate]
+            interval = bisect.bisect_right(starts, number) - 1
+            if interval >= 0 and self.interval_ends[candidate][interval] >= number:
+                ancestors.append(candidate)
+        return ancestors
+
+
+class NodeDepths(object):
+
+    """The depths of every node of a graph below its root nodes, built by :func:`gocats.dag.OboGraph.compute_depths`.
+    Nodes are visited in topological order, parents before children, so a node's depths follow from its parents' depths
+    in one pass. The minimum depth of a node is the length of its shortest path up to a root node, and the maximum depth
+    that of its longest one. Nodes with the same minimum depth are listed together in :py:attr:`levels`, the frontiers of
+    a breadth-first search down from the roots.
+    """
+
+    def __init__(self, node_list, root_nodes):
+        """`NodeDepths` initializer. Relationships to nodes which are not in `node_list` are not followed.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph.
+        :param list root_nodes: The root :class:`gocats.dag.AbstractNode` objects of the graph.
+        """
+        order, ordered_count = TransitiveClosure._topological_order(node_list)
+        root_node_set = set(root_nodes)
+        self.min_depth = dict()
+        self.max_depth = dict()
+        self._top_distance = dict()  # Longest path up to a node without parents, for nodes below no root node.
+        for node in order[:ordered_count]:
+            parents = [parent for parent in node.parent_node_set if parent in self.min_depth]
+            min_depths = [self.min_depth[parent] + 1 for parent in parents if self.min_depth[parent] is not None]
+            max_depths = [self.max_depth[parent] + 1 for parent in parents if self.max_depth[parent] is not None]
+            if node in root_node_set:
+                self.min_depth[node] = 0
+                self.max_depth[node] = max(max_depths or [0])
+            elif min_depths:
+                self.min_depth[node] = min(min_depths)
+                self.max_depth[node] = max(max_depths)
+            else:
+                self.min_depth[node] = self.max_depth[node] = None
+                self._top_distance[node] = max([self._top_distance[parent] + 1 for parent in parents] or [0])
+        # Nodes on or below a cycle have paths of any length, so they have no maximum depth. Their minimum depths are
+        # lowered from their parents' until none of them change.
+        unordered = order[ordered_count:]
+        for node in unordered:
+            self.min_depth[node] = 0 if node in root_node_set else None
+            self.max_depth[node] = None
+        changed = True
+        while changed:
+            changed = False
+            for node in unordered:
+                min_depths = [self.min_depth[parent] for parent in node.parent_node_set if self.min_depth.get(parent) is not None]
+                if min_depths and (self.min_depth[node] is None or min(min_depths) + 1 < self.min_depth[node]):
+                    self.min_depth[node] = min(min_depths) + 1
+                    changed = True
+        self.levels = list()
+        for node in order:
+            depth = self.min_depth[node]
+            if depth is not None:
+                while len(self.levels) <= depth:
+                    self.levels.append(list())
+                self.levels[depth].append(node)
+
+    def node_depth(self, node):
+        """Returns the depth of a node as :func:`gocats.dag.OboGraph.node_depth` does: its minimum depth, or for a node
+        below no root node, one more than the length of its longest path up to a node without parents.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Depth level, or :py:obj:`None` for a node on or below a cycle which is below no root node.
+        :rtype: :py:obj:`int` or :py:obj:`None`
+        """
+        depth = self.min_depth[node]
+        if depth is None and node in self._top_distance:
+            return self._top_distance[node] + 1
+        return depth
+
+
+class RelationshipAdjacency(object):
+
+    """The parents and children of every node of a graph, with the relationships linking them, built by
+    :func:`gocats.dag.OboGraph.relationship_view`. Each relationship is given a bit, and each pair of linked nodes a
+    bit mask of the relationships of the edges between them, so that a :class:`gocats.dag.RelationshipView` selects its
+    relationships' links with one bitwise test per link.
+    """
+
+    def __init__(self, node_list, allowed_relationships=None):
+        """`RelationshipAdjacency` initializer. Edges to nodes which are not in `node_list` are not followed.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph, connected to their edges.
+        :param list allowed_relationships: Optional - The relationships of the graph; edges of other relationships are not followed, as they do not link parents and children in the graph.
+        """
+        self.node_list = list(node_list)
+        self.relationship_codes = dict()
+        self.parent_masks = {node: dict() for node in self.node_list}
+        self.child_masks = {node: dict() for node in self.node_list}
+        for node in self.node_list:
+            for edge in node.edges:
+                if edge.relationship is None or edge.node_pair is None or (allowed_relationships and edge.relationship_id not in allowed_relationships):
+                    continue
+                parent = edge.parent_node
+                if edge.child_node is not node or parent not in self.child_masks:
+                    continue
+                try:
+                    bit = 1 << self.relationship_codes[edge.relationship_id]
+                except KeyError:
+                    self.relationship_codes[edge.relationship_id] = len(self.relationship_codes)
+                    bit = 1 << self.relationship_codes[edge.relationship_id]
+                parent_masks = self.parent_masks[node]
+                parent_masks[parent] = parent_masks.get(parent, 0) | bit
+                child_masks = self.child_masks[parent]
+                child_masks[node] = child_masks.get(node, 0) | bit
+
+    def mask(self, relationship_ids):
+        """Returns the bit mask of some relationships. Relationships which no edge of the graph uses are ignored.
+
+        :param relationship_ids: An iterable of relationship IDs.
+        :return: The bit mask.
+        :rtype: :py:obj:`int`
+        """
+        mask = 0
+        for relationship_id in relationship_ids:
+            if relationship_id in self.relationship_codes:
+                mask |= 1 << self.relationship_codes[relationship_id]
+        return mask
+
+
+class RelationshipView(object):
+
+    """A view of a graph which follows only the edges of some of its relationships, made by
+    :func:`gocats.dag.OboGraph.relationship_view`. The parents and children of each node through those relationships
+    are selected from a :class:`gocats.dag.RelationshipAdjacency` by bit mask when first needed, and the ancestors and
+    descendants of every node are read from the view's own :class:`gocats.dag.TransitiveClosure`, built on first use.
+    The nodes' own parent and child sets are not changed.
+    """
+
+    def __init__(self, adjacency, allowed_relationships):
+        """`RelationshipView` initializer.
+
+        :param adjacency: The :class:`gocats.dag.RelationshipAdjacency` of the graph.
+        :param allowed_relationships: An iterable of the IDs of the relationships followed by the view.
+        """
+        self.adjacency = adjacency
+        self.allowed_relationships = frozenset(allowed_relationships)
+        self.relationship_mask = adjacency.mask(self.allowed_relationships)
+        self._parent_sets = None
+        self._child_sets = None
+        self._closure = None
+
+    @property
+    def parent_sets(self):
+        """:py:obj:`property` holding the set of parents of each node through the view's relationships.
+
+        :return: :py:obj:`dict` of :class:`gocats.dag.AbstractNode` objects mapped to sets of their parents.
+        :rtype: :py:obj:`dict`
+        """
+        if self._parent_sets is None:
+            mask = self.relationship_mask
+            self._parent_sets = {node: set(parent for parent, parent_mask in parent_masks.items() if parent_mask & mask)
+                                 for node, parent_masks in self.adjacency.parent_masks.items()}
+        return self._parent_sets
+
+    @property
+    def child_sets(self):
+        """:py:obj:`property` holding the set of children of each node through the view's relationships.
+
+        :return: :py:obj:`dict` of :class:`gocats.dag.AbstractNode` objects mapped to sets of their children.
+        :rtype: :py:obj:`dict`
+        """
+        if self._child_sets is None:
+            mask = self.relationship_mask
+            self._child_sets = {node: set(child for child, child_mask in child_masks.items() if child_mask & mask)
+                                for node, child_masks in self.adjacency.child_masks.items()}
+        return self._child_sets
+
+    @property
+    def closure(self):
+        """:py:obj:`property` holding the transitive closure of the view, built when first read.
+
+        :return: The transitive closure.
+        :rtype: :class:`gocats.dag.TransitiveClosure`
+        """
+        if self._closure is None:
+            self._closure = TransitiveClosure(self.adjacency.node_list, self.parent_sets, self.child_sets)
+        return self._closure
+
+    def parents(self, node):
+        """Returns the parents of a node through the view's relationships.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.parent_sets[node]
+
+    def children(self, node):
+        """Returns the children of a node through the view's relationships.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.child_sets[node]
+
+    def ancestors(self, node):
+        """Returns the ancestors of a node through the view's relationships.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.closure.ancestors(node)
+
+    def descendants(self, node):
+        """Returns the descendants of a node through the view's relationships.
+
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: Set of :class:`gocats.dag.AbstractNode` objects.
+        :rtype: :py:class:`set`
+        """
+        return self.closure.descendants(node)
+
+    def is_ancestor(self, ancestor_node, node):
+        """Returns whether a node is an ancestor of another through the view's relationships, without building the
+        ancestor set of `node`.
+
+        :param ancestor_node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :param node: A :class:`gocats.dag.AbstractNode` object of the graph.
+        :return: True if `ancestor_node` is in the ancestors of `node`, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        closure = self.closure
+        return bool(closure.ancestor_bits[closure.node_position[node]] >> closure.node_position[ancestor_node] & 1)
+
+
+class PostingsIndex(object):
+
+    """Inverted index of the words in the names and definitions of a graph's nodes, built by
+    :func:`gocats.dag.OboGraph.search`. The nodes are numbered in the order of the graph's node list. Each word has a
+    sorted array of the numbers of the nodes which contain it (its postings) and, for each of those nodes, the positions
+    of the word in the node's name and definition, so that phrases can be matched as well as single words. The
+    positions of a definition's words start one after the end of the name, so a phrase is not matched across the two.
+    """
+
+    def __init__(self, node_list):
+        """`PostingsIndex` initializer.
+
+        :param list node_list: The :class:`gocats.dag.AbstractNode` objects of a graph.
+        """
+        self.nodes = list(node_list)
+        self.postings = dict()
+        self.offsets = dict()
+        self.positions = dict()
+        for number, node in enumerate(self.nodes):
+            node_positions = dict()
+            name_words = WORD_SPLIT.findall(node.name)
+            for position, word in enumerate(name_words):
+                try:
+                    node_positions[word].append(position)
+                except KeyError:
+                    node_positions[word] = [position]
+            for position, word in enumerate(WORD_SPLIT.findall(node.definition), len(name_words) + 1):
+                try:
+                    node_positions[word].append(position)
+                except KeyError:
+                    node_positions[word] = [position]
+            for word, positions in node_positions.items():
+                try:
+                    self.postings[word].append(number)
+                except KeyError:
+                    self.postings[word] = array('I', [number])
+                    self.offsets[word] = array('I', [0])
+                    self.positions[word] = array('I')
+                self.positions[word].extend(positions)
+                self.offsets[word].append(len(self.positions[word]))
+
+    def word_positions(self, word, number):
+        """Returns the positions of a word in the name and definition of a node which contains it.
+
+        :param str word: A word of the index.
+        :param int number: The number of a node in the word's postings.
+        :return: An :py:obj:`array` of positions.
+        :rtype: :py:obj:`array`
+        """
+        entry = bisect.bisect_left(self.postings[word], number)
+        return self.positions[word][self.offsets[word][entry]:self.offsets[word][entry + 1]]
+
+    def phrase(self, phrase):
+        """Returns the numbers of the nodes which contain a phrase.
+
+        :param str phrase: One or more words.
+        :return: A sorted :py:obj:`list` of node numbers.
+        :rtype: :py:obj:`list`
+        """
+        words = WORD_SPLIT.findall(phrase)
+        if not words or any(word not in self.postings for word in words):
+            return []
+        if len(words) == 1:
+            return self.postings[words[0]].tolist()
+        candidates = self.postings[words[0]].tolist()
+        for word in sorted(set(words[1:]), key=lambda word: len(self.postings[word])):
+            candidates = self._intersect(candidates, self.postings[word])
+        numbers = list()
+        for number in candidates:
+            starts = set(self.word_positions(words[0], number))
+            for offset, word in enumerate(words[1:], 1):
+                starts.intersection_update([position - offset for position in self.word_positions(word, number)])
+                if not starts:
+                    break
+            else:
+                numbers.append(number)
+        return numbers
+
+    @staticmethod
+    def _intersect(first, second):
+        """Returns the numbers in both of two sorted sequences, looking each number of the shorter one up in the longer
+        one by binary search from the last match.
+
+        :param first: A sorted sequence of node numbers.
+        :param second: A sorted sequence of node numbers.
+        :return: A sorted :py:obj:`list` of node numbers.
+        :rtype: :py:obj:`list`
+        """
+        if len(first) > len(second):
+            first, second = second, first
+        numbers = list()
+        low = 0
+        for number in first:
+            low = bisect.bisect_left(second, number, low)
+            if low == len(second):
+                break
+            if second[low] == number:
+                numbers.append(number)
+        return numbers
+
+    def search(self, any_of=None, all_of=None, none_of=None):
+        """Returns the nodes which contain any of the phrases in `any_of`, all of the phrases in `all_of` and none of
+        the phrases in `none_of`, as :func:`gocats.dag.OboGraph.search` does.
+
+        :param list any_of: Optional - Phrases of which a node must contain at least one.
+        :param list all_of: Optional - Phrases which a node must all contain.
+        :param list none_of: Optional - Phrases which a node must not contain.
+        :return: A :py:obj:`list` of :class:`gocats.dag.AbstractNode` objects, in the order of the node list.
+        :rtype: :py:obj:`list`
+        """
+        if any_of is not None:
+            numbers = sorted(set().union(*[self.phrase(phrase) for phrase in any_of]))
+        elif not all_of:
+            numbers = list(range(len(self.nodes)))
+        else:
+            numbers = self.phrase(all_of[0])
+            all_of = all_of[1:]
+        for phrase in all_of or ():
+            if not numbers:
+                break
+            numbers = self._intersect(numbers, self.phrase(phrase))
+        if none_of:
+            excluded = set().union(*[self.phrase(phrase) for phrase in none_of])
+            numbers = [number for number in numbers if number not in excluded]
+        return [self.nodes[number] for number in numbers]
 
 
 class AbstractEdge(object):
@@ -409,6 +1524,8 @@ class AbstractEdge(object):
      related.
     """
 
+    __slots__ = ('node_pair_id', 'node_pair', 'relationship_id', 'relationship')
+
     def __init__(self, node1_id, node2_id, relationship_id, node_pair=None):
         """`AbstractEdge` initializer. Node pair refers to a :py:obj:`tuple` of :class:`gocats.dag.AbstractNode` objects that are
         connected by the edge. Defaults to :py:obj:`None` and is later populated.
@@ -434,6 +1551,16 @@ class AbstractEdge(object):
         forward_node_id = self.forward_node.id
         return (str(reverse_node_id+forward_node_id), [reverse_node_id, forward_node_id])
 
+    @property
+    def index_key(self):
+        """:py:obj:`property` defining the key of the edge in :attr:`gocats.dag.OboGraph.edge_index`. It is made of the
+        IDs the edge was created with, so that it is available before the edge's relationship is assigned.
+
+        :return: :py:obj:`tuple` of the edge's first node ID, second node ID and relationship ID.
+        :rtype: :py:obj:`tuple`
+        """
+        return (self.node_pair_id[0], self.node_pair_id[1], self.relationship_id)
+
     @property
     def parent_id(self):
         """:py:obj:`property` defining the ID of the node forward of the current :class:`gocats.dag.AbstractEdge`
@@ -571,6 +1698,8 @@ class AbstractRelationship(object):
     semantic correspondence.
     """
 
+    __slots__ = ('id', 'name', 'category')
+
     def __init__(self):
         """`AbstractRelationship` initializer.
         """
@@ -586,6 +1715,8 @@ class DirectionalRelationship(AbstractRelationship):
     the type of relationship describing the edge to which it is applied.
     """
 
+    __slots__ = ('inverse_relationship_id', 'inverse_relationship', 'direction')
+
     def __init__(self):
         """`DirectionalRelationship` initializer.
         """
@@ -617,6 +1748,9 @@ class NonDirectionalRelationship(AbstractRelationship):
 
     """A non-directional relationship whose edge directionality is either non-existent or semantically irrelevant.
     """
+
+    __slots__ = ()
+
     def __init__(self):
         """`NonDirectionalRelationship` initializer.
         """
@@ -17,6 +17,7 @@ from . import ontologyparser
 from . import godag
 from . import subdag
 from . import tools
+from . import graphcache
 from . import _version
 
 jsonpickle.set_encoder_options('json', sort_keys=True, indent=2)
@@ -59,31 +60,43 @@ def build_graph(args):
     database.close()
 
 
-def build_graph_interpreter(database_file, supergraph_namespace=None, allowed_relationships=None, relationship_directionality='gocats'):
+def build_graph_interpreter(database_file, supergraph_namespace=None, allowed_relationships=None, relationship_directionality='gocats', parse_engine='mmap', jobs=1, cache_dir=None):
     """Creates a graph object of GO, which can be traversed and queried within a Python interpreter.
 
-    :param file_handle database_file: Ontology database file.
+    :param file_handle database_file: Ontology database file (go.obo, or go.json in the OBO Graphs JSON format), which may be compressed (see :func:`gocats.tools.open_input`).
     :param str supergraph_namespace: Optional - Filter graph to a sub-ontology namespace.
     :param list allowed_relationships: Optional - Filter graph to use only those relationships listed.
     :param relationship_directionality: Optional - Any string other than 'gocats' will retain all original GO relationship directionalities. Defaults to reverseing has_part direction.
+    :param str parse_engine: Optional - The :class:`gocats.ontologyparser.GoParser` engine: 'mmap' (default), 'dispatch' or 'regex'. OBO Graphs JSON files are always read by :class:`gocats.ontologyparser.GoJsonParser`.
+    :param int jobs: Optional - The number of worker processes the 'mmap' engine parses with. Defaults to 1.
+    :param str cache_dir: Optional - A directory of compiled graphs (see :mod:`gocats.graphcache`). The graph is loaded from the directory if it was cached before, otherwise it is parsed and cached there.
     :return: A Graph object of the ontology provided.
     :rtype: :py:obj:`class`
     """
-    database = open(database_file, 'r')
     graph = godag.GoGraph(supergraph_namespace, allowed_relationships)
-    go_parser = ontologyparser.GoParser(database, graph, relationship_directionality=relationship_directionality)
+    if cache_dir:
+        cache_file = graphcache.cache_filename(database_file, graph, cache_dir, relationship_directionality)
+        if graphcache.load_graph(cache_file, graph, relationship_directionality):
+            return graph
+    database = tools.open_input(database_file)
+    if tools.uncompressed_basename(database_file).endswith('.json'):
+        go_parser = ontologyparser.GoJsonParser(database, graph, relationship_directionality=relationship_directionality)
+    else:
+        go_parser = ontologyparser.GoParser(database, graph, relationship_directionality=relationship_directionality, engine=parse_engine, jobs=jobs)
     go_parser.parse()
     database.close()
+    if cache_dir:
+        graphcache.save_graph(graph, cache_file, relationship_directionality)
     return graph
 
 
-def create_subgraphs(database_file, keyword_file, output_directory, supergraph_namespace=None, subgraph_namespace=None, supergraph_relationships=['is_a', 'part_of', 'has_part'], subgraph_relationships=['is_a', 'part_of', 'has_part'], map_supersets=False, output_termlist=False, go_basic_scoping=False, network_table_name=None, test=False):
+def create_subgraphs(database_file, keyword_file, output_directory, supergraph_namespace=None, subgraph_namespace=None, supergraph_relationships=['is_a', 'part_of', 'has_part'], subgraph_relationships=['is_a', 'part_of', 'has_part'], map_supersets=False, output_termlist=False, go_basic_scoping=False, network_table_name=None, test=False, parse_engine='mmap', jobs=1, cache_dir=None, match_phrases=False):
     """Creates a graph object of an ontology, processed into :class:`gocats.dag.OboGraph` or to an object that
     inherits from :class:`gocats.dag.OboGraph`, and then extracts subgraphs which represent concepts that are defined
     by a list of provided keywords. Each subgraph is processed into :class:`gocats.subdag.SubGraph`.
 
-    :param database_file: Ontology database file.
-    :param keyword_file: A CSV file with two columns: column 1 naming categories, and column 2 listing search strings (no quotation marks, separated by semicolons).
+    :param database_file: Ontology database file (go.obo, or go.json in the OBO Graphs JSON format), which may be compressed (see :func:`gocats.tools.open_input`).
+    :param keyword_file: A CSV file with two columns: column 1 naming categories, and column 2 listing search strings (no quotation marks, separated by semicolons). May be compressed.
     :param output_directory: The directory where results are stored.
     :param supergraph_namespace: a supergraph sub-ontology to filter e.g. cellular_component, optional
     :param subgraph_namespace: a subgraph sub-ontology to filter e.g. cellular_component, optional
@@ -92,7 +105,11 @@ def create_subgraphs(database_file, keyword_file, output_directory, supergraph_n
     :param map_supersets: whether to allow subgraphs to subsume other subgraphs, logical, optional
     :param output_termlist: whether to create a translation of ontology terms to their names to improve interpretability of dev test results, logical, optional
     :param go-basic-scoping: whether to create a GO graph similar to go-basic with only scoping-type relationships (is_a and part_of), logical, optional
-    :param network_table_name: whether to make a specific name for the network table produced from the subgraphs (defaults to NetworkTable.csv)
+    :param network_table_name: whether to make a specific name for the network table produced from the subgraphs (defaults to Network_table.csv)
+    :param parse_engine: the :class:`gocats.ontologyparser.GoParser` engine used to parse the ontology: 'mmap' (default), 'dispatch' or 'regex', optional
+    :param jobs: the number of worker processes used to parse the ontology with the 'mmap' engine (defaults to 1), optional
+    :param cache_dir: a directory of compiled supergraphs; the supergraph is loaded from it when cached, and cached there after parsing otherwise, optional
+    :param match_phrases: whether a keyword of several words seeds its subgraph only with terms containing it as a phrase, rather than with terms containing any of its words, logical, optional
     :return: None
     :rtype: :py:obj:`None`
     """
@@ -102,23 +119,29 @@ def create_subgraphs(database_file, keyword_file, output_directory, supergraph_n
         subgraph_relationships = ['is_a', 'part_of']
 
     # Building the supergraph
-    database = open(database_file, 'r')
+    database = tools.open_input(database_file)
     output_directory = output_directory
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
-    database_name = os.path.basename(database_file)
-    graph_class = {'go.obo': godag.GoGraph(supergraph_namespace, supergraph_relationships)}
-    try:
-        supergraph = graph_class[database_name]
-    except KeyError:
-        print("The provided ontology filename was not recognized. Please do not rename ontology files. The accepted list of file names are as follows: \n", graph_class.keys())
-        sys.exit()
-    parsing_class = {'go.obo': ontologyparser.GoParser(database, supergraph)}
+    database_name = tools.uncompressed_basename(database_file)
+    graph_class = {'go.obo': godag.GoGraph, 'go.json': godag.GoGraph}
     try:
-        parsing_class[database_name].parse()
+        supergraph = graph_class[database_name](supergraph_namespace, supergraph_relationships)
     except KeyError:
         print("The provided ontology filename was not recognized. Please do not rename ontology files. The accepted list of file names are as follows: \n", graph_class.keys())
         sys.exit()
+    if cache_dir:
+        cache_file = graphcache.cache_filename(database_file, supergraph, cache_dir)
+    if not cache_dir or not graphcache.load_graph(cache_file, supergraph):
+        parsing_class = {'go.obo': ontologyparser.GoParser(database, supergraph, engine=parse_engine, jobs=jobs),
+                         'go.json': ontologyparser.GoJsonParser(database, supergraph)}
+        try:
+            parsing_class[database_name].parse()
+        except KeyError:
+            print("The provided ontology filename was not recognized. Please do not rename ontology files. The accepted list of file names are as follows: \n", graph_class.keys())
+            sys.exit()
+        if cache_dir:
+            graphcache.save_graph(supergraph, cache_file)
     if output_termlist:
         tools.jsonpickle_save(list(supergraph.id_index.keys()), os.path.join(output_directory, "termlist"))
 
@@ -128,15 +151,16 @@ def create_subgraphs(database_file, keyword_file, output_directory, supergraph_n
     tools.jsonpickle_save(id_translation, os.path.join(output_directory, "id_translation"))
 
     database.close()
+    supergraph.compute_closure(descendants_only=True)  # Subgraphs are extended by the descendants of their representative supergraph nodes.
 
     # Building and collecting subgraphs
     subgraph_collection = dict()
-    with open(keyword_file, newline='') as file:
+    with tools.open_input(keyword_file, newline='') as file:
         reader = csv.reader(file, delimiter=',', quoting=csv.QUOTE_MINIMAL)
         for row in reader:
             subgraph_name = row[0]
             keyword_list = [keyword for keyword in re.split(';', row[1])]
-            subgraph_collection[subgraph_name] = subdag.SubGraph.from_filtered_graph(supergraph, subgraph_name, keyword_list, subgraph_namespace, subgraph_relationships)
+            subgraph_collection[subgraph_name] = subdag.SubGraph.from_filtered_graph(supergraph, subgraph_name, keyword_list, subgraph_namespace, subgraph_relationships, match_phrases=match_phrases)
 
     # Handling superset mapping
     if not map_supersets:
@@ -232,6 +256,7 @@ def jsonpickle_clean_graph(graph):
     # remove circular references from the nodes
     for node in graph.node_list:
         node.edges = None
+        node._descendants_closure = node._ancestors_closure = None
         if node.parent_node_set:
             node.parent_node_set = sorted([str(node2.id) for node2 in node.parent_node_set])
         if node.child_node_set:
@@ -244,6 +269,7 @@ def jsonpickle_clean_graph(graph):
     # remove sets or unneeded references from the graph
     if hasattr(graph, "super_graph") and graph.super_graph:
         graph.super_graph = None
+    graph._closure = None
     if graph._orphans:
         graph._orphans = sorted([str(node2.id) for node2 in graph._orphans])
     if graph._leaves:
@@ -278,7 +304,7 @@ def categorize_dataset(dataset_file, term_mapping, output_directory, mapped_data
     """Reads in a Gene Annotation File (GAF) and maps the annotations contained therein to the categories organized by
     GOcats or other methods. Outputs a mapped GAF and a list of unmapped genes in the specified output directory.
 
-    :param dataset_file: A file containing gene annotations.
+    :param dataset_file: A file containing gene annotations, which may be compressed (see :func:`gocats.tools.open_input`).
     :param term_mapping: A dictionary mapping category-defining ontology terms to their subgraph children terms. May be produced by GOcats or another method.
     :param output_directory: The directory where the output file will be stored.
     :param mapped_dataset_filename: The desired name of the mapped GAF.
@@ -315,7 +341,7 @@ def categorize_dataset(dataset_file, term_mapping, output_directory, mapped_data
 
     elif dataset_type == "CSV":
         mapped_rows = []
-        with open(os.path.realpath(dataset_file), 'r') as csv_file:
+        with tools.open_input(dataset_file, newline='') as csv_file:
             csv_reader = csv.reader(csv_file, delimiter=',')
             header = next(csv_reader)
             for row in csv_reader:
@@ -336,22 +362,25 @@ def categorize_dataset(dataset_file, term_mapping, output_directory, mapped_data
         tools.list_to_file(os.path.join(output_directory, 'unmappedEntities'), unmapped_entities)
 
 
-def remap_goterms(go_database, goa_gaf, ancestor_filename, namespace_filename, allowed_relationships, identifier_column):
+def remap_goterms(go_database, goa_gaf, ancestor_filename, namespace_filename, allowed_relationships, identifier_column, jobs=1, cache_dir=None):
     """Reads in a Gene Ontology relationship file, and a Gene Annotation File (GAF), and
     follows the GOcats rules for allowed term-to-term relationships. Generates as output
     a new GAF, and a new term to ontology namespace mapping.
     
-    :param go_database: the gene ontology dataset
-    :param goa_gaf: the gene annotation file
+    :param go_database: the gene ontology dataset, which may be compressed
+    :param goa_gaf: the gene annotation file, which may be compressed
     :param ancestor_filename: the output file containing new gene to ontology mappings
     :param namespace_filename: the output file containing the term to ontology mappings
     :param allowed_relationships: what term to term relationships will be considered (is_a,part_of,has_part) 
     :param identifier_column: which column is being used for the gene identifiers (1)
+    :param jobs: the number of worker processes used to parse the gene ontology (1)
+    :param cache_dir: a directory of compiled gene ontology graphs, see :func:`build_graph_interpreter` (None)
     :return: None
     :rtype: :py:obj:`None`
     """
     
-    graph = build_graph_interpreter(go_database, allowed_relationships=allowed_relationships)
+    graph = build_graph_interpreter(go_database, allowed_relationships=allowed_relationships, jobs=jobs, cache_dir=cache_dir)
+    graph.compute_closure()
     gaf_array = tools.parse_gaf(goa_gaf)
     goa_gene_annotation_dict = defaultdict(set)
     # Building the annotation dictionary
@@ -26,7 +26,9 @@ class GoGraph(OboGraph):
 class GoGraphNode(AbstractNode):
 
     """Extends AbstractNode to include GO relevant information."""
-    
+
+    __slots__ = ()
+
     def __init__(self):
         """`GoGraphNode` initializer. Inherits all properties from :class:`gocats.dag.AbstractNode`.
         """
@@ -0,0 +1,155 @@
+# !/usr/bin/python3
+"""
+A cache of compiled ontology graphs. After an ontology database file is parsed, the graph is saved to a compact binary
+file of flat records (term fields, edges referencing terms by position, relationships, root nodes and the vocabulary
+index). Later runs against the same file load the graph from the cache instead of parsing the file again.
+
+Cache files are named by a hash of the database file's contents together with the settings that change the graph
+(namespace filter, allowed relationships and relationship directionality), so a changed database file or different
+settings never load a stale graph.
+"""
+import hashlib
+import os
+import pickle
+from .dag import AbstractEdge, DirectionalRelationship
+from .godag import GoGraphNode
+from . import _version, tools
+
+CACHE_FORMAT_VERSION = 1  # Increment whenever the layout of the cached records changes.
+CACHE_EXTENSION = '.gocats_cache'
+HASH_BUFFER_SIZE = 1 << 20
+
+
+def file_digest(filename):
+    """Hashes the contents of a file.
+
+    :param file_handle filename: A path to the file.
+    :return: The SHA-256 hex digest of the file's contents.
+    :rtype: :py:obj:`str`
+    """
+    digest = hashlib.sha256()
+    with open(os.path.realpath(filename), 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(HASH_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def graph_settings(graph, relationship_directionality='gocats'):
+    """Returns the settings which, together with the database file, determine the contents of a parsed graph.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object, before or after parsing.
+    :param str relationship_directionality: The relationship directionality given to :class:`gocats.ontologyparser.GoParser`.
+    :return: A :py:obj:`tuple` of the namespace filter, allowed relationships and relationship directionality.
+    :rtype: :py:obj:`tuple`
+    """
+    allowed_relationships = list(graph.allowed_relationships) if graph.allowed_relationships else None
+    return graph.namespace_filter, allowed_relationships, relationship_directionality == 'gocats'
+
+
+def cache_filename(database_file, graph, cache_dir, relationship_directionality='gocats'):
+    """Returns the path of the cache file for a graph of the database file built with the graph's settings.
+
+    :param file_handle database_file: A path to the ontology database file.
+    :param graph: A :class:`gocats.godag.GoGraph` object, before or after parsing.
+    :param str cache_dir: The directory in which cache files are kept.
+    :param str relationship_directionality: The relationship directionality given to :class:`gocats.ontologyparser.GoParser`.
+    :return: A path to the cache file, which may not exist yet.
+    :rtype: :py:obj:`str`
+    """
+    key = hashlib.sha256(repr((CACHE_FORMAT_VERSION, _version.__version__, file_digest(database_file), graph_settings(graph, relationship_directionality))).encode())
+    return os.path.join(cache_dir, key.hexdigest() + CACHE_EXTENSION)
+
+
+def save_graph(graph, filename, relationship_directionality='gocats'):
+    """Saves a parsed graph to a cache file, with :func:`gocats.tools.atomic_output` so that processes loading the
+    cache concurrently never read a partially written file.
+
+    :param graph: A parsed :class:`gocats.godag.GoGraph` object.
+    :param file_handle filename: A path to the cache file, see :func:`cache_filename`.
+    :param str relationship_directionality: The relationship directionality the graph was parsed with.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    node_position = {node.id: position for position, node in enumerate(graph.node_list)}
+    records = {
+        'settings': graph_settings(graph, relationship_directionality),
+        'relationships': [(relationship.id, relationship.name, relationship.category, relationship.direction, relationship.inverse_relationship_id)
+                          for relationship in graph.relationship_index.values()],
+        'nodes': [(node.id, node.name, node.namespace, node.definition, node.obsolete) for node in graph.node_list],
+        'edges': [(node_position[edge.node_pair_id[0]], node_position[edge.node_pair_id[1]], edge.relationship_id) for edge in graph.edge_list],
+        'root_nodes': [node_position[node.id] for node in graph.root_nodes],
+        'vocabulary': [(word, [node_position[node.id] for node in node_set]) for word, node_set in graph.vocab_index.items()],
+        'used_relationships': sorted(graph.used_relationship_set),
+        'relationship_count': list(graph.relationship_count.items()),
+    }
+    with tools.atomic_output(filename) as cache_file:
+        pickle.dump((CACHE_FORMAT_VERSION, records), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_graph(filename, graph, relationship_directionality='gocats'):
+    """Fills an empty graph with the nodes, edges, relationships, root nodes and vocabulary index saved in a cache
+    file. The graph is left unchanged if the cache file does not exist, cannot be read, or was saved in another format
+    or with other settings.
+
+    :param file_handle filename: A path to the cache file, see :func:`cache_filename`.
+    :param graph: An empty :class:`gocats.godag.GoGraph` object, created with the settings of the cached graph.
+    :param str relationship_directionality: The relationship directionality the graph would be parsed with.
+    :return: True if the graph was loaded from the cache, False otherwise.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    try:
+        with open(filename, 'rb') as cache_file:
+            format_version, records = pickle.load(cache_file)
+    except Exception:  # A missing, partial or corrupt cache file is parsed again and replaced.
+        return False
+    if format_version != CACHE_FORMAT_VERSION or records['settings'] != graph_settings(graph, relationship_directionality):
+        return False
+    with tools.gc_paused():
+        _fill_graph(graph, records)
+    return True
+
+
+def _fill_graph(graph, records):
+    """Creates the nodes, edges and relationships of a graph from the records of a cache file.
+
+    :param graph: An empty :class:`gocats.godag.GoGraph` object.
+    :param dict records: The records loaded by :func:`load_graph`.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    for relationship_id, name, category, direction, inverse_relationship_id in records['relationships']:
+        relationship = DirectionalRelationship()
+        relationship.id, relationship.name, relationship.category, relationship.direction = relationship_id, name, category, direction
+        relationship.inverse_relationship_id = inverse_relationship_id
+        graph.relationship_index[relationship_id] = relationship
+
+    nodes = list()
+    for node_id, name, namespace, definition, obsolete in records['nodes']:
+        node = GoGraphNode()
+        node.id, node.name, node.namespace, node.definition, node.obsolete = node_id, name, namespace, definition, obsolete
+        graph.id_index[node_id] = node
+        nodes.append(node)
+    graph.node_list.extend(nodes)
+
+    # Connects the edges as :func:`gocats.dag.AbstractEdge.connect_nodes` would, without its per-node method calls.
+    links_nodes = {relationship_id: not graph.allowed_relationships or relationship_id in graph.allowed_relationships for relationship_id in graph.relationship_index}
+    for position1, position2, relationship_id in records['edges']:
+        node_pair = (nodes[position1], nodes[position2])
+        edge = AbstractEdge(node_pair[0].id, node_pair[1].id, relationship_id, node_pair)
+        relationship = edge.relationship = graph.relationship_index[relationship_id]
+        node_pair[0].edges.add(edge)
+        node_pair[1].edges.add(edge)
+        if links_nodes[relationship_id]:
+            parent_node = node_pair[relationship.direction]
+            child_node = node_pair[(relationship.direction + 1) % 2]
+            child_node.parent_node_set.add(parent_node)
+            if parent_node is not child_node:
+                parent_node.child_node_set.add(child_node)
+        graph._store_edge(edge)
+
+    graph.root_nodes.extend(nodes[position] for position in records['root_nodes'])
+    graph.vocab_index.update((word, set(nodes[position] for position in positions)) for word, positions in records['vocabulary'])
+    graph.used_relationship_set.update(records['used_relationships'])
+    graph.relationship_count.update(records['relationship_count'])
+    graph._orphans = graph._leaves = None  # The nodes were connected without add_edge, so the sets are repopulated when next read.
+    graph._modified = True
@@ -0,0 +1,197 @@
+# !/usr/bin/python3
+"""
+Updates a graph built from one release of an ontology so that it represents a newer release, without rebuilding it.
+The terms of the new release are compared with the nodes of the graph, and only the nodes and edges which differ are
+added, removed or updated, through :func:`gocats.dag.OboGraph.add_node`, :func:`gocats.dag.OboGraph.remove_node`,
+:func:`gocats.dag.OboGraph.add_edge` and :func:`gocats.dag.OboGraph.remove_edges`. Cached ancestor and descendant sets
+are invalidated only for nodes above or below a changed edge.
+
+A patched graph contains the same nodes, edges, relationships, root nodes and vocabulary index as a graph parsed from
+the new release, although nodes and edges which were added are listed after the others.
+"""
+from collections import Counter, defaultdict, namedtuple
+from .dag import AbstractEdge
+from .godag import GoGraphNode
+from .ontologyparser import GoParser, TermRecord, iter_obo_records
+
+GraphDiff = namedtuple('GraphDiff', ['added', 'removed', 'updated', 'typedefs', 'term_records'])
+GraphDiff.__doc__ = """The differences between a graph and a release of its ontology, found by :func:`diff_graph`. `added`, `removed` and
+`updated` are sets of term IDs whose nodes must be added to, removed from, or updated in the graph. `typedefs` is a
+:py:obj:`list` of all :class:`gocats.ontologyparser.TypedefRecord` objects of the release, and `term_records` is a
+:py:obj:`dict` of the :class:`gocats.ontologyparser.TermRecord` objects of every term of the release, keyed by ID."""
+
+
+def diff_graph(graph, database_file):
+    """Compares a graph with a release of its ontology. A term is added or removed when it becomes valid or invalid in
+    the graph (see :func:`gocats.dag.OboGraph.valid_node`), and updated when its name, definition, namespace or edges
+    change.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object built from a previous release of the ontology.
+    :param file_handle database_file: The new release (e.g. go.obo), opened in text or binary mode.
+    :return: The differences between the graph and the release.
+    :rtype: :class:`GraphDiff`
+    """
+    term_records = dict()
+    typedefs = list()
+    for record in iter_obo_records(database_file):
+        if type(record) is TermRecord:
+            term_records[record.id] = record
+        else:
+            typedefs.append(record)
+    valid_ids = set(term_id for term_id, record in term_records.items() if _valid_record(graph, record))
+    added = valid_ids.difference(graph.id_index)
+    removed = set(graph.id_index).difference(valid_ids)
+    updated = set(term_id for term_id in valid_ids.intersection(graph.id_index) if _node_changed(graph, graph.id_index[term_id], term_records[term_id]))
+    return GraphDiff(added, removed, updated, typedefs, term_records)
+
+
+def patch_graph(graph, database_file, relationship_directionality='gocats'):
+    """Updates a graph built from a previous release of its ontology to represent a new release. Only nodes and
+    edges which differ between the releases are changed, and node objects of unchanged terms are kept, so references
+    held to them remain valid.
+
+    :param graph: A :class:`gocats.godag.GoGraph` object built from a previous release of the ontology, e.g. loaded with :func:`gocats.graphcache.load_graph`.
+    :param file_handle database_file: The new release (e.g. go.obo), opened in text or binary mode.
+    :param str relationship_directionality: The relationship directionality the graph was parsed with.
+    :return: The differences which were applied.
+    :rtype: :class:`GraphDiff`
+    """
+    diff = diff_graph(graph, database_file)
+    parser = GoParser(None, graph, relationship_directionality=relationship_directionality)
+    for record in diff.typedefs:
+        if record.id in graph.relationship_index:
+            relationship = graph.relationship_index[record.id]
+            relationship.name, relationship.inverse_relationship_id = record.name, record.inverse_of
+        else:
+            parser._add_typedef_record(record)
+    if any(relationship_id == 'is_a' for record in diff.term_records.values() for _, relationship_id in record.edges):
+        parser._add_is_a_relationship()
+
+    # Edges into new nodes may come from terms which did not change, so those terms' edges are also reconciled.
+    incoming_sources = defaultdict(set)
+    for record in diff.term_records.values():
+        for target_id, _ in record.edges:
+            if target_id in diff.added:
+                incoming_sources[target_id].add(record.id)
+    valid_ids = set(graph.id_index).difference(diff.removed).union(diff.added)
+    reconciled_ids = diff.added.union(diff.updated, *[incoming_sources[term_id] for term_id in diff.added]).intersection(valid_ids)
+    removed_edges = list()
+    for term_id in reconciled_ids.difference(diff.added):
+        stale_edges, _ = _edge_changes(graph, graph.id_index[term_id], diff.term_records[term_id], valid_ids)
+        removed_edges.extend(stale_edges)
+    for term_id in diff.removed:
+        removed_edges.extend(graph.id_index[term_id].edges)
+    removed_edges = set(removed_edges)  # An edge between two removed nodes is listed twice.
+
+    graph.remove_edges(removed_edges)
+    graph.root_nodes[:] = [node for node in graph.root_nodes if node.id not in diff.removed]
+    graph.remove_nodes([graph.id_index[term_id] for term_id in diff.removed])
+    for term_id in diff.updated:
+        _update_node(graph, graph.id_index[term_id], diff.term_records[term_id])
+    for term_id in diff.added:
+        record = diff.term_records[term_id]
+        node = GoGraphNode()
+        node.id, node.name, node.namespace, node.definition, node.obsolete = record.id, record.name, record.namespace, record.definition, record.obsolete
+        graph.add_node(node)
+    for term_id in reconciled_ids:
+        node = graph.id_index[term_id]
+        _, missing_edges = _edge_changes(graph, node, diff.term_records[term_id], valid_ids)
+        for target_id, relationship_id in missing_edges:
+            edge = AbstractEdge(term_id, target_id, relationship_id)
+            edge.relationship = graph.relationship_index[relationship_id]
+            edge.connect_nodes((node, graph.id_index[target_id]), graph.allowed_relationships)
+            graph.add_edge(edge)
+        is_root = not diff.term_records[term_id].edges
+        if is_root and node not in graph.root_nodes:
+            graph.root_nodes.append(node)
+        elif not is_root and node in graph.root_nodes:
+            graph.root_nodes.remove(node)
+        graph._update_node_status([node])  # Its root status may have changed.
+
+    # Relationship use and counts are recounted as the parser counts them, including edges to terms outside the graph.
+    relationship_count = Counter(relationship_id for term_id in valid_ids for _, relationship_id in diff.term_records[term_id].edges
+                                 if not graph.allowed_relationships or relationship_id in graph.allowed_relationships)
+    graph.relationship_count.clear()
+    graph.relationship_count.update(relationship_count)
+    graph.used_relationship_set.update(relationship_count)
+    graph._modified = True
+    return diff
+
+
+def _valid_record(graph, record):
+    """Tests whether the node of a term record would be added to the graph, as :func:`gocats.dag.OboGraph.valid_node`
+    tests nodes.
+
+    :param graph: A :class:`gocats.dag.OboGraph` object.
+    :param record: A :class:`gocats.ontologyparser.TermRecord`.
+    :return: True if the term belongs in the graph, False otherwise.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    return not record.obsolete and (not graph.namespace_filter or record.namespace == graph.namespace_filter)
+
+
+def _node_changed(graph, node, record):
+    """Tests whether a node differs from the term record of a new release.
+
+    :param graph: The :class:`gocats.dag.OboGraph` object containing the node.
+    :param node: A :class:`gocats.dag.AbstractNode` object.
+    :param record: The node's :class:`gocats.ontologyparser.TermRecord` in the new release.
+    :return: True if the node's name, definition, namespace, edges or root status differ from the record.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    if (node.name, node.namespace, node.definition) != (record.name, record.namespace, record.definition):
+        return True
+    if (not record.edges) != (node in graph.root_nodes):
+        return True
+    stale_edges, missing_edges = _edge_changes(graph, node, record, graph.id_index)
+    return bool(stale_edges or missing_edges)
+
+
+def _edge_changes(graph, node, record, valid_ids):
+    """Compares the edges leading from a node, i.e. those listed in its own [Term] stanza, with the edges of its term
+    record.
+
+    :param graph: The :class:`gocats.dag.OboGraph` object containing the node.
+    :param node: A :class:`gocats.dag.AbstractNode` object.
+    :param record: The node's :class:`gocats.ontologyparser.TermRecord`.
+    :param valid_ids: The IDs of the nodes which are, or will be, in the graph. Edges to other terms are not kept.
+    :return: A :py:obj:`list` of the node's :class:`gocats.dag.AbstractEdge` objects missing from the record, and a :py:obj:`list` of (target ID, relationship ID) tuples of the record missing from the node.
+    :rtype: :py:obj:`tuple`
+    """
+    expected_edges = Counter((target_id, relationship_id) for target_id, relationship_id in record.edges
+                             if target_id in valid_ids and (not graph.allowed_relationships or relationship_id in graph.allowed_relationships))
+    stale_edges = list()
+    for edge in node.edges:
+        if edge.node_pair_id[0] == node.id:
+            key = (edge.node_pair_id[1], edge.relationship_id)
+            if expected_edges[key] > 0:
+                expected_edges[key] -= 1
+            else:
+                stale_edges.append(edge)
+    return stale_edges, list(expected_edges.elements())
+
+
+def _update_node(graph, node, record):
+    """Updates the name, namespace and definition of a node from its new term record, moving the node between
+    entries of the vocabulary index when its words change.
+
+    :param graph: The :class:`gocats.dag.OboGraph` object containing the node.
+    :param node: A :class:`gocats.dag.AbstractNode` object.
+    :param record: The node's new :class:`gocats.ontologyparser.TermRecord`.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    if (node.name, node.definition) != (record.name, record.definition):
+        old_vocabulary = set(graph.word_split.findall(node.name + " " + node.definition))
+        new_vocabulary = set(graph.word_split.findall(record.name + " " + record.definition))
+        for word in old_vocabulary.difference(new_vocabulary):
+            graph.vocab_index[word].discard(node)
+            if not graph.vocab_index[word]:
+                del graph.vocab_index[word]
+        for word in new_vocabulary.difference(old_vocabulary):
+            try:
+                graph.vocab_index[word].add(node)
+            except KeyError:
+                graph.vocab_index[word] = set([node])
+        graph._postings_index = None
+    node.name, node.namespace, node.definition = record.name, record.namespace, record.definition
@@ -2,11 +2,54 @@
 """
 A parser which reads ontologies in the OBO format and calls appropriate graph objects to store information in a graph
 representation. Separate parsing classes within this module operate on distinct ontologies in the OBO Foundry to handle
-any subtle differences among ontologies.
+any subtle differences among ontologies. Gene Ontology releases in the OBO Graphs JSON format (go.json) are read by
+:class:`GoJsonParser`.
 """
+import io
+import json
+import mmap
+import multiprocessing
+import os
 import re
-from .dag import AbstractEdge, DirectionalRelationship
+import struct
+from collections import defaultdict, namedtuple
+from .dag import AbstractEdge, DirectionalRelationship, WORD_SPLIT
 from .godag import GoGraphNode
+from . import tools
+
+STANZA_END = re.compile(rb'\n\s')  # A line beginning with whitespace ends a stanza.
+STANZA_TOKEN = re.compile(r"[\w+\:]+")
+
+# Stanza index files begin with a header recording the indexed database file's size and modification time, followed by
+# fixed-width (term ID, stanza offset) entries sorted by term ID. GO IDs are a fixed ten characters long (GO:#######).
+INDEX_EXTENSION = '.gocats_index'
+INDEX_HEADER = struct.Struct('>8sHQQI')  # Magic bytes, format version, database size, modification time (ns), entries.
+INDEX_ID_WIDTH = 10
+INDEX_ENTRY = struct.Struct('>{}sQ'.format(INDEX_ID_WIDTH))
+INDEX_MAGIC = b'GOCATSIX'
+INDEX_VERSION = 1
+
+# OBO Graphs JSON identifies terms and relationships by URI. Relationships are Relation Ontology (RO), Basic Formal
+# Ontology (BFO) or Information Artifact Ontology (IAO) properties, whose OBO IDs are listed here in case a release does
+# not give their shorthand.
+OBO_PURL = 'http://purl.obolibrary.org/obo/'
+GO_PURL = OBO_PURL + 'GO_'
+OBO_IN_OWL = 'http://www.geneontology.org/formats/oboInOwl#'
+OBO_GRAPHS_RELATIONSHIPS = {'is_a': 'is_a', OBO_PURL + 'BFO_0000050': 'part_of', OBO_PURL + 'BFO_0000051': 'has_part',
+                            OBO_PURL + 'BFO_0000066': 'occurs_in', OBO_PURL + 'RO_0002211': 'regulates',
+                            OBO_PURL + 'RO_0002212': 'negatively_regulates', OBO_PURL + 'RO_0002213': 'positively_regulates',
+                            OBO_PURL + 'RO_0002091': 'starts_during', OBO_PURL + 'RO_0002092': 'happens_during',
+                            OBO_PURL + 'RO_0002093': 'ends_during', OBO_PURL + 'RO_0002161': 'never_in_taxon',
+                            OBO_PURL + 'IAO_0000233': 'term_tracker_item'}
+
+TermRecord = namedtuple('TermRecord', ['id', 'name', 'namespace', 'definition', 'obsolete', 'edges'])
+TermRecord.__doc__ = """A lightweight record of an OBO [Term] stanza holding the information used to build graph nodes. `edges` is a
+:py:obj:`list` of (target ID, relationship ID) tuples from the stanza's is_a and relationship lines, in the order they
+appear. Names, namespaces and definitions are lowercased, as they are in graph nodes."""
+
+TypedefRecord = namedtuple('TypedefRecord', ['id', 'name', 'inverse_of'])
+TypedefRecord.__doc__ = """A lightweight record of an OBO [Typedef] stanza. `inverse_of` is :py:obj:`None` if the relationship has no
+inverse."""
 
 
 class OboParser(object):
@@ -30,6 +73,7 @@ class OboParser(object):
         self.end_stanza = re.compile('^\s+')
         self.typedef_stanza = re.compile('^\[Typedef\]')
         self.inverse_tag = re.compile('^inverse_of:')
+        self.stanza_token = STANZA_TOKEN
 
         # May use later.
         # self.comment = re.compile('\!.+')
@@ -41,18 +85,25 @@ class GoParser(OboParser):
     """An ontology parser specific to Gene Ontology"""
 
 
-    def __init__(self, database_file, go_graph, relationship_directionality='gocats'):
+    def __init__(self, database_file, go_graph, relationship_directionality='gocats', engine='dispatch', jobs=1):
         """`GoParser` initializer. Parses a Gene Ontology database file and adds properties found therein to a
         :class:`godag.GoGraph` object. **Importantly:** includes descriptions of semantic directionality of all GO
         relationships.
         :param file_handle database_file: Specify the location of a Gene Ontology .obo file.
         :param go_graph: :class:`gocats.godag.GoGraph` object.
+        :param str engine: Optional - The parsing engine used by :func:`parse`: 'dispatch' (default), 'mmap' or 'regex'.
+        :param int jobs: Optional - The number of worker processes used by the 'mmap' engine. Defaults to 1, parsing in the current process.
         :return: None
         :rtype: :py:obj:`None`
         """
         super().__init__()
         self.database_file = database_file
         self.go_graph = go_graph
+        self.engine = engine
+        self.jobs = jobs
+        self.parse_engines = {'dispatch': self._dispatch_parse, 'mmap': self._mmap_parse, 'regex': self._regex_parse}
+        if self.engine not in self.parse_engines:
+            raise Exception("{} is not a valid parsing engine.\nPlease select from the following: {}".format(self.engine, list(self.parse_engines.keys())))
         # 5 types of relationships: scoping, scaling (grouped with scoping for now), spatiotemporal, active, equivalence (not present here), and other.
         # 1 means that the relationship directionality is conventional, 0 means that the semantic directionality points from node 2 to node 1.
         if relationship_directionality == 'gocats':
@@ -69,7 +120,70 @@ class GoParser(OboParser):
     def parse(self):
         """Parses the ontology database file and accesses the ontology graph object to add information found in the
         database. Once all information is added, this function calls the graph's instantiate_valid_edges function to
-        connect all nodes in the graph by their edges.
+        connect all nodes in the graph by their edges. The parsing engine is chosen by the `engine` parameter of the
+        initializer; all engines produce identical graphs.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.parse_engines[self.engine]()
+        self.go_graph.instantiate_valid_edges()
+
+    def _add_term(self, node, node_edge_list, vocabulary=None, has_edges=None):
+        """Adds a parsed term node and its edges to the graph if the node is valid. Nodes with no edges which are not
+        obsolete are recorded as root nodes.
+
+        :param node: The :class:`gocats.godag.GoGraphNode` created from a [Term] stanza.
+        :param list node_edge_list: The :class:`gocats.dag.AbstractEdge` objects created from the same stanza.
+        :param list vocabulary: Optional - The words of the node name and definition, if they were already split.
+        :param bool has_edges: Optional - Whether the stanza listed any edges, including those of relationships which are not allowed in the graph and were never created. Defaults to whether `node_edge_list` is empty.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if has_edges is None:
+            has_edges = node_edge_list != []
+        if self.go_graph.valid_node(node):
+            self.go_graph.add_node(node, vocabulary)
+            for edge in node_edge_list:
+                if not self.go_graph.allowed_relationships or edge.relationship_id in self.go_graph.allowed_relationships:
+                    self.go_graph.add_edge(edge)
+                    self.go_graph.used_relationship_set.add(edge.relationship_id)
+            if not has_edges and node.obsolete == False:  # Have to look at the local edge list because nodes have not been linked with edges yet. Entire graph must be populated first. This is the only way to do this on-the-fly.
+                self.go_graph.root_nodes.append(node)  # make root nodes a set of all namespaces used in the ontology.
+
+    def _add_is_a_relationship(self):
+        """Adds the 'is_a' relationship, which has no [Typedef] stanza in OBO files, to the graph the first time it is
+        encountered.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if "is_a" not in self.go_graph.relationship_index:
+            is_a_relationship = DirectionalRelationship()
+            is_a_relationship.id = "is_a"
+            is_a_relationship.name = "is a"
+            is_a_relationship.category = self.relationship_mapping["is_a"][0]
+            is_a_relationship.direction = self.relationship_mapping["is_a"][1]
+            self.go_graph.used_relationship_set.add(is_a_relationship.id)
+            self.go_graph.add_relationship(is_a_relationship)
+
+    def _add_typedef(self, relationship_obj):
+        """Assigns GOcats' semantic category and directionality to a relationship parsed from a [Typedef] stanza and
+        adds it to the graph.
+
+        :param relationship_obj: The :class:`gocats.dag.DirectionalRelationship` created from a [Typedef] stanza.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        properties = self.relationship_mapping[relationship_obj.id]
+        relationship_obj.category = properties[0]
+        relationship_obj.direction = properties[1]
+        self.go_graph.add_relationship(relationship_obj)
+
+    def _regex_parse(self):
+        """The original parsing engine. Tests every line against the regular expressions defined in
+        :class:`OboParser` and extracts values with :py:func:`re.findall`. Kept so that other engines can be checked
+        against it.
 
         :return: None
         :rtype: :py:obj:`None`
@@ -105,14 +219,7 @@ class GoParser(OboParser):
                 elif re.match(self.is_a, line):
                     node_edge = AbstractEdge(curr_stanza_id, re.findall(self.go_term, line)[0], 'is_a')  # node1, node2, relationship
                     node_edge_list.append(node_edge)
-                    if "is_a" not in self.go_graph.relationship_index:
-                        is_a_relationship = DirectionalRelationship()
-                        is_a_relationship.id = "is_a"
-                        is_a_relationship.name = "is a"
-                        is_a_relationship.category = self.relationship_mapping["is_a"][0]
-                        is_a_relationship.direction = self.relationship_mapping["is_a"][1]
-                        self.go_graph.used_relationship_set.add(is_a_relationship.id)
-                        self.go_graph.add_relationship(is_a_relationship)
+                    self._add_is_a_relationship()
 
                 elif re.match(self.relationship_match, line):
                     relationship_id = re.findall("[\w]+", line)[1]  # line example: relationship: part_of GO:0040025 ! vuval development
@@ -123,31 +230,733 @@ class GoParser(OboParser):
                     node.obsolete = True
 
                 elif re.match(self.end_stanza, line):
-                    if self.go_graph.valid_node(node):
-                        self.go_graph.add_node(node)
-                        for edge in node_edge_list:
-                            if not self.go_graph.allowed_relationships or edge.relationship_id in self.go_graph.allowed_relationships:
-                                self.go_graph.add_edge(edge)
-                                self.go_graph.used_relationship_set.add(edge.relationship_id)
-                        if node_edge_list == [] and node.obsolete == False:  # Have to look at the local edge list because nodes have not been linked with edges yet. Entire graph must be populated first. This is the only way to do this on-the-fly.
-                            self.go_graph.root_nodes.append(node)  # make root nodes a set of all namespaces used in the ontology.
+                    self._add_term(node, node_edge_list)
                     is_term = False
 
             elif is_typedef:
                 if re.match(self.stanza_id, line):
-                    relationship_obj.id = re.findall(r"[\w+\:]+", line)[1]
+                    relationship_obj.id = re.findall(self.stanza_token, line)[1]
 
                 elif re.match(self.stanza_name, line):
-                    relationship_obj.name = re.findall(r"[\w+\:]+", line)[1]
+                    relationship_obj.name = re.findall(self.stanza_token, line)[1]
 
                 elif re.match(self.inverse_tag, line):
-                    relationship_obj.inverse_relationship_id = re.findall(r"[\w+\:]+", line)[1]
+                    relationship_obj.inverse_relationship_id = re.findall(self.stanza_token, line)[1]
 
                 elif re.match(self.end_stanza, line):
-                    properties = self.relationship_mapping[relationship_obj.id]
-                    relationship_obj.category = properties[0]
-                    relationship_obj.direction = properties[1]
-                    self.go_graph.add_relationship(relationship_obj)
+                    self._add_typedef(relationship_obj)
                     is_typedef = False
 
-        self.go_graph.instantiate_valid_edges()
+    def _dispatch_parse(self):
+        """The default parsing engine. Splits each line once at the colon that ends its tag and dispatches on that tag,
+        extracting values by slicing instead of matching regular expressions. GO IDs are a fixed ten characters long
+        (GO:#######), so they are sliced directly from their known offsets. Builds the same graph as
+        :func:`_regex_parse`.
+
+        The graph's filters are applied while parsing: the rest of a term stanza is skipped once its namespace is
+        outside the graph's namespace filter or the term is found to be obsolete, and relationship lines of
+        relationships which are not allowed in the graph are never made into edges.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        is_term = False
+        is_typedef = False
+        namespace_filter = self.go_graph.namespace_filter
+        allowed_relationships = self.go_graph.allowed_relationships
+
+        for line in self.database_file:
+            tag = line[:line.find(':')]
+
+            if is_term:
+                if tag == 'is_a':  # line example: is_a: GO:0048308 ! organelle inheritance
+                    if not skip_term:
+                        node_edge_list.append(AbstractEdge(curr_stanza_id, line[6:16], 'is_a'))
+                    has_edges = True
+                    self._add_is_a_relationship()
+
+                elif skip_term:  # The term will not be added to the graph, so only the end of its stanza is looked for.
+                    if line[:1].isspace():
+                        is_term = False
+
+                elif tag == 'def':
+                    start = line.find('"') + 1
+                    node.definition = line[start:line.find('"', start)].lower()
+
+                elif tag == 'name':
+                    node.name = line[6:-1].lower()
+
+                elif tag == 'id':
+                    node.id = line[4:14]
+                    curr_stanza_id = node.id
+
+                elif tag == 'namespace':
+                    node.namespace = line[11:-1].lower()
+                    if namespace_filter and node.namespace != namespace_filter:
+                        skip_term = True
+
+                elif tag == 'relationship':  # line example: relationship: part_of GO:0040025 ! vuval development
+                    relationship_id, _, target = line[14:].partition(' ')
+                    if not allowed_relationships or relationship_id in allowed_relationships:
+                        node_edge_list.append(AbstractEdge(curr_stanza_id, target[:10], relationship_id))
+                    has_edges = True
+
+                elif tag == 'is_obsolete':
+                    if line[13:17] == 'true':
+                        node.obsolete = True
+                        skip_term = True
+
+                elif line[:1].isspace():
+                    self._add_term(node, node_edge_list, has_edges=has_edges)
+                    is_term = False
+
+            elif is_typedef:  # Typedef stanzas are few, so their values are still tokenized by regular expression.
+                if tag == 'id':
+                    relationship_obj.id = re.findall(self.stanza_token, line)[1]
+
+                elif tag == 'name':
+                    relationship_obj.name = re.findall(self.stanza_token, line)[1]
+
+                elif tag == 'inverse_of':
+                    relationship_obj.inverse_relationship_id = re.findall(self.stanza_token, line)[1]
+
+                elif line[:1].isspace():
+                    self._add_typedef(relationship_obj)
+                    is_typedef = False
+
+            elif line.startswith('[Term]'):
+                is_term = True
+                skip_term = False
+                has_edges = False
+                node = GoGraphNode()
+                node_edge_list = []
+
+            elif line.startswith('[Typedef]'):
+                is_typedef = True
+                relationship_obj = DirectionalRelationship()
+
+    def _mmap_parse(self):
+        """A bytes-level parsing engine. Memory-maps the database file and locates [Term] and [Typedef] stanza
+        boundaries and the tags within each stanza with :py:meth:`bytes.find`, decoding only the values which are
+        stored in the graph. Lines of the file are never created as Python objects. Falls back to
+        :func:`_dispatch_parse` when the database file is not a plain file on disk that can be memory-mapped. Builds the
+        same graph as :func:`_regex_parse`.
+
+        When the parser was given more than one job, the stanzas are parsed by :func:`_parallel_parse` instead.
+
+        Term stanzas outside the graph's namespace filter are skipped after reading only their namespace, and edges of
+        relationships which are not allowed in the graph are never created.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        data = map_database_file(self.database_file)
+        if data is None:
+            self._dispatch_parse()
+            return
+        namespace_filter = self.go_graph.namespace_filter
+        with data:
+            if self.jobs > 1:
+                self._parallel_parse(data)
+                return
+            for stanza_type, stanza in iter_stanza_bytes(data):
+                if stanza_type == b'[Term]':
+                    if namespace_filter and stanza_namespace(stanza) != namespace_filter:
+                        if b'\nis_a: ' in stanza:
+                            self._add_is_a_relationship()
+                        continue
+                    self._add_term_record(parse_term_stanza(stanza))
+                elif stanza_type == b'[Typedef]':
+                    self._add_typedef_record(parse_typedef_stanza(stanza))
+
+    def _parallel_parse(self, data):
+        """Splits the mapped database file into byte ranges at stanza boundaries and parses the ranges in a pool of
+        `jobs` worker processes with :func:`parse_stanza_range`. Each worker maps the file itself and returns plain
+        term and typedef records, which are added to the graph in file order as they arrive, so the graph is identical
+        to the one built by a serial parse.
+
+        :param data: The memory-mapped database file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        database_path = os.path.realpath(self.database_file.name)
+        boundaries = split_stanza_ranges(data, self.jobs * 4)  # More ranges than jobs keeps every worker busy.
+        with multiprocessing.Pool(self.jobs) as pool:
+            for records, skipped_is_a in pool.imap(parse_stanza_range, [(database_path, start, end, self.go_graph.namespace_filter) for start, end in zip(boundaries[:-1], boundaries[1:])]):
+                if skipped_is_a:
+                    self._add_is_a_relationship()
+                for stanza_type, record, vocabulary in records:
+                    if stanza_type == b'[Term]':
+                        self._add_term_record(record, vocabulary)
+                    elif stanza_type == b'[Typedef]':
+                        self._add_typedef_record(record)
+
+    def _add_term_record(self, record, vocabulary=None):
+        """Creates a node and its edges from a term record made by :func:`parse_term_stanza` and adds them to the graph.
+
+        :param record: A :class:`TermRecord`.
+        :param list vocabulary: Optional - The words of the term name and definition, if they were already split.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        node = GoGraphNode()
+        node.id, node.name, node.namespace, node.definition, node.obsolete, edge_records = record
+        if any(relationship_id == 'is_a' for _, relationship_id in edge_records):
+            self._add_is_a_relationship()
+        allowed_relationships = self.go_graph.allowed_relationships
+        node_edge_list = [AbstractEdge(node.id, target_id, relationship_id) for target_id, relationship_id in edge_records if not allowed_relationships or relationship_id in allowed_relationships]
+        self._add_term(node, node_edge_list, vocabulary, has_edges=edge_records != [])
+
+    def _add_typedef_record(self, record):
+        """Creates a relationship from a typedef record made by :func:`parse_typedef_stanza` and adds it to the graph.
+
+        :param record: A :class:`TypedefRecord`.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        relationship_obj = DirectionalRelationship()
+        relationship_obj.id, relationship_obj.name, relationship_obj.inverse_relationship_id = record
+        self._add_typedef(relationship_obj)
+
+
+class GoJsonParser(GoParser):
+
+    """A parser for Gene Ontology releases in the OBO Graphs JSON format (go.json). The whole file is decoded at once by
+    the :py:mod:`json` module, and nodes, edges and relationships are created from the decoded objects with the same
+    semantics as :class:`GoParser`, including the GOcats relationship directionality."""
+
+    def __init__(self, database_file, go_graph, relationship_directionality='gocats'):
+        """`GoJsonParser` initializer.
+
+        :param file_handle database_file: Specify the location of a Gene Ontology .json file, opened in text or binary mode.
+        :param go_graph: :class:`gocats.godag.GoGraph` object.
+        :param str relationship_directionality: Optional - Any string other than 'gocats' will retain all original GO relationship directionalities.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        super().__init__(database_file, go_graph, relationship_directionality=relationship_directionality)
+
+    def parse(self):
+        """Decodes the database file and adds the terms, edges and relationships of every graph it contains to the
+        ontology graph object, then calls the graph's instantiate_valid_edges function to connect all nodes in the graph
+        by their edges.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with tools.gc_paused():
+            document = json.load(self.database_file)
+            for json_graph in document.get('graphs', []):
+                self._add_json_graph(json_graph)
+            del document
+            self.go_graph.instantiate_valid_edges()
+
+    def _add_json_graph(self, json_graph):
+        """Adds the GO terms and relationships of one decoded OBO Graphs graph object to the graph. Relationship
+        properties are identified by their oboInOwl shorthand, or by :data:`OBO_GRAPHS_RELATIONSHIPS`; properties
+        without a GOcats relationship mapping are ignored.
+
+        A term is a root node when it is the subject of no edges at all, as a [Term] stanza without is_a or
+        relationship lines is in :class:`GoParser`. Terms outside the graph's namespace filter are skipped without
+        reading their other values, and edges of relationships which are not allowed in the graph are never created.
+
+        :param dict json_graph: A graph object decoded from an OBO Graphs JSON file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        relationship_ids = dict(OBO_GRAPHS_RELATIONSHIPS)
+        property_nodes = list()
+        term_nodes = list()
+        for json_node in json_graph.get('nodes', []):
+            if json_node.get('type') == 'PROPERTY':
+                shorthand = basic_property_value(json_node, OBO_IN_OWL + 'shorthand')
+                if shorthand:
+                    relationship_ids[json_node['id']] = shorthand
+                property_nodes.append(json_node)
+            elif json_node.get('type') == 'CLASS' and json_node['id'].startswith(GO_PURL):
+                term_nodes.append(json_node)
+
+        inverses = dict()
+        subject_edges = defaultdict(list)
+        for json_edge in json_graph.get('edges', []):
+            if json_edge['pred'] == 'inverseOf':
+                inverses[json_edge['sub']] = json_edge['obj']
+            else:
+                subject_edges[json_edge['sub']].append(json_edge)
+                if json_edge['pred'] == 'is_a' and json_edge['sub'].startswith(GO_PURL):
+                    self._add_is_a_relationship()
+
+        for json_node in property_nodes:
+            relationship_id = relationship_ids.get(json_node['id'])
+            if relationship_id in self.relationship_mapping and relationship_id != 'is_a':
+                relationship_obj = DirectionalRelationship()
+                relationship_obj.id = relationship_id
+                label_tokens = re.findall(self.stanza_token, json_node.get('lbl', ''))
+                relationship_obj.name = label_tokens[0] if label_tokens else ''  # The first word, as the OBO engines keep it.
+                relationship_obj.inverse_relationship_id = relationship_ids.get(inverses.get(json_node['id']))
+                self._add_typedef(relationship_obj)
+
+        namespace_filter = self.go_graph.namespace_filter
+        allowed_relationships = self.go_graph.allowed_relationships
+        relationship_index = self.go_graph.relationship_index
+        for json_node in term_nodes:
+            json_edges = subject_edges.get(json_node['id'], [])
+            namespace = (basic_property_value(json_node, OBO_IN_OWL + 'hasOBONamespace') or '').lower()
+            if namespace_filter and namespace != namespace_filter:
+                continue
+            meta = json_node.get('meta', {})
+            node = GoGraphNode()
+            node.id = obo_graphs_id(json_node['id'])
+            node.name = json_node.get('lbl', '').lower()
+            node.namespace = namespace
+            node.definition = meta.get('definition', {}).get('val', '').lower()
+            node.obsolete = meta.get('deprecated', False)
+            node_edge_list = list()
+            for json_edge in json_edges:
+                relationship_id = relationship_ids.get(json_edge['pred'])
+                if relationship_id in relationship_index and (not allowed_relationships or relationship_id in allowed_relationships):
+                    node_edge_list.append(AbstractEdge(node.id, obo_graphs_id(json_edge['obj']), relationship_id))
+            self._add_term(node, node_edge_list, has_edges=json_edges != [])
+
+
+def obo_graphs_id(uri):
+    """Converts an OBO PURL, as used by OBO Graphs JSON, to an OBO ID (e.g. http://purl.obolibrary.org/obo/GO_0005634
+    to GO:0005634).
+
+    :param str uri: A term URI.
+    :return: The OBO ID, or the URI itself if it is not an OBO PURL.
+    :rtype: :py:obj:`str`
+    """
+    if uri.startswith(OBO_PURL):
+        return uri[len(OBO_PURL):].replace('_', ':', 1)
+    return uri
+
+
+def basic_property_value(json_node, predicate):
+    """Returns the value of a basic property of a decoded OBO Graphs node object, such as its oboInOwl namespace.
+
+    :param dict json_node: A node object decoded from an OBO Graphs JSON file.
+    :param str predicate: The URI of the property.
+    :return: The first value of the property, or :py:obj:`None` if the node does not have it.
+    :rtype: :py:obj:`str` or :py:obj:`None`
+    """
+    for property_value in json_node.get('meta', {}).get('basicPropertyValues', []):
+        if property_value.get('pred') == predicate:
+            return property_value.get('val')
+    return None
+
+
+def iter_obo_records(database_file):
+    """Generates a lightweight record for every [Term] and [Typedef] stanza of an OBO file, one at a time, without
+    building a graph. Memory use does not grow with the size of the file, so the records can be streamed to collect e.g.
+    the IDs, names or namespaces of all terms. Plain files on disk are memory-mapped and scanned as bytes as in the
+    'mmap' engine of :class:`GoParser`; any other file object is read line by line.
+
+    Records are generated for obsolete terms and for every namespace. Stanzas are delimited exactly as
+    :class:`GoParser` delimits them.
+
+    :param file_handle database_file: An OBO file (e.g. go.obo) opened in text or binary mode.
+    :return: Generates :class:`TermRecord` and :class:`TypedefRecord` objects in file order.
+    :rtype: :py:obj:`generator`
+    """
+    data = map_database_file(database_file)
+    if data is None:
+        stanzas = iter_stanza_lines(database_file)
+    else:
+        stanzas = iter_stanza_bytes(data)
+    try:
+        for stanza_type, stanza in stanzas:
+            if stanza_type == b'[Term]':
+                yield parse_term_stanza(stanza)
+            elif stanza_type == b'[Typedef]':
+                yield parse_typedef_stanza(stanza)
+    finally:
+        if data is not None:
+            data.close()
+
+
+def iter_term_records(database_file):
+    """Generates a :class:`TermRecord` for every [Term] stanza of an OBO file. See :func:`iter_obo_records`.
+
+    :param file_handle database_file: An OBO file (e.g. go.obo) opened in text or binary mode.
+    :return: Generates :class:`TermRecord` objects in file order.
+    :rtype: :py:obj:`generator`
+    """
+    for record in iter_obo_records(database_file):
+        if type(record) is TermRecord:
+            yield record
+
+
+class StanzaIndex(object):
+
+    """Random access to the [Term] stanzas of an OBO file through a sidecar index file of the byte offset of every term
+    stanza, keyed by its ID and by each of its alt_ids. The index is built by :func:`build_stanza_index` the first time
+    it is needed for a release, and is rebuilt automatically when the database file changes. Lookups binary-search the
+    memory-mapped index and parse only the requested stanza, so they take well under a millisecond and do not need the
+    ontology graph.
+
+    May be used as a context manager, which closes the index when the block ends.
+    """
+
+    def __init__(self, database_path, index_path=None):
+        """`StanzaIndex` initializer. Builds the index file if it does not exist or was built from a different
+        version of the database file.
+
+        :param file_handle database_path: A path to an uncompressed OBO file, e.g. go.obo.
+        :param file_handle index_path: Optional - A path to the index file. Defaults to the database path with '.gocats_index' appended.
+        """
+        self.database_path = os.path.realpath(database_path)
+        self.index_path = index_path if index_path else self.database_path + INDEX_EXTENSION
+        if not stanza_index_current(self.database_path, self.index_path):
+            build_stanza_index(self.database_path, self.index_path)
+        with open(self.index_path, 'rb') as index_file:
+            self._index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.database_path, 'rb') as database_file:
+            self._data = mmap.mmap(database_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._entry_count = INDEX_HEADER.unpack_from(self._index)[4]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._entry_count
+
+    def __contains__(self, term_id):
+        return self.offset(term_id) is not None
+
+    def close(self):
+        """Closes the memory maps of the index and database files.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self._index.close()
+        self._data.close()
+
+    def offset(self, term_id):
+        """Finds the byte offset of the stanza of a term ID or alt_id.
+
+        :param str term_id: A GO ID, e.g. 'GO:0005634'.
+        :return: The offset of the stanza's [Term] header in the database file, or :py:obj:`None` if the ID is not indexed.
+        :rtype: :py:obj:`int` or :py:obj:`None`
+        """
+        key = term_id.encode()
+        if len(key) != INDEX_ID_WIDTH:
+            return None
+        low, high = 0, self._entry_count
+        while low < high:
+            middle = (low + high) // 2
+            position = INDEX_HEADER.size + middle * INDEX_ENTRY.size
+            entry_id = self._index[position:position + INDEX_ID_WIDTH]
+            if entry_id < key:
+                low = middle + 1
+            elif entry_id > key:
+                high = middle
+            else:
+                return INDEX_ENTRY.unpack_from(self._index, position)[1]
+        return None
+
+    def lookup(self, term_id):
+        """Parses the stanza of a term ID or alt_id. An alt_id returns the record of the term it is an alternate ID of.
+
+        :param str term_id: A GO ID, e.g. 'GO:0005634'.
+        :return: The term's record made by :func:`parse_term_stanza`, or :py:obj:`None` if the ID is not indexed.
+        :rtype: :class:`TermRecord` or :py:obj:`None`
+        """
+        offset = self.offset(term_id)
+        if offset is None:
+            return None
+        return self._parse_stanza_at(offset)
+
+    def lookup_many(self, term_ids):
+        """Parses the stanzas of several term IDs or alt_ids, in file order to read the database file sequentially.
+
+        :param term_ids: An iterable of GO IDs.
+        :return: A :py:obj:`dict` of the given IDs to their :class:`TermRecord`, omitting IDs which are not indexed.
+        :rtype: :py:obj:`dict`
+        """
+        offsets = sorted((offset, term_id) for term_id, offset in ((term_id, self.offset(term_id)) for term_id in set(term_ids)) if offset is not None)
+        records = dict()
+        for offset, term_id in offsets:
+            records[term_id] = self._parse_stanza_at(offset)
+        return records
+
+    def _parse_stanza_at(self, offset):
+        """Parses the [Term] stanza whose header begins at an offset of the database file.
+
+        :param int offset: An offset found by :func:`offset`.
+        :return: The term's record made by :func:`parse_term_stanza`.
+        :rtype: :class:`TermRecord`
+        """
+        for _, _, stanza in iter_stanza_offsets(self._data, offset, offset + 1):
+            return parse_term_stanza(stanza)
+        return None
+
+
+def build_stanza_index(database_path, index_path=None):
+    """Builds the sidecar index file of :class:`StanzaIndex` for an OBO file. Every complete [Term] stanza is indexed
+    by its ID and its alt_ids; an alt_id which is also the ID of another term is indexed to that term. The file is
+    written with :func:`gocats.tools.atomic_output`, so that concurrent processes never read a partial index.
+
+    :param file_handle database_path: A path to an uncompressed OBO file, e.g. go.obo.
+    :param file_handle index_path: Optional - A path to the index file. Defaults to the database path with '.gocats_index' appended.
+    :return: The path to the index file.
+    :rtype: :py:obj:`str`
+    """
+    database_path = os.path.realpath(database_path)
+    if not index_path:
+        index_path = database_path + INDEX_EXTENSION
+    term_offsets = dict()
+    alt_id_offsets = dict()
+    with open(database_path, 'rb') as database_file:
+        database_stat = os.fstat(database_file.fileno())
+        data = map_database_file(database_file)
+        if data is None:
+            raise Exception("{} cannot be indexed. Stanza indexes require an uncompressed, non-empty OBO file.".format(database_path))
+        with data:
+            for offset, stanza_type, stanza in iter_stanza_offsets(data):
+                if stanza_type == b'[Term]':
+                    position = stanza.find(b'\nid:')
+                    if position != -1:
+                        term_offsets[stanza[position + 5:position + 5 + INDEX_ID_WIDTH]] = offset
+                    position = stanza.find(b'\nalt_id: ')
+                    while position != -1:
+                        alt_id_offsets[stanza[position + 9:position + 9 + INDEX_ID_WIDTH]] = offset
+                        position = stanza.find(b'\nalt_id: ', position + 9)
+    alt_id_offsets.update(term_offsets)
+    entries = sorted(alt_id_offsets.items())
+    with tools.atomic_output(index_path) as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, database_stat.st_size, database_stat.st_mtime_ns, len(entries)))
+        index_file.write(b''.join(INDEX_ENTRY.pack(term_id, offset) for term_id, offset in entries))
+    return index_path
+
+
+def stanza_index_current(database_path, index_path):
+    """Tests whether an index file exists and was built from the current version of a database file, as judged by the
+    database file's size and modification time.
+
+    :param file_handle database_path: A path to an OBO file.
+    :param file_handle index_path: A path to an index file built by :func:`build_stanza_index`.
+    :return: True if the index can be used, False if it must be built.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    try:
+        with open(index_path, 'rb') as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+        database_stat = os.stat(database_path)
+    except OSError:
+        return False
+    if len(header) != INDEX_HEADER.size:
+        return False
+    magic, version, size, modification_time, _ = INDEX_HEADER.unpack(header)
+    return (magic, version, size, modification_time) == (INDEX_MAGIC, INDEX_VERSION, database_stat.st_size, database_stat.st_mtime_ns)
+
+
+def map_database_file(database_file):
+    """Memory-maps an open database file for reading, if it is a plain file on disk.
+
+    :param file_handle database_file: A database file opened in text or binary mode.
+    :return: A read-only :py:class:`mmap.mmap` of the whole file, or :py:obj:`None` when the file cannot be mapped.
+    :rtype: :py:class:`mmap.mmap` or :py:obj:`None`
+    """
+    raw_file = getattr(getattr(database_file, 'buffer', database_file), 'raw', None)
+    if not isinstance(raw_file, io.FileIO):
+        return None
+    try:
+        return mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # Empty files cannot be mapped.
+        return None
+
+
+def parse_term_stanza(stanza):
+    """Parses the bytes of a [Term] stanza into a term record, decoding only the values kept in the graph. GO IDs are
+    sliced from their known offsets, as in :func:`GoParser._dispatch_parse`.
+
+    :param bytes stanza: A stanza body generated by :func:`iter_stanza_bytes`.
+    :return: A record of the term.
+    :rtype: :class:`TermRecord`
+    """
+    term_id = name = namespace = definition = ''
+    obsolete = False
+    position = stanza.find(b'\nid:')
+    if position != -1:
+        term_id = stanza[position + 5:position + 15].decode()
+    position = stanza.find(b'\nname: ')
+    if position != -1:
+        position += 7
+        name = stanza[position:stanza.find(b'\n', position)].decode().lower()
+    namespace = stanza_namespace(stanza)
+    position = stanza.find(b'\ndef:')
+    if position != -1:
+        position = stanza.find(b'"', position) + 1
+        definition = stanza[position:stanza.find(b'"', position)].decode().lower()
+    position = stanza.find(b'\nis_obsolete:')
+    if position != -1 and stanza[position + 14:position + 18] == b'true':
+        obsolete = True
+
+    # is_a and relationship lines are located separately and then put back in the order they appear.
+    located_edges = []
+    position = stanza.find(b'\nis_a: ')
+    while position != -1:
+        located_edges.append((position, stanza[position + 7:position + 17].decode(), 'is_a'))
+        position = stanza.find(b'\nis_a: ', position + 7)
+    position = stanza.find(b'\nrelationship: ')
+    if position != -1:
+        while position != -1:
+            relationship_end = stanza.find(b' ', position + 15)
+            located_edges.append((position, stanza[relationship_end + 1:relationship_end + 11].decode(), stanza[position + 15:relationship_end].decode()))
+            position = stanza.find(b'\nrelationship: ', position + 15)
+        located_edges.sort()
+    return TermRecord(term_id, name, namespace, definition, obsolete, [(target_id, relationship_id) for _, target_id, relationship_id in located_edges])
+
+
+def stanza_namespace(stanza):
+    """Returns the namespace of a [Term] stanza, lowercased as it is in graph nodes.
+
+    :param bytes stanza: A stanza body generated by :func:`iter_stanza_bytes`.
+    :return: The namespace, or an empty string if the stanza has no namespace line.
+    :rtype: :py:obj:`str`
+    """
+    position = stanza.find(b'\nnamespace: ')
+    if position == -1:
+        return ''
+    position += 12
+    return stanza[position:stanza.find(b'\n', position)].decode().lower()
+
+
+def parse_typedef_stanza(stanza):
+    """Parses the bytes of a [Typedef] stanza into a typedef record.
+
+    :param bytes stanza: A stanza body generated by :func:`iter_stanza_bytes`.
+    :return: A record of the relationship.
+    :rtype: :class:`TypedefRecord`
+    """
+    values = {b'\nid:': '', b'\nname:': '', b'\ninverse_of:': None}
+    for tag in values:
+        position = stanza.find(tag)
+        if position != -1:
+            line = stanza[position + 1:stanza.find(b'\n', position + 1)].decode()
+            values[tag] = re.findall(STANZA_TOKEN, line)[1]
+    return TypedefRecord(*values.values())
+
+
+def parse_stanza_range(arguments):
+    """Parses the stanzas whose headers begin within a byte range of an OBO file. Used by the worker processes of
+    :func:`GoParser._parallel_parse`, so term names and definitions are also split into vocabulary words here rather
+    than in the parent process.
+
+    :param tuple arguments: The path of the OBO file, the start and end offsets of the range, and the namespace filter of the graph (or :py:obj:`None`). Term stanzas of other namespaces are skipped.
+    :return: A :py:obj:`list` of (stanza header, record, vocabulary) tuples in file order, with records made by :func:`parse_term_stanza` and :func:`parse_typedef_stanza`, and whether any skipped stanza had an is_a line. The vocabulary is :py:obj:`None` for typedefs.
+    :rtype: :py:obj:`tuple`
+    """
+    database_path, start, end, namespace_filter = arguments
+    records = []
+    skipped_is_a = False
+    with open(database_path, 'rb') as database_file, mmap.mmap(database_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for stanza_type, stanza in iter_stanza_bytes(data, start, end):
+            if stanza_type == b'[Term]':
+                if namespace_filter and stanza_namespace(stanza) != namespace_filter:
+                    skipped_is_a = skipped_is_a or b'\nis_a: ' in stanza
+                    continue
+                record = parse_term_stanza(stanza)
+                records.append((stanza_type, record, WORD_SPLIT.findall(record[1] + " " + record[3])))
+            elif stanza_type == b'[Typedef]':
+                records.append((stanza_type, parse_typedef_stanza(stanza), None))
+    return records, skipped_is_a
+
+
+def split_stanza_ranges(data, range_count):
+    """Splits OBO formatted bytes into roughly equal byte ranges which each begin at a stanza header.
+
+    :param data: OBO formatted :py:class:`bytes` or a :py:class:`mmap.mmap` of an OBO file.
+    :param int range_count: The desired number of ranges.
+    :return: A :py:obj:`list` of range boundary offsets, starting with 0 and ending with the length of the data.
+    :rtype: :py:obj:`list`
+    """
+    boundaries = [0]
+    for split_point in range(1, range_count):
+        header_start = data.find(b'\n[', max(split_point * len(data) // range_count, boundaries[-1]))
+        if header_start == -1:
+            break
+        if header_start + 1 > boundaries[-1]:
+            boundaries.append(header_start + 1)
+    boundaries.append(len(data))
+    return boundaries
+
+
+def iter_stanza_bytes(data, start=0, end=None):
+    """Generates every complete stanza in OBO formatted bytes. A stanza starts at a line beginning with '[' and ends at
+    the first following line that begins with whitespace, as in the line-based parsing engines. Stanza headers are
+    located with :py:meth:`bytes.find`, and stanzas which are not ended before the end of the data are not generated.
+    Windows line endings are converted so that every line of a generated stanza ends with a single newline.
+
+    :param data: OBO formatted :py:class:`bytes` or a :py:class:`mmap.mmap` of an OBO file.
+    :param int start: Optional - Only generate stanzas whose header begins at or after this offset.
+    :param int end: Optional - Only generate stanzas whose header begins before this offset.
+    :return: Generates :py:obj:`tuple` objects of the stanza header (e.g. b'[Term]') and the :py:class:`bytes` of the stanza body, from the newline ending the header line through the newline ending the last line of the stanza.
+    :rtype: :py:obj:`generator`
+    """
+    for _, stanza_type, stanza in iter_stanza_offsets(data, start, end):
+        yield stanza_type, stanza
+
+
+def iter_stanza_offsets(data, start=0, end=None):
+    """Generates every complete stanza in OBO formatted bytes together with the offset of its header, as
+    :func:`iter_stanza_bytes` generates them.
+
+    :param data: OBO formatted :py:class:`bytes` or a :py:class:`mmap.mmap` of an OBO file.
+    :param int start: Optional - Only generate stanzas whose header begins at or after this offset.
+    :param int end: Optional - Only generate stanzas whose header begins before this offset.
+    :return: Generates :py:obj:`tuple` objects of the offset of the stanza header, the header and the stanza body.
+    :rtype: :py:obj:`generator`
+    """
+    if end is None:
+        end = len(data)
+    header_start = start if data[start:start + 1] == b'[' and (start == 0 or data[start - 1:start] == b'\n') else data.find(b'\n[', start) + 1
+    if not header_start and data[:1] != b'[':
+        return
+    while header_start < end:
+        header_end = data.find(b'\n', header_start)
+        if header_end == -1:
+            return
+        stanza_end = STANZA_END.search(data, header_end)
+        if not stanza_end:
+            return
+        stanza_end = stanza_end.start()
+        stanza = data[header_end:stanza_end + 1]
+        if b'\r' in stanza:
+            stanza = stanza.replace(b'\r\n', b'\n')
+        yield header_start, data[header_start:header_end].rstrip(), stanza
+        header_start = data.find(b'\n[', stanza_end) + 1
+        if not header_start:
+            return
+
+
+def iter_stanza_lines(lines):
+    """Generates every complete stanza from the lines of an OBO file, in the same form as :func:`iter_stanza_bytes`.
+    Used for file objects that cannot be memory-mapped. Only the lines of one stanza are held at a time.
+
+    :param lines: An iterable of the lines of an OBO file, as :py:class:`str` or :py:class:`bytes`.
+    :return: Generates :py:obj:`tuple` objects of the stanza header (e.g. b'[Term]') and the :py:class:`bytes` of the stanza body.
+    :rtype: :py:obj:`generator`
+    """
+    header = None
+    stanza_lines = []
+    for line in lines:
+        if type(line) is str:
+            line = line.encode()
+        if header is None:
+            if line[:1] == b'[':
+                header = line.rstrip()
+        elif line[:1].isspace():
+            stanza = b'\n' + b''.join(stanza_lines)
+            if b'\r' in stanza:
+                stanza = stanza.replace(b'\r\n', b'\n')
+            yield header, stanza
+            header = None
+            stanza_lines = []
+        else:
+            stanza_lines.append(line)
@@ -0,0 +1,340 @@
+# !/usr/bin/python3
+"""
+A read-only copy of a graph in shared memory, for worker processes. :func:`export_graph` freezes a
+:class:`gocats.dag.OboGraph` into one block of :mod:`multiprocessing.shared_memory` holding flat buffers: tables of the
+terms' IDs, names and namespaces (UTF-8 bytes with offsets), the parents and children of every term and its ancestors
+and descendants from the graph's transitive closure, all as compressed sparse row (CSR) arrays of term positions.
+Worker processes attach to the block by name with :func:`attach_graph` and read it in place, without parsing the
+ontology or unpickling node objects, and without a copy of the graph per worker.
+
+Terms are numbered in topological order, as in :class:`gocats.dag.TransitiveClosure`. The closure is stored as sorted
+rows of positions rather than bitsets, which would take a bit for every pair of terms. Shared memory requires Python 3.8
+or later.
+"""
+import bisect
+import struct
+import sys
+from array import array
+from .dag import TransitiveClosure
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8; export_graph and attach_graph report its absence when used.
+    shared_memory = None
+
+SHARED_FORMAT_MAGIC = b'GOCATSSG'
+SHARED_FORMAT_VERSION = 1  # Increment whenever the layout of the buffers changes.
+# Sections of UTF-8 bytes, and of 8-byte integers, in the order they are laid out after the header.
+BYTE_SECTIONS = ('id_bytes', 'name_bytes', 'namespace_bytes')
+INTEGER_SECTIONS = ('id_offsets', 'name_offsets', 'namespace_offsets', 'id_order', 'root_positions', 'parent_indptr',
+                    'parent_indices', 'child_indptr', 'child_indices', 'ancestor_indptr', 'ancestor_indices',
+                    'descendant_indptr', 'descendant_indices')
+_HEADER = struct.Struct('<8sqq')  # Magic, format version and number of terms.
+_SECTION = struct.Struct('<qq')  # Byte offset and number of items of each section.
+
+
+class SharedGraph(object):
+
+    """A graph frozen into a block of shared memory by :func:`export_graph`, or attached to by :func:`attach_graph`.
+    Terms are referred to by their positions. Rows of positions are returned as :py:obj:`memoryview` objects over the
+    shared buffers; copy them (e.g. with ``tolist()``) to keep them after the graph is closed.
+    """
+
+    def __init__(self, block, owner=False):
+        """`SharedGraph` initializer.
+
+        :param block: The :py:class:`multiprocessing.shared_memory.SharedMemory` block holding the graph.
+        :param bool owner: Optional - Whether the block is unlinked when the graph is closed, i.e. whether it was created by this process (defaults to :py:obj:`False`).
+        """
+        self.block = block
+        self.owner = owner
+        magic, version, self.node_count = _HEADER.unpack_from(block.buf, 0)
+        if magic != SHARED_FORMAT_MAGIC or version != SHARED_FORMAT_VERSION:
+            raise Exception("Shared memory block {} does not hold a graph of this version of GOcats.".format(block.name))
+        self._views = list()
+        for index, section in enumerate(BYTE_SECTIONS + INTEGER_SECTIONS):
+            offset, count = _SECTION.unpack_from(block.buf, _HEADER.size + index * _SECTION.size)
+            if section in BYTE_SECTIONS:
+                view = block.buf[offset:offset + count]
+            else:
+                self._views.append(block.buf[offset:offset + 8 * count])
+                view = self._views[-1].cast('q')
+            self._views.append(view)
+            setattr(self, '_' + section, view)
+
+    def __len__(self):
+        return self.node_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def name(self):
+        """:py:obj:`property` holding the name of the shared memory block, which is passed to :func:`attach_graph`.
+
+        :return: The name of the block.
+        :rtype: :py:obj:`str`
+        """
+        return self.block.name
+
+    @property
+    def root_positions(self):
+        """:py:obj:`property` holding the positions of the graph's root nodes.
+
+        :return: A :py:obj:`memoryview` of positions.
+        :rtype: :py:obj:`memoryview`
+        """
+        return self._root_positions
+
+    def close(self):
+        """Detaches from the shared memory block, and unlinks the block if this graph created it. Rows returned by the
+        graph must no longer be in use.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.block is None:
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._views = list()
+        self.block.close()
+        if self.owner:
+            if sys.version_info < (3, 13):
+                # Workers forked after this process's resource tracker started share it, and unregister the block when
+                # they attach (see _attach_block), while unlink unregisters it again.
+                resource_tracker.register(self.block._name, 'shared_memory')
+            self.block.unlink()
+        self.block = None
+
+    def position(self, term_id):
+        """Returns the position of a term, by a binary search of the term IDs in sorted order.
+
+        :param str term_id: The ID of the term.
+        :return: The position of the term, or :py:obj:`None` if the graph has no such term.
+        :rtype: :py:obj:`int` or :py:obj:`None`
+        """
+        key = term_id.encode('utf-8')
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._id_key(self._id_order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.node_count and self._id_key(self._id_order[low]) == key:
+            return self._id_order[low]
+        return None
+
+    def term_id(self, position):
+        """Returns the ID of the term at a position.
+
+        :param int position: The position of the term.
+        :return: The ID of the term.
+        :rtype: :py:obj:`str`
+        """
+        return self._id_key(position).decode('utf-8')
+
+    def term_name(self, position):
+        """Returns the name of the term at a position.
+
+        :param int position: The position of the term.
+        :return: The name of the term.
+        :rtype: :py:obj:`str`
+        """
+        return bytes(self._name_bytes[self._name_offsets[position]:self._name_offsets[position + 1]]).decode('utf-8')
+
+    def term_namespace(self, position):
+        """Returns the namespace of the term at a position.
+
+        :param int position: The position of the term.
+        :return: The namespace of the term.
+        :rtype: :py:obj:`str`
+        """
+        return bytes(self._namespace_bytes[self._namespace_offsets[position]:self._namespace_offsets[position + 1]]).decode('utf-8')
+
+    def parents(self, position):
+        """Returns the positions of the parents of a term.
+
+        :param int position: The position of the term.
+        :return: A :py:obj:`memoryview` of sorted positions.
+        :rtype: :py:obj:`memoryview`
+        """
+        return self._parent_indices[self._parent_indptr[position]:self._parent_indptr[position + 1]]
+
+    def children(self, position):
+        """Returns the positions of the children of a term.
+
+        :param int position: The position of the term.
+        :return: A :py:obj:`memoryview` of sorted positions.
+        :rtype: :py:obj:`memoryview`
+        """
+        return self._child_indices[self._child_indptr[position]:self._child_indptr[position + 1]]
+
+    def ancestors(self, position):
+        """Returns the positions of the ancestors of a term, as :py:attr:`gocats.dag.AbstractNode.ancestors` holds them.
+
+        :param int position: The position of the term.
+        :return: A :py:obj:`memoryview` of sorted positions.
+        :rtype: :py:obj:`memoryview`
+        """
+        return self._ancestor_indices[self._ancestor_indptr[position]:self._ancestor_indptr[position + 1]]
+
+    def descendants(self, position):
+        """Returns the positions of the descendants of a term, as :py:attr:`gocats.dag.AbstractNode.descendants` holds
+        them.
+
+        :param int position: The position of the term.
+        :return: A :py:obj:`memoryview` of sorted positions.
+        :rtype: :py:obj:`memoryview`
+        """
+        return self._descendant_indices[self._descendant_indptr[position]:self._descendant_indptr[position + 1]]
+
+    def ancestor_ids(self, term_id):
+        """Returns the IDs of the ancestors of a term.
+
+        :param str term_id: The ID of the term.
+        :return: A :py:obj:`list` of term IDs, or :py:obj:`None` if the graph has no such term.
+        :rtype: :py:obj:`list` or :py:obj:`None`
+        """
+        position = self.position(term_id)
+        if position is None:
+            return None
+        return [self.term_id(ancestor) for ancestor in self.ancestors(position)]
+
+    def is_ancestor(self, ancestor_position, position):
+        """Returns whether a term is an ancestor of another, by a binary search of the other term's ancestors.
+
+        :param int ancestor_position: The position of the possible ancestor.
+        :param int position: The position of the term.
+        :return: True if the term at `ancestor_position` is an ancestor of the term at `position`, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        start, end = self._ancestor_indptr[position], self._ancestor_indptr[position + 1]
+        index = bisect.bisect_left(self._ancestor_indices, ancestor_position, start, end)
+        return index < end and self._ancestor_indices[index] == ancestor_position
+
+    def _id_key(self, position):
+        """Returns the UTF-8 encoded ID of the term at a position.
+
+        :param int position: The position of the term.
+        :return: The encoded ID.
+        :rtype: :py:obj:`bytes`
+        """
+        return bytes(self._id_bytes[self._id_offsets[position]:self._id_offsets[position + 1]])
+
+
+def export_graph(graph, name=None):
+    """Freezes a graph into a new block of shared memory. The graph's transitive closure is used if it was computed (see
+    :func:`gocats.dag.OboGraph.compute_closure`), and is computed for the purpose otherwise. The returned graph owns the
+    block, which is unlinked when it is closed; worker processes attach to it by its :py:attr:`SharedGraph.name` with
+    :func:`attach_graph` meanwhile.
+
+    :param graph: A :class:`gocats.dag.OboGraph` object, e.g. a :class:`gocats.godag.GoGraph`.
+    :param str name: Optional - The name of the shared memory block (defaults to a unique name chosen by the system).
+    :return: The shared graph.
+    :rtype: :class:`gocats.sharedgraph.SharedGraph`
+    """
+    if shared_memory is None:
+        raise Exception("Shared memory graphs require the multiprocessing.shared_memory module of Python 3.8 or later.")
+    closure = graph.closure if graph.closure is not None else TransitiveClosure(graph.node_list)
+    node_list = closure.node_list
+    node_position = closure.node_position
+    sections = dict()
+    for section, attribute in (('id', 'id'), ('name', 'name'), ('namespace', 'namespace')):
+        encoded = [getattr(node, attribute).encode('utf-8') for node in node_list]
+        sections[section + '_bytes'] = b''.join(encoded)
+        sections[section + '_offsets'] = _offsets(encoded)
+    sections['id_order'] = array('q', sorted(range(len(node_list)), key=lambda position: node_list[position].id.encode('utf-8')))
+    sections['root_positions'] = array('q', sorted(node_position[node] for node in graph.root_nodes if node in node_position))
+    for relation, relative_set in (('parent', 'parent_node_set'), ('child', 'child_node_set')):
+        rows = [sorted(node_position[relative] for relative in getattr(node, relative_set) if relative in node_position) for node in node_list]
+        sections[relation + '_indptr'], sections[relation + '_indices'] = _csr(rows)
+    for relation, bitsets in (('ancestor', closure.ancestor_bits), ('descendant', closure.descendant_bits)):
+        sections[relation + '_indptr'], sections[relation + '_indices'] = _csr([closure.positions(bits)[::-1] for bits in bitsets])
+
+    layout = list()
+    offset = _HEADER.size + _SECTION.size * len(BYTE_SECTIONS + INTEGER_SECTIONS)
+    for section in BYTE_SECTIONS + INTEGER_SECTIONS:
+        offset = (offset + 7) // 8 * 8  # Integer sections are aligned to 8 bytes.
+        size = len(sections[section]) * (1 if section in BYTE_SECTIONS else 8)
+        layout.append((offset, len(sections[section])))
+        offset += size
+    block = shared_memory.SharedMemory(name=name, create=True, size=offset)
+    try:
+        _HEADER.pack_into(block.buf, 0, SHARED_FORMAT_MAGIC, SHARED_FORMAT_VERSION, len(node_list))
+        for index, (section, (section_offset, count)) in enumerate(zip(BYTE_SECTIONS + INTEGER_SECTIONS, layout)):
+            _SECTION.pack_into(block.buf, _HEADER.size + index * _SECTION.size, section_offset, count)
+            data = sections[section] if section in BYTE_SECTIONS else sections[section].tobytes()
+            block.buf[section_offset:section_offset + len(data)] = data
+        return SharedGraph(block, owner=True)
+    except Exception:
+        block.close()
+        block.unlink()
+        raise
+
+
+def attach_graph(name):
+    """Attaches to a graph frozen into shared memory by :func:`export_graph`, e.g. in a worker process. Nothing is
+    copied; the graph is read from the shared block until it is closed.
+
+    :param str name: The name of the shared memory block, :py:attr:`SharedGraph.name`.
+    :return: The shared graph.
+    :rtype: :class:`gocats.sharedgraph.SharedGraph`
+    """
+    if shared_memory is None:
+        raise Exception("Shared memory graphs require the multiprocessing.shared_memory module of Python 3.8 or later.")
+    block = _attach_block(name)
+    try:
+        return SharedGraph(block)
+    except Exception:
+        block.close()
+        raise
+
+
+def _attach_block(name):
+    """Opens an existing shared memory block without leaving it registered with the process's resource tracker. The
+    process which created the block unlinks it; a worker started before the creator's resource tracker has its own
+    tracker, which would otherwise unlink the block when the worker exits.
+
+    :param str name: The name of the shared memory block.
+    :return: The block.
+    :rtype: :py:class:`multiprocessing.shared_memory.SharedMemory`
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    block = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(block._name, 'shared_memory')  # Earlier versions register every block they open.
+    return block
+
+
+def _offsets(encoded):
+    """Returns the offsets of byte strings laid end to end, with the end of the last one appended.
+
+    :param list encoded: A :py:obj:`list` of :py:obj:`bytes` entries.
+    :return: An array of len(encoded) + 1 offsets.
+    :rtype: :py:class:`array.array`
+    """
+    offsets = array('q', [0])
+    total = 0
+    for string in encoded:
+        total += len(string)
+        offsets.append(total)
+    return offsets
+
+
+def _csr(rows):
+    """Packs rows of positions into CSR row pointer and column index arrays.
+
+    :param list rows: A :py:obj:`list` of position lists, one for each term.
+    :return: The row pointer and column index arrays.
+    :rtype: :py:obj:`tuple`
+    """
+    indptr = array('q', [0])
+    indices = array('q')
+    for row in rows:
+        indices.extend(row)
+        indptr.append(len(indices))
+    return indptr, indices
@@ -0,0 +1,418 @@
+# !/usr/bin/python3
+"""
+Semantic similarity of the terms of a :class:`gocats.dag.OboGraph`, and of genes annotated to them. The information
+content (IC) of a term is ``-log(p)``, where `p` is the share of the annotations of its root term that are annotations
+of the term or of its descendants. Two terms are compared through their most informative common ancestor (MICA), the
+ancestor of both (or either term itself) with the highest IC, by the measures of Resnik (the IC of the MICA), Lin and
+Jiang-Conrath.
+
+The ancestors and descendants of every term are read once from the graph's transitive closure into NumPy arrays. The
+MICAs of many pairs of terms are found at once by intersecting the pairs' ancestor arrays in one sort. A term is compared
+with many terms at once by marking the descendants of its ancestors, least informative first, in one array, so that
+comparing all pairs of several thousand genes costs one such array per term of each gene. The work done at once, and
+the cache of arrays comparing a term with every other term, are bounded by a memory budget. The annotation counts of
+terms may be computed from a Gene Annotation File by :func:`gaf_information_content`, and saved for later runs.
+NumPy is an optional dependency of GOcats (``pip install gocats[numpy]``), needed only by this module.
+"""
+import collections
+import csv
+from array import array
+try:
+    import numpy
+except ImportError:  # NumPy is optional; SemanticSimilarity reports its absence when used.
+    numpy = None
+
+from .csrgraph import _csr_arrays, _gather
+from .dag import TransitiveClosure
+from .tools import open_input
+
+MEASURES = ('resnik', 'lin', 'jiang')
+METHODS = ('bma', 'max')
+SORT_KEY_BYTES = 48  # Memory taken by each sort key: an 8-byte integer, copied a few times by the sort.
+
+
+class SemanticSimilarity(object):
+
+    """Information content of every term of a graph, computed from annotation counts, and the semantic similarity of
+    terms and of genes. Terms are given dense integer indices, their positions in :py:attr:`node_list`, which is in
+    topological order. The arrays are a snapshot of the graph when they were built.
+    """
+
+    def __init__(self, graph, annotation_counts, memory_budget=2**27, propagated=False):
+        """`SemanticSimilarity` initializer. Reads the ancestors and descendants of every term from the graph's
+        transitive closure (see :func:`gocats.dag.OboGraph.compute_closure`), or computes a closure if the graph has
+        none, and propagates the annotation counts of terms to their ancestors.
+
+        :param graph: A :class:`gocats.dag.OboGraph` object, e.g. a :class:`gocats.godag.GoGraph`.
+        :param dict annotation_counts: The number of annotations made directly to each term, keyed by term ID. Terms which are not in the graph are ignored.
+        :param int memory_budget: Optional - The number of bytes of the cache of compared terms (defaults to 128 MiB).
+        :param bool propagated: Optional - Whether `annotation_counts` already count the annotations of each term's descendants, e.g. the counts of :func:`gaf_information_content` (defaults to :py:obj:`False`).
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if numpy is None:
+            raise Exception("NumPy is required for semantic similarity.\nPlease install it, e.g. with: pip install gocats[numpy]")
+        self.node_list, self.ancestor_indptr, self.ancestor_indices = _ancestor_arrays(graph)
+        self.term_position = {node.id: position for position, node in enumerate(self.node_list)}
+        # The descendant arrays are the ancestor arrays inverted: the terms listing each term as an ancestor, in order.
+        self.descendant_indptr, self.descendant_indices = _inverted_csr_arrays(numpy.diff(self.ancestor_indptr), self.ancestor_indices, len(self.node_list))
+
+        counts = numpy.zeros(len(self.node_list))
+        for term_id, count in annotation_counts.items():
+            if term_id in self.term_position:
+                counts[self.term_position[term_id]] += count
+        if not propagated and self.node_list:
+            counts = numpy.add.reduceat(counts[self.descendant_indices], self.descendant_indptr[:-1])
+        self.annotation_counts = counts
+        self.information_content = _information_content(counts, self.ancestor_indptr, self.ancestor_indices)
+
+        self._padded_information_content = numpy.append(numpy.where(self.annotation_counts == 0, 0.0, self.information_content), 0.0)
+        self._memory_budget = memory_budget
+        self._mica_rows = collections.OrderedDict()
+        self._mica_row_limit = max(1, memory_budget // max(1, 8 * len(self.node_list)))
+
+    def mica_row(self, position):
+        """Returns the MICA of a term with every term of the graph, as :func:`_mark_micas` finds them. The row is cached
+        until the memory budget is needed for more recently used rows.
+
+        :param int position: The index of a term.
+        :return: An array of the index of the MICA with each term, or -1 for terms with no annotated common ancestor.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        row = self._mica_rows.get(position)
+        if row is not None:
+            self._mica_rows.move_to_end(position)
+            return row
+        row = self._mark_micas(position, self.descendant_indptr, self.descendant_indices, len(self.node_list))
+        self._mica_rows[position] = row
+        if len(self._mica_rows) > self._mica_row_limit:
+            self._mica_rows.popitem(last=False)
+        return row
+
+    def similarity_row(self, position, measure='resnik'):
+        """Returns the similarity of a term with every term of the graph.
+
+        :param int position: The index of a term.
+        :param str measure: Optional - 'resnik' (default), 'lin' or 'jiang' (Jiang-Conrath, as the similarity 1 / (1 + distance)).
+        :return: An array of similarities, indexed by term.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._similarity(self.mica_row(position), self.information_content[position] + self.information_content, measure,
+                                numpy.arange(len(self.node_list)) == position)
+
+    def most_informative_common_ancestors(self, term_pairs):
+        """Returns the MICA of each of several pairs of terms.
+
+        :param term_pairs: An iterable of (term ID, term ID) :py:obj:`tuple` entries.
+        :return: A :py:obj:`list` of :class:`gocats.dag.AbstractNode` objects, or :py:obj:`None` for pairs with no annotated common ancestor.
+        :rtype: :py:obj:`list`
+        """
+        return [self.node_list[mica] if mica >= 0 else None for mica in self._pair_micas(*self._pair_positions(term_pairs)).tolist()]
+
+    def term_similarity(self, term_pairs, measure='resnik'):
+        """Returns the similarity of each of several pairs of terms.
+
+        :param term_pairs: An iterable of (term ID, term ID) :py:obj:`tuple` entries.
+        :param str measure: Optional - 'resnik' (default), 'lin' or 'jiang'.
+        :return: An array of similarities, in the order of the pairs.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        first, second = self._pair_positions(term_pairs)
+        return self._similarity(self._pair_micas(first, second), self.information_content[first] + self.information_content[second], measure, first == second)
+
+    def term_similarity_matrix(self, term_ids, other_term_ids=None, measure='resnik'):
+        """Returns the similarity of every term of a list with every term of another list.
+
+        :param list term_ids: The term IDs of the rows.
+        :param list other_term_ids: Optional - The term IDs of the columns (defaults to `term_ids`).
+        :param str measure: Optional - 'resnik' (default), 'lin' or 'jiang'.
+        :return: A two-dimensional array of similarities.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        columns = numpy.array([self.term_position[term_id] for term_id in (term_ids if other_term_ids is None else other_term_ids)], dtype=numpy.int64)
+        matrix = numpy.empty((len(term_ids), len(columns)))
+        for row, term_id in enumerate(term_ids):
+            matrix[row] = self.similarity_row(self.term_position[term_id], measure)[columns]
+        return matrix
+
+    def gene_similarity_matrix(self, gene_terms, measure='resnik', method='bma'):
+        """Returns the similarity of every pair of genes, from the similarities of the terms they are annotated to. By
+        the best-match average ('bma'), each term of one gene is matched with its most similar term of the other gene,
+        and the similarity is the mean of the two genes' average best matches. By 'max', it is the similarity of the
+        most similar pair of terms. Each term is compared with the terms of all genes at once, through the descendants
+        of its ancestors among those terms only.
+
+        :param dict gene_terms: An iterable of term IDs for each gene, keyed by gene. Terms which are not in the graph are ignored.
+        :param str measure: Optional - 'resnik' (default), 'lin' or 'jiang'.
+        :param str method: Optional - 'bma' (default) or 'max'.
+        :return: A :py:obj:`tuple` of the :py:obj:`list` of genes and a two-dimensional array of their similarities, in the same order. Genes with no terms in the graph have a similarity of 0.
+        :rtype: :py:obj:`tuple`
+        """
+        if method not in METHODS:
+            raise Exception("{} is not a valid method of combining term similarities.\nPlease select from the following: {}".format(method, METHODS))
+        genes = list(gene_terms)
+        term_lists = [sorted(set(self.term_position[term_id] for term_id in gene_terms[gene] if term_id in self.term_position)) for gene in genes]
+        indptr, indices = _csr_arrays(term_lists)
+        columns = numpy.unique(indices)
+        gene_columns = numpy.searchsorted(columns, indices)
+        # The descendants of each term among the columns, found by inverting the columns' ancestor lists.
+        column_ancestors = _gather(self.ancestor_indptr, self.ancestor_indices, columns)
+        column_indptr, column_indices = _inverted_csr_arrays(numpy.diff(self.ancestor_indptr)[columns], column_ancestors, len(self.node_list))
+        column_information_content = self.information_content[columns]
+
+        lengths = numpy.diff(indptr)
+        annotated = lengths > 0
+        starts = indptr[:-1][annotated]  # Without empty genes, each segment ends where the next one starts.
+        matrix = numpy.zeros((len(genes), len(genes)))
+        for row, positions in enumerate(term_lists):
+            if not positions:
+                continue
+            best_matches = numpy.full(len(columns), -numpy.inf)
+            for position in positions:
+                micas = self._mark_micas(position, column_indptr, column_indices, len(columns))
+                numpy.maximum(best_matches, self._similarity(micas, self.information_content[position] + column_information_content, measure, columns == position), out=best_matches)
+            if method == 'bma':
+                matrix[row, annotated] = numpy.add.reduceat(best_matches[gene_columns], starts) / lengths[annotated]
+            else:
+                matrix[row, annotated] = numpy.maximum.reduceat(best_matches[gene_columns], starts)
+        if method == 'bma':
+            matrix = (matrix + matrix.T) / 2  # Row i holds the average best match of each other gene's terms in gene i.
+        return genes, matrix
+
+    def _mark_micas(self, position, descendant_indptr, descendant_indices, size):
+        """Finds the MICA of a term with several terms by marking the descendants of each of its ancestors with the
+        ancestor, from the least to the most informative, so that every term is left marked with the most informative
+        ancestor it shares with the given term.
+
+        :param int position: The index of a term.
+        :param descendant_indptr: The row pointer array of the descendants of each term, indexed by term.
+        :param descendant_indices: The column index array of the descendants, as indices into the result.
+        :param int size: The number of terms compared.
+        :return: An array of the index of the MICA with each term, or -1 for terms with no annotated common ancestor.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        micas = numpy.full(size, -1, dtype=numpy.int64)
+        ancestors = self.ancestor_indices[self.ancestor_indptr[position]:self.ancestor_indptr[position + 1]][::-1]
+        ancestors = ancestors[self.annotation_counts[ancestors] > 0]
+        for ancestor in ancestors[numpy.argsort(self.information_content[ancestors], kind='stable')].tolist():
+            micas[descendant_indices[descendant_indptr[ancestor]:descendant_indptr[ancestor + 1]]] = ancestor
+        return micas
+
+    def _pair_micas(self, first, second):
+        """Finds the MICA of each of several pairs of terms at once. The ancestors of both terms of every pair are
+        expanded into keys of the pair and the ancestor, the keys common to both terms are found by one sort, and the
+        most informative ancestor of each pair is kept. Pairs are taken in chunks whose keys fit the memory budget.
+
+        :param first: An array of the indices of the first terms.
+        :param second: An array of the indices of the second terms.
+        :return: An array of the index of the MICA of each pair, or -1 for pairs with no annotated common ancestor.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        size = len(self.node_list)
+        micas = numpy.full(len(first), -1, dtype=numpy.int64)
+        ancestor_lengths = numpy.diff(self.ancestor_indptr)
+        key_counts = numpy.cumsum(ancestor_lengths[first] + ancestor_lengths[second])
+        chunk_keys = max(1, self._memory_budget // SORT_KEY_BYTES)
+        start = 0
+        while start < len(first):
+            end = max(start + 1, int(numpy.searchsorted(key_counts, (key_counts[start - 1] if start else 0) + chunk_keys, 'right')))
+            pair_ids = numpy.arange(start, end)
+            keys = list()
+            for positions in (first[start:end], second[start:end]):
+                keys.append(numpy.repeat(pair_ids, ancestor_lengths[positions]) * size + _gather(self.ancestor_indptr, self.ancestor_indices, positions))
+            common_pairs, common_ancestors = numpy.divmod(numpy.intersect1d(keys[0], keys[1], assume_unique=True), size)
+            annotated = self.annotation_counts[common_ancestors] > 0
+            common_pairs, common_ancestors = common_pairs[annotated], common_ancestors[annotated]
+            order = numpy.lexsort((self.information_content[common_ancestors], common_pairs))
+            common_pairs, common_ancestors = common_pairs[order], common_ancestors[order]
+            last = numpy.append(numpy.flatnonzero(numpy.diff(common_pairs)), len(common_pairs) - 1) if len(common_pairs) else []
+            micas[common_pairs[last]] = common_ancestors[last]
+            start = end
+        return micas
+
+    def _similarity(self, micas, information_content, measure, identical):
+        """Converts MICAs to similarities. Terms with no annotated common ancestor have a similarity of 0.
+
+        :param micas: An array of MICA indices, or -1 where there is no MICA.
+        :param information_content: An array of the sums of the IC of the two terms compared.
+        :param str measure: 'resnik', 'lin' or 'jiang'.
+        :param identical: A boolean array, :py:obj:`True` where a term is compared with itself.
+        :return: An array of similarities.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        mica_information_content = self._padded_information_content[micas]  # Index -1 gives 0.
+        if measure == 'resnik':
+            return mica_information_content
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            if measure == 'lin':
+                # Two terms with no information content are only alike by Lin if they are the same term.
+                similarity = numpy.where(information_content > 0, 2 * mica_information_content / information_content, numpy.where(identical, 1.0, 0.0))
+            elif measure == 'jiang':
+                similarity = 1 / (1 + information_content - 2 * mica_information_content)
+            else:
+                raise Exception("{} is not a valid similarity measure.\nPlease select from the following: {}".format(measure, MEASURES))
+        similarity[micas < 0] = 0.0
+        return similarity
+
+    def _pair_positions(self, term_pairs):
+        """Converts pairs of term IDs to two arrays of term indices.
+
+        :param term_pairs: An iterable of (term ID, term ID) :py:obj:`tuple` entries.
+        :return: A :py:obj:`tuple` of the arrays of the first and second terms' indices.
+        :rtype: :py:obj:`tuple`
+        """
+        positions = numpy.array([(self.term_position[term_id1], self.term_position[term_id2]) for term_id1, term_id2 in term_pairs], dtype=numpy.int64).reshape(-1, 2)
+        return positions[:, 0], positions[:, 1]
+
+
+InformationContent = collections.namedtuple('InformationContent', ['term_ids', 'annotation_counts', 'information_content'])
+InformationContent.__doc__ = """The annotation count and information content of every term of a graph, as arrays indexed by term, made by
+:func:`gaf_information_content`. `term_ids` lists the IDs of the terms in the order of the arrays."""
+
+
+def gaf_information_content(graph, gaf, gene_column=1, go_column=4, memory_budget=2**27):
+    """Computes the annotation count and information content of every term of a graph from a Gene Annotation File (GAF)
+    in one pass over its lines. The count of a term is the number of genes annotated to it or to any of its
+    descendants. Genes and terms are given integer indices, and the distinct (gene, term) annotations form a sparse
+    gene by term matrix, which is propagated to the terms' ancestors from the graph's transitive closure and counted
+    with array operations, a block of genes at a time within the memory budget. Annotations with a 'NOT' qualifier and
+    annotations to terms which are not in the graph are skipped.
+
+    :param graph: A :class:`gocats.dag.OboGraph` object, e.g. a :class:`gocats.godag.GoGraph`.
+    :param gaf: An iterable of GAF lines split into columns, e.g. from :func:`gocats.tools.parse_gaf`, or a path to a GAF, which may be compressed.
+    :param int gene_column: Optional - The column of gene identifiers (defaults to 1, the DB Object ID).
+    :param int go_column: Optional - The column of GO term IDs (defaults to 4).
+    :param int memory_budget: Optional - The number of bytes used at once to propagate annotations (defaults to 128 MiB).
+    :return: The counts and information content of the terms.
+    :rtype: :class:`gocats.similarity.InformationContent`
+    """
+    if numpy is None:
+        raise Exception("NumPy is required for semantic similarity.\nPlease install it, e.g. with: pip install gocats[numpy]")
+    if isinstance(gaf, str):
+        gaf = _gaf_lines(gaf)
+    node_list, ancestor_indptr, ancestor_indices = _ancestor_arrays(graph)
+    term_position = {node.id: position for position, node in enumerate(node_list)}
+    gene_index = dict()
+    annotations = array('q')  # Alternating gene and term indices.
+    for line in gaf:
+        if line[0].startswith('!') or 'NOT' in line[3].split('|'):
+            continue
+        position = term_position.get(line[go_column])
+        if position is not None:
+            annotations.append(gene_index.setdefault(line[gene_column], len(gene_index)))
+            annotations.append(position)
+    size = len(node_list)
+    annotations = numpy.frombuffer(annotations, dtype=numpy.int64).reshape(-1, 2)
+    genes, terms = numpy.divmod(_distinct(annotations[:, 0] * size + annotations[:, 1]), size)  # Distinct, sorted by gene.
+
+    counts = numpy.zeros(size, dtype=numpy.int64)
+    ancestor_lengths = numpy.diff(ancestor_indptr)
+    key_counts = numpy.cumsum(ancestor_lengths[terms])
+    block_keys = max(1, memory_budget // SORT_KEY_BYTES)
+    start = 0
+    while start < len(terms):
+        end = max(start + 1, int(numpy.searchsorted(key_counts, (key_counts[start - 1] if start else 0) + block_keys, 'right')))
+        end = int(numpy.searchsorted(genes, genes[end - 1], 'right'))  # A gene is counted once per term, so its annotations stay in one block.
+        keys = numpy.repeat(genes[start:end], ancestor_lengths[terms[start:end]]) * size + _gather(ancestor_indptr, ancestor_indices, terms[start:end])
+        counts += numpy.bincount(_distinct(keys) % size, minlength=size)
+        start = end
+    return InformationContent([node.id for node in node_list], counts, _information_content(counts, ancestor_indptr, ancestor_indices))
+
+
+def save_information_content(information, filename):
+    """Saves the counts and information content of terms to a NumPy .npz file, for reuse by later runs.
+
+    :param information: A :class:`gocats.similarity.InformationContent`.
+    :param file_handle filename: A path to the file.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    with open(filename, 'wb') as information_file:
+        numpy.savez(information_file, term_ids=numpy.array(information.term_ids, dtype=str), annotation_counts=information.annotation_counts,
+                    information_content=information.information_content)
+
+
+def load_information_content(filename):
+    """Loads the counts and information content of terms saved by :func:`save_information_content`.
+
+    :param file_handle filename: A path to the file.
+    :return: The counts and information content of the terms.
+    :rtype: :class:`gocats.similarity.InformationContent`
+    """
+    if numpy is None:
+        raise Exception("NumPy is required for semantic similarity.\nPlease install it, e.g. with: pip install gocats[numpy]")
+    with numpy.load(filename, allow_pickle=False) as arrays:
+        return InformationContent(arrays['term_ids'].tolist(), arrays['annotation_counts'], arrays['information_content'])
+
+
+def _distinct(keys):
+    """Sorts an array of integer keys in place and returns its distinct keys.
+
+    :param keys: A NumPy integer array.
+    :return: The sorted, distinct keys.
+    :rtype: :py:obj:`numpy.ndarray`
+    """
+    keys.sort()
+    if len(keys) < 2:
+        return keys
+    return keys[numpy.concatenate(([True], keys[1:] != keys[:-1]))]
+
+
+def _gaf_lines(filename):
+    """Reads the lines of a GAF one at a time, split into columns.
+
+    :param file_handle filename: A path to the GAF, which may be compressed.
+    :return: A generator of :py:obj:`list` entries.
+    :rtype: :py:obj:`generator`
+    """
+    with open_input(filename) as gaf_file:
+        for line in csv.reader(gaf_file, delimiter='\t'):
+            if line:
+                yield line
+
+
+def _ancestor_arrays(graph):
+    """Reads the ancestors of every term of a graph from its transitive closure, or from a closure computed for the
+    purpose if the graph has none. The ancestors of a term include the term itself.
+
+    :param graph: A :class:`gocats.dag.OboGraph` object.
+    :return: A :py:obj:`tuple` of the terms in topological order, and the row pointer and column index arrays of their ancestors.
+    :rtype: :py:obj:`tuple`
+    """
+    closure = graph.closure if graph.closure is not None else TransitiveClosure(graph.node_list)
+    ancestor_indptr, ancestor_indices = _csr_arrays([closure.positions(bits | 1 << position) for position, bits in enumerate(closure.ancestor_bits)])
+    return closure.node_list, ancestor_indptr, ancestor_indices
+
+
+def _information_content(counts, ancestor_indptr, ancestor_indices):
+    """Computes the information content of terms from their propagated annotation counts, relative to the count of the
+    most annotated of their ancestors (their root term).
+
+    :param counts: An array of the annotation counts of the terms.
+    :param ancestor_indptr: The row pointer array of the ancestors of each term.
+    :param ancestor_indices: The column index array of the ancestors of each term.
+    :return: An array of information content, infinite for terms without annotations.
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    if not len(counts):
+        return numpy.zeros(0)
+    root_counts = numpy.maximum.reduceat(counts[ancestor_indices], ancestor_indptr[:-1])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        information_content = numpy.log(root_counts / counts)
+    # A term without annotations has no probability; it is never a MICA, and is not similar to other terms by Lin or Jiang-Conrath.
+    information_content[counts == 0] = numpy.inf
+    return information_content
+
+
+def _inverted_csr_arrays(lengths, indices, size):
+    """Inverts a CSR adjacency: the new row of each index lists the rows whose entries contain it, in order.
+
+    :param lengths: The number of entries of each row of the adjacency.
+    :param indices: The column index array of the adjacency.
+    :param int size: The number of rows of the inverted adjacency.
+    :return: The row pointer and column index arrays of the inverted adjacency.
+    :rtype: :py:obj:`tuple`
+    """
+    indptr = numpy.zeros(size + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(indices, minlength=size), out=indptr[1:])
+    return indptr, numpy.repeat(numpy.arange(len(lengths)), lengths)[numpy.argsort(indices, kind='stable')]
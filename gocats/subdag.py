@@ -2,7 +2,8 @@
 """
 A subgraph object of an OBOGraph object.
 """
-from .dag import OboGraph, AbstractNode
+from .dag import OboGraph, AbstractNode, TransitiveClosure
+from operator import attrgetter
 import re
 
 
@@ -21,9 +22,9 @@ class SubGraph(OboGraph):
         """
         self.super_graph = super_graph
         if self.super_graph.namespace_filter and self.super_graph.namespace_filter != namespace_filter:
-            raise Exception("Unless a namespace_filter is not specified for a parent_graph, a subgraph's namespace_filter must not differ from its parent graph's namespace_filter.\nsubgraph namespace_filter = {}, supergraph namespace_filter = {}").format(namespace_filter, self.super_graph.namespace_filter)
+            raise Exception("Unless a namespace_filter is not specified for a parent_graph, a subgraph's namespace_filter must not differ from its parent graph's namespace_filter.\nsubgraph namespace_filter = {}, supergraph namespace_filter = {}".format(namespace_filter, self.super_graph.namespace_filter))
         if self.super_graph.allowed_relationships and allowed_relationships and any(relationship not in self.super_graph.allowed_relationships for relationship in allowed_relationships):
-            raise Exception("Unless an allowed_relationships list is not specified for a parent graph, a subgraph's allowed_relationships list must be a subset of, or exactly, its parent graph's allowed_relationships list.\nsubgraph allowed_relationships = {}, supergraph allowed_relationships = {}").format(allowed_relationships, self.super_graph.allowed_relationships)
+            raise Exception("Unless an allowed_relationships list is not specified for a parent graph, a subgraph's allowed_relationships list must be a subset of, or exactly, its parent graph's allowed_relationships list.\nsubgraph allowed_relationships = {}, supergraph allowed_relationships = {}".format(allowed_relationships, self.super_graph.allowed_relationships))
         super().__init__(namespace_filter, allowed_relationships)
         self.seeded_size = None  # The number of nodes filtered in the keyword search, used for informational purposes only.
         self.category_node = None
@@ -113,8 +114,10 @@ class SubGraph(OboGraph):
         :rtype: :py:obj:`None`
         """
         for subnode in self.node_list:
-            subnode.update_children([self.id_index[child.id] for child in subnode.super_node.child_node_set if child.id in self.id_index])
-            subnode.update_parents([self.id_index[parent.id] for parent in subnode.super_node.parent_node_set if parent.id in self.id_index])
+            new_children = subnode.update_children([self.id_index[child.id] for child in subnode.super_node.child_node_set if child.id in self.id_index])
+            new_parents = subnode.update_parents([self.id_index[parent.id] for parent in subnode.super_node.parent_node_set if parent.id in self.id_index])
+            if new_children or new_parents:
+                self._update_node_status([subnode])
             for edge in subnode.super_node.edges:  # This counts the number of times each relationship type is used in a subgraph and also adds edges to the subgraph
                 if edge.forward_node.id in self.id_index and edge.reverse_node.id in self.id_index:
                     self.add_edge(edge)
@@ -124,6 +127,25 @@ class SubGraph(OboGraph):
                         self.relationship_count[edge.relationship.id] = 1
         self._modified = True
 
+    def filter_edges(self, filtered_nodes):
+        """Returns a list of edges in the subgraph that connect the subgraph nodes provided in the filtered nodes list,
+        as :func:`gocats.dag.OboGraph.filter_edges` does. Subgraph edges are edges of the supergraph, so they are taken
+        from the filtered nodes' supergraph nodes and their endpoints are matched to the filtered nodes by ID.
+
+        :param filtered_nodes: List of filtered :class:`gocats.subdag.SubGraphNode` objects provided by :func:`filter_nodes`.
+        :return: A list of :class:`gocats.dag.AbstractEdge` objects.
+        :rtype: :py:obj:`list`
+        """
+        if self._csr_graph is not None:
+            return super().filter_edges(filtered_nodes)
+        filtered_ids = set(node.id for node in filtered_nodes)
+        filtered_edges = [edge for node in dict.fromkeys(filtered_nodes) for edge in node.super_node.edges
+                          if edge.child_id == node.id and edge.parent_id in filtered_ids and self.has_edge(edge)]
+        if self.allowed_relationships:
+            filtered_edges = [edge for edge in filtered_edges if edge.relationship_id in self.allowed_relationships]
+        filtered_edges.sort(key=attrgetter('index_key'))
+        return filtered_edges
+
     def greedily_extend_subgraph(self):
         """Extends a seeded subgraph to include all supergraph descendants of the nodes. Searches through the supergraph
         to add new SubGraphNode objects.
@@ -174,6 +196,18 @@ class SubGraph(OboGraph):
                     self.remove_node(descendant)
             self.remove_node(orphan)
 
+    @staticmethod
+    def keyword_pattern(search_string_list):
+        """Compiles the search strings of a keyword row into one regular expression, which matches a node name
+        wherever any one of the search strings matches it without a hyphen on either side. Node names are then scanned
+        once for all of the search strings.
+
+        :param search_string_list: A :py:obj:`list` of search term :py:obj:`str` entries.
+        :return: A compiled regular expression.
+        :rtype: :py:class:`re.Pattern`
+        """
+        return re.compile('(?<!\-)(?:' + '|'.join('(?:' + search_string + ')' for search_string in search_string_list) + ')(?!\-)')
+
     @staticmethod
     def find_representative_nodes(subgraph, search_string_list):
         """Compiles a list candidate :class:`gocats.subdag.SubGraphNode` objects from the :class:`gocats.subdag.SubGraph`
@@ -192,16 +226,19 @@ class SubGraph(OboGraph):
         elif not subgraph.node_list:
             raise Exception("Subgraph did not seed any nodes from the supergraph! Aborting.")
         else:
-            candidates = [node for node in subgraph.node_list if any(re.search('(?<!\-)'+search_string+'(?!\-)', node.name) for search_string in search_string_list) and node not in subgraph.leaves and not node.obsolete]
+            keyword_pattern = SubGraph.keyword_pattern(search_string_list)
+            leaves = subgraph.leaves
+            candidates = [node for node in subgraph.node_list if not node.obsolete and node not in leaves and keyword_pattern.search(node.name)] if search_string_list else []
             if candidates:
-                representative_node_scoring = {node: len(node.descendants) for node in candidates}
+                closure = TransitiveClosure(subgraph.node_list, descendants_only=True)
+                representative_node_scoring = {node: closure.descendant_count(node) for node in candidates}
                 representative_nodes.append(max(representative_node_scoring, key=representative_node_scoring.get))
             elif not candidates:  # and all(subgraph.node_list) in subgraph.leaves:
                 representative_nodes = [node for node in subgraph.node_list]
         return representative_nodes
 
     @staticmethod
-    def from_filtered_graph(super_graph, subgraph_name, keyword_list, namespace_filter=None, allowed_relationships=None, extension='greedy'):
+    def from_filtered_graph(super_graph, subgraph_name, keyword_list, namespace_filter=None, allowed_relationships=None, extension='greedy', match_phrases=False):
         """Staticmethod for extracting a subgraph from the supergraph by selecting nodes that contain vocabulary in the
         supplied keyword list. Leave `namespace_filter` and `allowed_relationship` as :py:obj:`None` to create the
         entire ontology graph. Otherwise, provide filters to limit what information is pulled into the subgraph.
@@ -215,11 +252,12 @@ class SubGraph(OboGraph):
         :param str namespace_filter: Specify the namespace of a sub-ontology namespace, if one is available for the ontology.
         :param list allowed_relationships: Specify a list of relationships to utilize in the graph, other relationships will be ignored.
         :param str extension: Specify 'greedy' or 'conservative' to determine how subgraphs will be extended after creation (defaults to greedy).
+        :param bool match_phrases: Whether keywords of several words are matched as phrases by :func:`gocats.dag.OboGraph.filter_nodes` (defaults to :py:obj:`False`).
         :return: A :class:`gocats.subdag.SubGraph` object.
         """
         subgraph = SubGraph(super_graph, namespace_filter, allowed_relationships)
         keyword_list = [word.lower() for word in keyword_list]
-        filtered_nodes = super_graph.filter_nodes(keyword_list)
+        filtered_nodes = super_graph.filter_nodes(keyword_list, match_phrases)
         subgraph.seeded_size = len(filtered_nodes)
         for super_node in filtered_nodes:
             subgraph.add_node(super_node)
@@ -228,6 +266,7 @@ class SubGraph(OboGraph):
         representative_nodes = subgraph.find_representative_nodes(subgraph, keyword_list)
         subgraph.category_node = CategoryNode(subgraph_name, representative_nodes, namespace_filter)
         subgraph.root_nodes.extend(representative_nodes)
+        subgraph._update_node_status(representative_nodes)
         if extension == 'greedy':
             subgraph.greedily_extend_subgraph()
         elif extension == 'conservative':
@@ -238,6 +277,7 @@ class SubGraph(OboGraph):
                 subgraph_orphans_descendants.add(node)
         subgraph_orphans_descendants.update([orphan for orphan in subgraph.orphans])
         subgraph._subgraph_finalized = True
+        subgraph._modified = False  # The mappings are built from the finished subgraph when first read.
 
         return subgraph
 
@@ -247,6 +287,9 @@ class SubGraphNode(AbstractNode):
     """An instance of a node within a subgraph of an OBO ontology (supergraph)
     """
 
+    # The name, definition and other term properties are read from the supernode, and are not stored.
+    __slots__ = ('allowed_relationships', 'super_node')
+
     def __init__(self, super_node=None, allowed_relationships=None):
         """SubGraphNode initializer. Inherits from :class:`gocats.dag.AbstractNode` and contains a reference to the
         supergraph node it represents e.g. :class:`gocats.godag.GoGraphNode`.
@@ -258,11 +301,10 @@ class SubGraphNode(AbstractNode):
         self.super_node = super_node
         self.parent_node_set = set()
         self.child_node_set = set()
-        self._modified = True
         self._descendants = None
         self._ancestors = None
-
-    # TODO: add in update_parent_node_set and update_child_node_set with a _modified switch !!!!
+        self._descendants_closure = None
+        self._ancestors_closure = None
 
     @property
     def super_edges(self):
@@ -321,24 +363,32 @@ class SubGraphNode(AbstractNode):
         return self.super_node.obsolete
 
     def update_parents(self, parent_set):
-        """Updates the parent_node_set with a set of new parents provided. Sets modification state to :py:obj:`True`.
+        """Updates the parent_node_set with a set of new parents provided. New parents mark the ancestor sets of this
+        node and its descendants as out of date.
 
         :param parent_set: A set of parent nodes to be added to this objects parent_node set.
-        :return: None
-        :rtype: :py:obj:`None`
+        :return: The parents which were not already parents of this node, so that the subgraph can update its orphans and leaves.
+        :rtype: :py:class:`set`
         """
-        self.parent_node_set.update(parent_set)
-        self._modified = True
+        new_parents = set(parent_set).difference(self.parent_node_set)
+        if new_parents:
+            self._invalidate_ancestors()
+            self.parent_node_set.update(new_parents)
+        return new_parents
 
     def update_children(self, child_set):
-        """Updates the child_node_set with a set of new children provided. Sets modification state to :py:obj:`True`.
+        """Updates the child_node_set with a set of new children provided. New children mark the descendant sets of
+        this node and its ancestors as out of date.
 
         :param child_set: A set of child nodes to be added to this objects child_node set.
-        :return: None
-        :rtype: :py:obj:`None`
+        :return: The children which were not already children of this node, so that the subgraph can update its orphans and leaves.
+        :rtype: :py:class:`set`
         """
-        self.child_node_set.update(child_set)
-        self._modified = True
+        new_children = set(child_set).difference(self.child_node_set)
+        if new_children:
+            self._invalidate_descendants()
+            self.child_node_set.update(new_children)
+        return new_children
 
 
 class CategoryNode(AbstractNode):
@@ -347,12 +397,15 @@ class CategoryNode(AbstractNode):
     and serves as the single representative of the subgraph which represents a concept.
     """
 
+    # A single category node is created per subgraph, so it keeps a per-instance dictionary for its extra attributes.
+
     def __init__(self, category_name, representative_node_list, namespace_filter=None):
         self.parent_node_set = set()
         self.obsolete = False
-        self._modified = True
         self._descendants = None
         self._ancestors = None
+        self._descendants_closure = None
+        self._ancestors_closure = None
         self.namespace_filter = namespace_filter  # Needed to make the node valid.
         if self.namespace_filter:
             self.namesapce = namespace_filter[0]
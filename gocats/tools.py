@@ -2,12 +2,21 @@
 """
 Functions for handling some file input and output and reformatting tasks in GOcats.
 """
+import contextlib
+import gc
 import json
 import jsonpickle
 import sys
 import os
+import tempfile
 import re
 import csv
+import io
+import gzip
+import bz2
+import lzma
+import queue
+import threading
 maxInt = sys.maxsize
 
 while True:
@@ -21,6 +30,192 @@ while True:
         maxInt = int(maxInt/10)
 
 
+# The process umask, which can only be read by setting it. It is read once here, rather than set and restored for every
+# output file while other threads may be creating files.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+# Leading bytes which identify compressed files, and the classes which decompress them.
+COMPRESSION_FORMATS = ((b'\x1f\x8b', gzip.GzipFile), (b'BZh', bz2.BZ2File), (b'\xfd7zXZ\x00', lzma.LZMAFile))
+COMPRESSION_EXTENSIONS = ('.gz', '.bz2', '.xz')
+INPUT_BUFFER_SIZE = 1 << 20
+
+
+class PrefetchedStream(io.RawIOBase):
+
+    """A read-only stream which reads large chunks from another stream in a background thread. Decompressing gzip,
+    bzip2 and xz data releases the GIL, so wrapping a decompressing file lets decompression of the next chunks overlap
+    with parsing of the current one."""
+
+    def __init__(self, stream, chunk_size=INPUT_BUFFER_SIZE, prefetched_chunks=4):
+        """`PrefetchedStream` initializer. Starts the background thread.
+
+        :param stream: A readable binary stream, e.g. :py:class:`gzip.GzipFile`.
+        :param int chunk_size: The number of bytes read from the stream at a time.
+        :param int prefetched_chunks: The number of chunks that may be read ahead of the consumer.
+        """
+        super().__init__()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._chunks = queue.Queue(prefetched_chunks)
+        self._chunk = memoryview(b'')
+        self._exhausted = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch, daemon=True)
+        self._thread.start()
+
+    def _prefetch(self):
+        """Reads chunks from the stream into the queue until the stream is exhausted or the stream is closed. Errors
+        are passed through the queue to be raised by :func:`readinto`.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        try:
+            chunk = True
+            while chunk and not self._stopped.is_set():
+                chunk = self.stream.read(self.chunk_size)
+                self._put(chunk)
+        except Exception as error:
+            self._put(error)
+
+    def _put(self, item):
+        """Puts a chunk or an error into the queue, waiting for room until the stream is closed, so that a consumer
+        which stops reading early never leaves the thread blocked.
+
+        :param item: A :py:obj:`bytes` chunk, or an :py:class:`Exception` raised while reading.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        while not self._stopped.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """Copies prefetched bytes into a buffer.
+
+        :param buffer: A writable buffer.
+        :return: The number of bytes copied, 0 at the end of the stream.
+        :rtype: :py:obj:`int`
+        """
+        if not self._chunk:
+            if self._exhausted:
+                return 0
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                self._exhausted = True
+                return 0
+            self._chunk = memoryview(chunk)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self):
+        """Stops the background thread and closes the underlying stream.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if not self.closed:
+            self._stopped.set()
+            self._thread.join()
+            self.stream.close()
+        super().close()
+
+
+def open_input(filename, mode='r', newline=None):
+    """Opens an input file for reading. Files compressed with gzip, bzip2 or xz are recognized by their leading (magic)
+    bytes, regardless of their extension, and are decompressed as they are read through a large buffer filled by a
+    :class:`PrefetchedStream`. Uncompressed files are opened normally, so they can still be memory-mapped.
+
+    :param file_handle filename: A path to the input file.
+    :param str mode: 'r' or 'rt' to read text (default), 'rb' to read bytes.
+    :param str newline: Optional - Passed on to :py:func:`open` for text mode, e.g. '' for CSV files.
+    :return: A readable file object.
+    """
+    filename = os.path.realpath(filename)
+    with open(filename, 'rb') as input_file:
+        magic_bytes = input_file.read(6)
+    for compression_magic, compressed_file in COMPRESSION_FORMATS:
+        if magic_bytes.startswith(compression_magic):
+            stream = io.BufferedReader(PrefetchedStream(compressed_file(filename, 'rb')), buffer_size=INPUT_BUFFER_SIZE)
+            if 'b' in mode:
+                return stream
+            return io.TextIOWrapper(stream, newline=newline)
+    if 'b' in mode:
+        return open(filename, mode)
+    return open(filename, mode, newline=newline)
+
+
+def uncompressed_basename(filename):
+    """Returns the base name of a file with any compression extension (.gz, .bz2, .xz) removed, e.g. 'go.obo' for
+    'go.obo.gz'.
+
+    :param file_handle filename: A path to a file.
+    :return: The file's base name without a compression extension.
+    :rtype: :py:obj:`str`
+    """
+    basename = os.path.basename(filename)
+    for extension in COMPRESSION_EXTENSIONS:
+        if basename.endswith(extension):
+            return basename[:-len(extension)]
+    return basename
+
+
+@contextlib.contextmanager
+def atomic_output(filename, mode='wb'):
+    """Opens a file for writing under a temporary name in the same directory, and renames it to `filename` once the
+    `with` block completes, so that processes reading the file concurrently never read a partially written one. The
+    temporary file is removed if the block raises an exception.
+
+    :param str filename: A path to the output file. Missing directories are created.
+    :param str mode: Optional - 'wb' to write bytes (default), 'w' to write text.
+    :return: A context manager yielding the writable temporary file object.
+    """
+    directory = os.path.dirname(os.path.realpath(filename))
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temporary_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        try:
+            os.chmod(temporary_filename, 0o666 & ~UMASK)  # Outputs are shared like any other file, not private as temporary files are.
+            output_file = os.fdopen(file_descriptor, mode)
+        except BaseException:
+            os.close(file_descriptor)
+            raise
+        with output_file:
+            yield output_file
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        os.remove(temporary_filename)
+        raise
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Disables the cyclic garbage collector for the duration of a `with` block which creates many long-lived objects,
+    e.g. the nodes and edges of a graph. The collector would repeatedly scan them, although none of them are garbage.
+
+    :return: A context manager.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
 # TODO: move to using JSON not JsonPickle and use sort_keys=True parameter to test outputs between runs
 def json_save(obj, filename):
     """Takes a Python object, converts it into a JSON serializable object (if it is not already), and saves it to a file
@@ -99,7 +294,8 @@ def write_out_gaf(data, filename):
 
 
 def parse_gaf(filename):
-    """Converts a Gene Annotation File (GAF) into a :py:obj:`list` object where every item is a row from the GAF.
+    """Converts a Gene Annotation File (GAF) into a :py:obj:`list` object where every item is a row from the GAF. The GAF
+    may be compressed (see :func:`open_input`).
 
     :param file_handle filename: Specify the location of the GAF.
     :return: A list representing the GAF.
@@ -107,7 +303,7 @@ def parse_gaf(filename):
     """
     comment_line = re.compile('^!')
     gaf_array = list()
-    with open(os.path.realpath(filename)) as gaf_file:
+    with open_input(filename) as gaf_file:
         for line in csv.reader(gaf_file, delimiter='\t'):
             if not re.match(comment_line, str(line[0])):
                 gaf_array.append(line)
@@ -0,0 +1,58 @@
+"""Helpers for building graphs from the test ontologies and comparing them."""
+import os
+
+from gocats import godag, ontologyparser
+from gocats.dag import AbstractEdge
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATABASE_FILE = os.path.join(DATA_DIRECTORY, "go.obo")
+JSON_DATABASE_FILE = os.path.join(DATA_DIRECTORY, "go.json")
+
+
+def parse(database_file=DATABASE_FILE, namespace=None, allowed_relationships=None, parser=ontologyparser.GoParser,
+          **parser_options):
+    """Parses a test ontology into a new graph with a parser class, passing any other keyword arguments to the parser."""
+    graph = godag.GoGraph(namespace, allowed_relationships)
+    with open(database_file, 'r') as database:
+        parser(database, graph, **parser_options).parse()
+    return graph
+
+
+def graph_summary(graph):
+    """Returns the nodes, edges, root nodes and indices of a graph as plain values, which compare equal when two graphs
+    are the same."""
+    nodes = {node.id: (node.name, node.namespace, node.definition, node.obsolete,
+                       frozenset(parent.id for parent in node.parent_node_set),
+                       frozenset(child.id for child in node.child_node_set))
+             for node in graph.node_list}
+    return {
+        'nodes': nodes,
+        'id_index': set(graph.id_index),
+        'edges': {(edge.node_pair_id, edge.relationship_id) for edge in graph.edge_list},
+        'root_nodes': {node.id for node in graph.root_nodes},
+        'relationship_count': dict(graph.relationship_count),
+        'vocab_index': set(graph.vocab_index),
+    }
+
+
+def connect(graph, child_id, parent_id, relationship_id='is_a'):
+    """Adds an edge between two nodes of a graph, as a patch or a parser would, and returns it. For 'is_a' and
+    'part_of', the child is the first node of the edge."""
+    edge = AbstractEdge(child_id, parent_id, relationship_id)
+    edge.relationship = graph.relationship_index[relationship_id]
+    edge.connect_nodes((graph.id_index[child_id], graph.id_index[parent_id]), graph.allowed_relationships)
+    graph.add_edge(edge)
+    return edge
+
+
+def traverse(node, relative_set):
+    """Returns the nodes reachable from a node through its 'parent_node_set' or 'child_node_set', found by a fresh
+    breadth-first search. The node itself is only included if it lies on a cycle."""
+    reached = set()
+    frontier = list(getattr(node, relative_set))
+    while frontier:
+        relative = frontier.pop()
+        if relative not in reached:
+            reached.add(relative)
+            frontier.extend(getattr(relative, relative_set))
+    return reached
@@ -0,0 +1,43 @@
+import pytest
+
+from gocats.subdag import SubGraph
+from tests.graphs import parse
+
+numpy = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("namespace, allowed_relationships", [
+    (None, None),
+    (None, ['is_a', 'part_of']),
+    ('cellular_component', ['is_a', 'part_of', 'has_part']),
+])
+def test_filter_edges_matches_array_backend(namespace, allowed_relationships):
+    graph = parse(namespace=namespace, allowed_relationships=allowed_relationships)
+    array_graph = parse(namespace=namespace, allowed_relationships=allowed_relationships)
+    array_graph.use_array_backend()
+    for keywords in (["organelle"], ["mitochondrion", "membrane"], ["nucleus", "nucleolus"], ["binding"], ["absent"]):
+        filtered_nodes = graph.filter_nodes(keywords)
+        array_filtered_nodes = array_graph.filter_nodes(keywords)
+        edges = [edge.index_key for edge in graph.filter_edges(filtered_nodes)]
+        array_edges = [edge.index_key for edge in array_graph.filter_edges(array_filtered_nodes)]
+        assert edges == array_edges
+    every_edge = [edge.index_key for edge in graph.filter_edges(graph.node_list)]
+    assert every_edge == [edge.index_key for edge in array_graph.filter_edges(array_graph.node_list)]
+    assert every_edge
+
+
+def test_subgraph_filter_edges_matches_edges_by_id():
+    subgraph = SubGraph.from_filtered_graph(parse(), 'mitochondrion', ['mitochondrion', 'mitochondrial', 'organelle'])
+    subgraph_ids = set(subgraph.id_index)
+    expected = sorted(edge.index_key for edge in subgraph.edge_list if edge.child_id in subgraph_ids and edge.parent_id in subgraph_ids)
+    assert [edge.index_key for edge in subgraph.filter_edges(subgraph.node_list)] == expected
+    assert expected
+    array_graph = subgraph.use_array_backend()
+    assert -1 not in array_graph.edge_parents.tolist() + array_graph.edge_children.tolist()
+    assert [edge.index_key for edge in subgraph.filter_edges(subgraph.node_list)] == expected
+    for keywords in (["mitochondrion"], ["membrane"], ["organelle", "organization"]):
+        filtered_nodes = subgraph.filter_nodes(keywords)
+        array_edges = [edge.index_key for edge in subgraph.filter_edges(filtered_nodes)]
+        subgraph._csr_graph = None
+        assert [edge.index_key for edge in subgraph.filter_edges(filtered_nodes)] == array_edges
+        subgraph.use_array_backend()
@@ -0,0 +1,266 @@
+import random
+import pytest
+
+from gocats.godag import GoGraphNode
+from gocats.subdag import SubGraph
+from tests.graphs import parse, connect, traverse
+
+
+def relative_ids(graph):
+    """Returns the IDs of the ancestors and descendants of every node of a graph, keyed by node ID."""
+    return {node.id: ({ancestor.id for ancestor in node.ancestors}, {descendant.id for descendant in node.descendants}) for node in graph.node_list}
+
+
+@pytest.mark.parametrize("descendants_only", [False, True])
+def test_closure_matches_lazy_relatives(descendants_only):
+    expected = relative_ids(parse())
+    graph = parse()
+    closure = graph.compute_closure(descendants_only=descendants_only)
+    assert relative_ids(graph) == expected
+    assert (closure.ancestor_bits is None) == descendants_only
+    assert (graph.closure is None) == descendants_only
+
+
+def assert_reachability(graph):
+    for node in graph.node_list:
+        ancestors = traverse(node, 'parent_node_set')
+        assert [candidate.id for candidate in graph.ancestors_among(node, graph.node_list)] == [candidate.id for candidate in graph.node_list if candidate in ancestors]
+        for candidate in graph.node_list:
+            assert graph.is_ancestor(candidate, node) == (candidate in ancestors)
+
+
+def test_reachability_matches_ancestors():
+    graph = parse()
+    assert_reachability(graph)
+    assert graph.reachability_index is not None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_reachability_is_rebuilt_after_modification(seed):
+    graph = parse()
+    graph.is_ancestor(graph.id_index['GO:0005575'], graph.id_index['GO:0005634'])
+    connect(graph, 'GO:0005575', 'GO:0005634')  # The root under one of its descendants: a cycle.
+    assert graph.reachability_index is None
+    assert_reachability(graph)
+    random.seed(seed)
+    term_ids = sorted(graph.id_index)
+    for _ in range(4):
+        connect(graph, *random.sample(term_ids, 2))
+        assert_reachability(graph)
+    assert graph.is_ancestor(graph.id_index['GO:0005634'], graph.id_index['GO:0005634'])
+
+
+def assert_relatives_match_traversal(graph):
+    for node in graph.node_list:
+        if graph.id_index.get(node.id) is node:
+            assert node.ancestors == traverse(node, 'parent_node_set')
+            assert node.descendants == traverse(node, 'child_node_set')
+
+
+@pytest.mark.parametrize("closure", [False, True])
+def test_relatives_are_invalidated_by_edits(closure):
+    graph = parse()
+    if closure:
+        graph.compute_closure()
+    assert_relatives_match_traversal(graph)  # Every node now holds, or reads from the closure, its sets.
+    edge = connect(graph, 'GO:0005743', 'GO:0005634', 'part_of')
+    assert_relatives_match_traversal(graph)
+    graph.remove_edge(graph.get_edge('GO:0005739', 'GO:0043227', 'is_a'))
+    assert_relatives_match_traversal(graph)
+    graph.remove_edge(edge)
+    assert_relatives_match_traversal(graph)
+    graph.remove_node(graph.id_index['GO:0043226'])
+    assert_relatives_match_traversal(graph)
+    connect(graph, 'GO:0005730', 'GO:0005575')
+    assert_relatives_match_traversal(graph)
+
+
+@pytest.mark.parametrize("closure", [False, True])
+def test_relatives_are_invalidated_around_cycles(closure):
+    graph = parse()
+    if closure:
+        graph.compute_closure()
+    assert_relatives_match_traversal(graph)
+    edge = connect(graph, 'GO:0110165', 'GO:0005743')  # A cycle through mitochondrion and its inner membrane.
+    assert_relatives_match_traversal(graph)
+    graph.remove_edge(edge)
+    assert_relatives_match_traversal(graph)
+
+
+REMOVED_IDS = ['GO:0043227', 'GO:0005634', 'GO:0005730']  # Membrane-bounded organelle, and the nucleus and nucleolus below it.
+
+
+def test_remove_nodes():
+    graph = parse()
+    original_ids = [node.id for node in graph.node_list]
+    removed = [graph.id_index[term_id] for term_id in REMOVED_IDS]
+    graph.remove_nodes(removed)
+    assert [node.id for node in graph.node_list] == [term_id for term_id in original_ids if term_id not in REMOVED_IDS]
+    assert set(graph.id_index) == set(original_ids) - set(REMOVED_IDS)
+    for node in graph.node_list:
+        assert not (node.parent_node_set | node.child_node_set) & set(removed)
+        assert all(edge_node not in removed for edge in node.edges for edge_node in edge.node_pair)
+    assert all(not set(removed) & word_nodes for word_nodes in graph.vocab_index.values())
+    assert 'nucleolus' not in graph.vocab_index
+    assert 'organelle' in graph.vocab_index
+    assert not graph.id_index['GO:0043226'].child_node_set
+    assert {node.id for node in graph.id_index['GO:0005739'].parent_node_set} == {'GO:0005737'}
+    assert_relatives_match_traversal(graph)
+
+
+@pytest.mark.parametrize("read_node_list", [False, True])
+def test_removed_node_is_added_again(read_node_list):
+    graph = parse()
+    original_ids = [node.id for node in graph.node_list]
+    nucleus = graph.id_index['GO:0005634']
+    graph.remove_nodes([graph.id_index[term_id] for term_id in REMOVED_IDS])
+    if read_node_list:
+        graph.node_list
+    graph.add_node(nucleus)
+    if read_node_list:  # The node was dropped from the list, and is appended again.
+        expected_ids = [term_id for term_id in original_ids if term_id not in REMOVED_IDS] + ['GO:0005634']
+    else:  # The node is still at its original position.
+        expected_ids = [term_id for term_id in original_ids if term_id not in REMOVED_IDS or term_id == 'GO:0005634']
+    assert [node.id for node in graph.node_list] == expected_ids
+    assert graph.id_index['GO:0005634'] is nucleus
+    assert nucleus in graph.vocab_index['nucleus']
+    assert not graph.vocab_index.get('nucleolus')
+
+
+def assert_orphans_and_leaves_current(graph):
+    """Asserts that the incrementally updated orphans and leaves of a graph equal the sets rebuilt from its node list."""
+    orphans, leaves = graph.orphans, graph.leaves
+    graph._update_graph()
+    assert (orphans, leaves) == (graph.orphans, graph.leaves)
+
+
+def test_orphans_and_leaves_are_updated_by_edits():
+    graph = parse()
+    orphans, leaves = graph.orphans, graph.leaves
+    assert {node.id for node in leaves} == {'GO:0005730', 'GO:0005743', 'GO:0010821', 'GO:0003677'}
+    assert not orphans
+
+    edge = connect(graph, 'GO:0003677', 'GO:0005743', 'part_of')
+    assert_orphans_and_leaves_current(graph)
+    assert graph.id_index['GO:0005743'] not in graph.leaves
+    graph.remove_edge(edge)
+    assert_orphans_and_leaves_current(graph)
+    graph.remove_edge(graph.get_edge('GO:0043226', 'GO:0110165', 'is_a'))
+    assert_orphans_and_leaves_current(graph)
+    assert {node.id for node in graph.orphans} == {'GO:0043226'}
+    graph.remove_nodes([graph.id_index[term_id] for term_id in REMOVED_IDS])
+    assert_orphans_and_leaves_current(graph)
+    node = GoGraphNode()
+    node.id, node.name, node.namespace, node.definition = 'GO:0005741', 'mitochondrial outer membrane', 'cellular_component', ''
+    graph.add_node(node)
+    assert_orphans_and_leaves_current(graph)
+    assert node in graph.orphans
+    connect(graph, 'GO:0005741', 'GO:0005739', 'part_of')
+    assert_orphans_and_leaves_current(graph)
+    assert node in graph.leaves
+
+    assert (graph.orphans, graph.leaves) != (orphans, leaves)
+    assert {node.id for node in leaves} == {'GO:0005730', 'GO:0005743', 'GO:0010821', 'GO:0003677'}
+    assert not orphans
+
+
+def test_subgraph_orphans_and_leaves_are_current():
+    graph = parse()
+    subgraph = SubGraph.from_filtered_graph(graph, 'mitochondrion', ['mitochondrion', 'mitochondrial'])
+    assert subgraph.node_list
+    assert_orphans_and_leaves_current(subgraph)
+
+
+def search_ids(graph, **phrases):
+    return [node.id for node in graph.search(**phrases)]
+
+
+def test_search_matches_phrases_in_order():
+    graph = parse()
+    assert search_ids(graph, any_of=["mitochondrial inner membrane"]) == ['GO:0005743']
+    assert search_ids(graph, any_of=["inner mitochondrial membrane"]) == []
+    assert search_ids(graph, any_of=["inner", "mitochondrial", "membrane"]) == search_ids(graph, any_of=["membrane", "inner", "mitochondrial"])
+    assert {node.id for node in graph.filter_nodes(["mitochondrial inner membrane"], match_phrases=True)} == {'GO:0005743'}
+    assert not graph.filter_nodes(["inner mitochondrial membrane"], match_phrases=True)
+    assert {node.id for node in graph.filter_nodes(["inner mitochondrial membrane"])} >= {'GO:0005743'}  # Words, in any order.
+
+
+def test_search_all_of_and_none_of():
+    graph = parse()
+    organelles = search_ids(graph, any_of=["organelle"])
+    assert organelles == [node.id for node in graph.node_list if 'organelle' in (node.name + " " + node.definition).split()]
+    assert search_ids(graph, all_of=["organelle", "membrane"]) == [term_id for term_id in organelles if term_id in search_ids(graph, any_of=["membrane"])]
+    assert search_ids(graph, any_of=["organelle"], none_of=["membrane"]) == [term_id for term_id in organelles if term_id not in search_ids(graph, any_of=["membrane"])]
+    assert search_ids(graph, none_of=["organelle"]) == [node.id for node in graph.node_list if node.id not in organelles]
+    assert search_ids(graph, any_of=["nucleus"], all_of=["cell nucleus"]) == []
+
+
+def test_postings_index_is_dropped_when_nodes_change():
+    graph = parse()
+    assert search_ids(graph, any_of=["nucleolus"]) == ['GO:0005730']
+    assert graph.postings_index is not None
+    graph.remove_node(graph.id_index['GO:0005730'])
+    assert graph.postings_index is None
+    assert search_ids(graph, any_of=["nucleolus"]) == []
+    node = type(graph.id_index['GO:0005634'])()
+    node.id, node.name, node.namespace, node.definition = 'GO:0005741', 'mitochondrial outer membrane', 'cellular_component', "The outer lipid bilayer of the mitochondrial envelope."
+    graph.add_node(node)
+    assert graph.postings_index is None
+    assert search_ids(graph, any_of=["mitochondrial outer membrane"]) == ['GO:0005741']
+
+
+def assert_depths_match_search(graph):
+    expected = {node.id: graph.node_depth(node) for node in graph.node_list}
+    depths = graph.compute_depths()
+    assert {node.id: graph.node_depth(node) for node in graph.node_list} == expected
+    assert all(depths.node_depth(node) is not None for node in graph.node_list)
+    return expected
+
+
+def test_depths_match_search():
+    graph = parse()
+    depths = assert_depths_match_search(graph)
+    assert depths['GO:0005575'] == 0 and depths['GO:0005634'] == 4 and depths['GO:0005730'] == 3
+    assert {node.id for node in graph.depths.levels[1]} == {'GO:0110165', 'GO:0006996', 'GO:0010821', 'GO:0005488'}
+
+
+def test_depths_on_cycle():
+    graph = parse()
+    graph.compute_depths()
+    connect(graph, 'GO:0043226', 'GO:0005730')  # Organelle under nucleolus, which is under organelle.
+    assert graph.depths is None
+    depths = assert_depths_match_search(graph)
+    assert depths['GO:0043226'] == 2 and depths['GO:0005730'] == 3
+
+
+def test_depths_below_no_root():
+    graph = parse()
+    root = graph.id_index['GO:0005575']
+    graph.remove_node(root)
+    graph.root_nodes.remove(root)  # Cellular component terms are now below no root node.
+    depths = assert_depths_match_search(graph)
+    assert depths['GO:0110165'] == 1 and depths['GO:0043226'] == 2 and depths['GO:0005634'] == 4
+
+
+@pytest.mark.parametrize("relationships", [['is_a'], ['is_a', 'part_of'], ['is_a', 'part_of', 'has_part', 'regulates']])
+def test_relationship_view_matches_filtered_parse(relationships):
+    graph = parse()
+    view = graph.relationship_view(relationships)
+    filtered_graph = parse(allowed_relationships=relationships)
+    for node in graph.node_list:
+        filtered_node = filtered_graph.id_index[node.id]
+        assert {ancestor.id for ancestor in view.ancestors(node)} == {ancestor.id for ancestor in filtered_node.ancestors}
+        assert {descendant.id for descendant in view.descendants(node)} == {descendant.id for descendant in filtered_node.descendants}
+        for other in graph.node_list:
+            assert view.is_ancestor(other, node) == (filtered_graph.id_index[other.id] in filtered_node.ancestors)
+
+
+def test_relationship_views_are_dropped_when_graph_is_modified():
+    graph = parse()
+    view = graph.relationship_view(['is_a', 'part_of'])
+    assert graph.relationship_view(['part_of', 'is_a']) is view
+    connect(graph, 'GO:0005743', 'GO:0005634', 'part_of')
+    new_view = graph.relationship_view(['is_a', 'part_of'])
+    assert new_view is not view
+    assert graph.id_index['GO:0005634'] in new_view.ancestors(graph.id_index['GO:0005743'])
+    assert graph.id_index['GO:0005634'] not in graph.relationship_view(['is_a']).ancestors(graph.id_index['GO:0005743'])
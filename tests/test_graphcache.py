@@ -0,0 +1,23 @@
+from gocats import godag, graphcache
+
+from tests.graphs import DATABASE_FILE, parse, graph_summary
+
+
+def test_cache_round_trip(tmp_path):
+    for namespace, allowed_relationships in ((None, None), ('cellular_component', ['is_a', 'part_of', 'has_part'])):
+        graph = parse(namespace=namespace, allowed_relationships=allowed_relationships)
+        cache_file = graphcache.cache_filename(DATABASE_FILE, graph, str(tmp_path))
+        graphcache.save_graph(graph, cache_file)
+        cached_graph = godag.GoGraph(namespace, allowed_relationships)
+        assert graphcache.load_graph(cache_file, cached_graph)
+        assert graph_summary(cached_graph) == graph_summary(graph)
+
+
+def test_cache_of_other_settings_is_not_loaded(tmp_path):
+    graph = parse(namespace='cellular_component')
+    cache_file = graphcache.cache_filename(DATABASE_FILE, graph, str(tmp_path))
+    graphcache.save_graph(graph, cache_file)
+    other_graph = godag.GoGraph('biological_process')
+    assert not graphcache.load_graph(cache_file, other_graph)
+    assert not other_graph.node_list
+    assert not graphcache.load_graph(str(tmp_path / "missing.gocats"), godag.GoGraph())
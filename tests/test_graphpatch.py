@@ -0,0 +1,31 @@
+import os
+import pytest
+
+from gocats import graphpatch
+
+from tests.graphs import DATA_DIRECTORY, DATABASE_FILE, parse, graph_summary
+
+NEW_RELEASE = os.path.join(DATA_DIRECTORY, "go_release2.obo")
+
+
+@pytest.mark.parametrize("namespace, allowed_relationships", [
+    (None, None),
+    ('cellular_component', ['is_a', 'part_of', 'has_part']),
+])
+def test_patched_graph_matches_new_release(namespace, allowed_relationships):
+    graph = parse(namespace=namespace, allowed_relationships=allowed_relationships)
+    nucleus = graph.id_index['GO:0005634']
+    with open(NEW_RELEASE, 'r') as database:
+        diff = graphpatch.patch_graph(graph, database)
+    assert 'GO:0005741' in diff.added
+    assert 'GO:0005730' in diff.updated
+    assert ('GO:0010821' in diff.removed) == (namespace is None)
+    assert graph_summary(graph) == graph_summary(parse(NEW_RELEASE, namespace, allowed_relationships))
+    assert graph.id_index['GO:0005634'] is nucleus
+
+
+def test_patch_to_the_same_release_changes_nothing():
+    graph = parse()
+    with open(DATABASE_FILE, 'r') as database:
+        diff = graphpatch.patch_graph(graph, database)
+    assert not diff.added and not diff.removed and not diff.updated
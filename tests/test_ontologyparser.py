@@ -0,0 +1,169 @@
+import io
+import os
+import shutil
+
+import pytest
+
+from gocats import ontologyparser
+from tests.graphs import DATABASE_FILE, JSON_DATABASE_FILE, parse, graph_summary
+
+
+@pytest.mark.parametrize("namespace, allowed_relationships", [
+    (None, None),
+    ('cellular_component', ['is_a', 'part_of', 'has_part']),
+    ('biological_process', ['is_a']),
+])
+def test_engines_build_the_same_graph(namespace, allowed_relationships):
+    expected = graph_summary(parse(namespace=namespace, allowed_relationships=allowed_relationships, engine='regex'))
+    assert expected['nodes']
+    for engine in ('dispatch', 'mmap'):
+        graph = parse(namespace=namespace, allowed_relationships=allowed_relationships, engine=engine)
+        assert graph_summary(graph) == expected
+
+
+def test_parallel_parse_builds_the_same_graph():
+    expected = graph_summary(parse(engine='mmap', jobs=1))
+    assert graph_summary(parse(engine='mmap', jobs=2)) == expected
+    graph = parse(namespace='cellular_component', allowed_relationships=['is_a', 'part_of'], engine='mmap', jobs=2)
+    assert graph_summary(graph) == graph_summary(parse(namespace='cellular_component', allowed_relationships=['is_a', 'part_of'], engine='mmap'))
+
+
+def relationship_summary(graph):
+    return {relationship_id: (relationship.name, relationship.inverse_relationship_id)
+            for relationship_id, relationship in graph.relationship_index.items()}
+
+
+@pytest.mark.parametrize("namespace, allowed_relationships", [
+    (None, None),
+    ('cellular_component', ['is_a', 'part_of', 'has_part']),
+    ('biological_process', ['is_a']),
+])
+def test_json_parser_builds_the_same_graph(namespace, allowed_relationships):
+    expected = parse(namespace=namespace, allowed_relationships=allowed_relationships)
+    graph = parse(JSON_DATABASE_FILE, namespace, allowed_relationships, parser=ontologyparser.GoJsonParser)
+    assert graph_summary(graph) == graph_summary(expected)
+    assert relationship_summary(graph) == relationship_summary(expected)
+
+
+NEW_TERM_STANZA = """
+[Term]
+id: GO:0005741
+name: mitochondrial outer membrane
+namespace: cellular_component
+def: "The outer, i.e. cytoplasm-facing, lipid bilayer of the mitochondrial envelope." [GOC:ai]
+relationship: part_of GO:0005739 ! mitochondrion
+
+"""
+
+
+def copy_database(tmp_path):
+    database_path = str(tmp_path / "go.obo")
+    shutil.copyfile(DATABASE_FILE, database_path)
+    return database_path
+
+
+def node_record(graph, node):
+    """Returns the record fields of a parsed node, with its outgoing edges as a set."""
+    edges = {(edge.node_pair_id[1], edge.relationship_id) for edge in graph.edge_list if edge.node_pair_id[0] == node.id}
+    return node.id, node.name, node.namespace, node.definition, edges
+
+
+def record_fields(record):
+    return record.id, record.name, record.namespace, record.definition, set(record.edges)
+
+
+def test_stanza_index_lookups_match_parse(tmp_path):
+    graph = parse()
+    database_path = copy_database(tmp_path)
+    with ontologyparser.StanzaIndex(database_path) as index:
+        assert len(index) == len(graph.node_list) + 2
+        for node in graph.node_list:
+            assert node.id in index
+            assert record_fields(index.lookup(node.id)) == node_record(graph, node)
+        assert index.lookup('GO:0005635') == index.lookup('GO:0005634')
+        assert index.lookup('GO:0000004').obsolete
+        assert index.lookup('GO:9999999') is None
+        assert index.lookup('is_a') is None
+        assert 'GO:9999999' not in index
+
+        records = index.lookup_many([node.id for node in graph.node_list] + ['GO:0005635', 'GO:9999999'])
+        assert set(records) == set(graph.id_index) | {'GO:0005635'}
+        assert records['GO:0005635'] == records['GO:0005634']
+        for node in graph.node_list:
+            assert records[node.id] == index.lookup(node.id)
+
+    with open(database_path, 'rb') as database:
+        data = database.read()
+    with ontologyparser.StanzaIndex(database_path) as index:
+        for node in graph.node_list:
+            offset = index.offset(node.id)
+            assert data.startswith(b'[Term]', offset)
+            assert data[offset:].split(b'\n')[1] == ('id: ' + node.id).encode()
+        assert index.offset('GO:0005635') == index.offset('GO:0005634')
+        assert index.offset('GO:9999999') is None
+
+
+def test_stanza_index_is_rebuilt_when_database_changes(tmp_path):
+    database_path = copy_database(tmp_path)
+    index_path = str(tmp_path / "go.index")
+    assert not ontologyparser.stanza_index_current(database_path, index_path)
+    assert ontologyparser.build_stanza_index(database_path, index_path) == index_path
+    assert ontologyparser.stanza_index_current(database_path, index_path)
+    with ontologyparser.StanzaIndex(database_path, index_path) as index:
+        entry_count = len(index)
+        assert 'GO:0005741' not in index
+
+    with open(database_path, 'a') as database:
+        database.write(NEW_TERM_STANZA)
+    assert not ontologyparser.stanza_index_current(database_path, index_path)
+    with ontologyparser.StanzaIndex(database_path, index_path) as index:
+        assert len(index) == entry_count + 1
+        record = index.lookup('GO:0005741')
+        assert (record.name, record.edges) == ('mitochondrial outer membrane', [('GO:0005739', 'part_of')])
+        assert index.lookup('GO:0005634').name == 'nucleus'
+    assert ontologyparser.stanza_index_current(database_path, index_path)
+
+    database_stat = os.stat(database_path)
+    os.utime(database_path, ns=(database_stat.st_atime_ns, database_stat.st_mtime_ns + 10**9))
+    assert not ontologyparser.stanza_index_current(database_path, index_path)
+    with ontologyparser.StanzaIndex(database_path, index_path) as index:
+        assert len(index) == entry_count + 1
+    assert ontologyparser.stanza_index_current(database_path, index_path)
+
+
+def test_stanza_index_defaults_to_sidecar_file(tmp_path):
+    database_path = copy_database(tmp_path)
+    with ontologyparser.StanzaIndex(database_path) as index:
+        assert index.index_path == os.path.realpath(database_path) + ontologyparser.INDEX_EXTENSION
+    assert os.path.exists(database_path + ontologyparser.INDEX_EXTENSION)
+
+
+def open_database(how):
+    """Opens the test ontology as a memory-mappable text or binary file, or as an in-memory file read line by line."""
+    if how == 'bytes':
+        with open(DATABASE_FILE, 'rb') as database:
+            return io.BytesIO(database.read())
+    return open(DATABASE_FILE, 'r' if how == 'text' else 'rb')
+
+
+@pytest.mark.parametrize("how", ['text', 'binary', 'bytes'])
+def test_records_match_parse(how):
+    graph = parse()
+    with open_database(how) as database:
+        records = list(ontologyparser.iter_obo_records(database))
+    term_records = [record for record in records if type(record) is ontologyparser.TermRecord]
+    typedef_records = [record for record in records if type(record) is ontologyparser.TypedefRecord]
+
+    assert [record.id for record in term_records if not record.obsolete] == [node.id for node in graph.node_list]
+    for record in term_records:
+        if record.obsolete:
+            assert record.id not in graph.id_index
+        else:
+            assert record_fields(record) == node_record(graph, graph.id_index[record.id])
+            assert not graph.id_index[record.id].obsolete
+    assert [record.id for record in term_records if record.obsolete] == ['GO:0000004']
+    assert {record.id: (record.name, record.inverse_of) for record in typedef_records} == \
+        {relationship_id: relationship for relationship_id, relationship in relationship_summary(graph).items() if relationship_id != 'is_a'}
+
+    with open_database(how) as database:
+        assert list(ontologyparser.iter_term_records(database)) == term_records
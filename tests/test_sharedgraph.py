@@ -0,0 +1,56 @@
+import multiprocessing
+import pytest
+
+from gocats import sharedgraph
+
+from tests.graphs import parse
+
+pytestmark = pytest.mark.skipif(sharedgraph.shared_memory is None, reason="requires multiprocessing.shared_memory")
+
+
+def read_terms(arguments):
+    """Attaches to a shared graph in a worker process and reads the position, parents and ancestors of some terms."""
+    name, term_ids = arguments
+    with sharedgraph.attach_graph(name) as shared:
+        terms = dict()
+        for term_id in term_ids:
+            position = shared.position(term_id)
+            terms[term_id] = (shared.term_id(position), shared.term_name(position),
+                              {shared.term_id(parent) for parent in shared.parents(position)},
+                              {shared.term_id(ancestor) for ancestor in shared.ancestors(position)})
+        return terms
+
+
+def expected_terms(graph):
+    return {node.id: (node.id, node.name, {parent.id for parent in node.parent_node_set}, {ancestor.id for ancestor in node.ancestors})
+            for node in graph.node_list}
+
+
+def test_shared_graph_matches_graph():
+    graph = parse()
+    with sharedgraph.export_graph(graph) as shared:
+        assert len(shared) == len(graph.node_list)
+        assert read_terms((shared.name, list(graph.id_index))) == expected_terms(graph)
+        for node in graph.node_list:
+            position = shared.position(node.id)
+            assert {shared.term_id(child) for child in shared.children(position)} == {child.id for child in node.child_node_set}
+            assert {shared.term_id(descendant) for descendant in shared.descendants(position)} == {descendant.id for descendant in node.descendants}
+        assert shared.position('GO:9999999') is None
+        assert {shared.term_id(position) for position in shared.root_positions} == {node.id for node in graph.root_nodes}
+
+
+def test_spawned_workers_attach():
+    graph = parse()
+    term_ids = sorted(graph.id_index)
+    with sharedgraph.export_graph(graph) as shared:
+        with multiprocessing.get_context('spawn').Pool(2) as pool:
+            results = pool.map(read_terms, [(shared.name, term_ids[start::3]) for start in range(3)])
+        name = shared.name
+        with sharedgraph.attach_graph(name) as attached:  # The workers did not unlink the block when they exited.
+            assert len(attached) == len(graph.node_list)
+    terms = dict()
+    for result in results:
+        terms.update(result)
+    assert terms == expected_terms(graph)
+    with pytest.raises(FileNotFoundError):
+        sharedgraph.attach_graph(name)  # The owner unlinked the block when it was closed.
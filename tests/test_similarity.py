@@ -0,0 +1,176 @@
+import gzip
+import itertools
+import math
+import os
+import pytest
+
+from tests.graphs import DATA_DIRECTORY, parse
+
+numpy = pytest.importorskip("numpy")
+from gocats import similarity  # noqa: E402
+
+ANNOTATION_COUNTS = {'GO:0005634': 3, 'GO:0005730': 1, 'GO:0005739': 2, 'GO:0005737': 1, 'GO:0007005': 2, 'GO:0006996': 1,
+                     'GO:0003677': 1, 'GO:0005488': 1}
+GAF_FILE = os.path.join(DATA_DIRECTORY, "annotations.gaf")
+GENE_TERMS = {'gene1': ['GO:0005634', 'GO:0007005'], 'gene2': ['GO:0005730', 'GO:0005743'], 'gene3': ['GO:0003677'],
+              'gene4': ['GO:0010821', 'GO:0005739', 'GO:0003677'], 'gene5': ['GO:9999999']}
+
+
+def brute_force_information_content(graph, annotation_counts):
+    """Propagates annotation counts to ancestors through node.descendants, and computes information content from them."""
+    counts = {node.id: sum(annotation_counts.get(relative.id, 0) for relative in node.descendants | {node}) for node in graph.node_list}
+    information_content = dict()
+    for node in graph.node_list:
+        root_count = max(counts[relative.id] for relative in node.ancestors | {node})
+        information_content[node.id] = math.log(root_count / counts[node.id]) if counts[node.id] else math.inf
+    return counts, information_content
+
+
+def brute_force_mica_content(graph, counts, information_content, term_id1, term_id2):
+    """Returns the information content of the most informative annotated common ancestor of two terms, or None."""
+    node1, node2 = graph.id_index[term_id1], graph.id_index[term_id2]
+    common = [node.id for node in (node1.ancestors | {node1}) & (node2.ancestors | {node2}) if counts[node.id]]
+    return max(information_content[term_id] for term_id in common) if common else None
+
+
+def brute_force_similarity(graph, counts, information_content, term_id1, term_id2, measure):
+    mica_content = brute_force_mica_content(graph, counts, information_content, term_id1, term_id2)
+    if mica_content is None:
+        return 0.0
+    content_sum = information_content[term_id1] + information_content[term_id2]
+    if measure == 'resnik':
+        return mica_content
+    if measure == 'lin':
+        if content_sum > 0:
+            return 2 * mica_content / content_sum
+        return 1.0 if term_id1 == term_id2 else 0.0
+    return 1 / (1 + content_sum - 2 * mica_content)
+
+
+@pytest.fixture(scope='module')
+def graph():
+    graph = parse()
+    graph.compute_closure()
+    return graph
+
+
+@pytest.fixture(scope='module')
+def semantic_similarity(graph):
+    return similarity.SemanticSimilarity(graph, ANNOTATION_COUNTS)
+
+
+def test_information_content(graph, semantic_similarity):
+    counts, information_content = brute_force_information_content(graph, ANNOTATION_COUNTS)
+    for node in graph.node_list:
+        position = semantic_similarity.term_position[node.id]
+        assert semantic_similarity.annotation_counts[position] == counts[node.id]
+        assert semantic_similarity.information_content[position] == pytest.approx(information_content[node.id])
+
+
+def test_most_informative_common_ancestors(graph, semantic_similarity):
+    counts, information_content = brute_force_information_content(graph, ANNOTATION_COUNTS)
+    term_pairs = list(itertools.product(sorted(graph.id_index), repeat=2))
+    for (term_id1, term_id2), mica in zip(term_pairs, semantic_similarity.most_informative_common_ancestors(term_pairs)):
+        expected = brute_force_mica_content(graph, counts, information_content, term_id1, term_id2)
+        if expected is None:
+            assert mica is None
+        else:
+            assert mica in graph.id_index[term_id1].ancestors | {graph.id_index[term_id1]}
+            assert mica in graph.id_index[term_id2].ancestors | {graph.id_index[term_id2]}
+            assert information_content[mica.id] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("measure", similarity.MEASURES)
+def test_term_similarity(graph, semantic_similarity, measure):
+    counts, information_content = brute_force_information_content(graph, ANNOTATION_COUNTS)
+    term_ids = sorted(graph.id_index)
+    term_pairs = list(itertools.product(term_ids, repeat=2))
+    expected = [brute_force_similarity(graph, counts, information_content, term_id1, term_id2, measure) for term_id1, term_id2 in term_pairs]
+    assert semantic_similarity.term_similarity(term_pairs, measure).tolist() == pytest.approx(expected)
+    matrix = semantic_similarity.term_similarity_matrix(term_ids, measure=measure)
+    assert matrix.ravel().tolist() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("measure", similarity.MEASURES)
+def test_terms_of_different_namespaces_are_not_similar(semantic_similarity, measure):
+    term_pairs = [('GO:0005575', 'GO:0008150'), ('GO:0005634', 'GO:0007005'), ('GO:0003677', 'GO:0005739')]
+    assert semantic_similarity.most_informative_common_ancestors(term_pairs) == [None, None, None]
+    assert semantic_similarity.term_similarity(term_pairs, measure).tolist() == [0.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("measure", similarity.MEASURES)
+@pytest.mark.parametrize("method", similarity.METHODS)
+def test_gene_similarity_matrix(graph, semantic_similarity, measure, method):
+    counts, information_content = brute_force_information_content(graph, ANNOTATION_COUNTS)
+    genes, matrix = semantic_similarity.gene_similarity_matrix(GENE_TERMS, measure, method)
+    assert genes == list(GENE_TERMS)
+    gene_terms = {gene: [term_id for term_id in term_ids if term_id in graph.id_index] for gene, term_ids in GENE_TERMS.items()}
+    for (row, gene1), (column, gene2) in itertools.product(enumerate(genes), repeat=2):
+        terms1, terms2 = gene_terms[gene1], gene_terms[gene2]
+        if not terms1 or not terms2:
+            assert matrix[row, column] == 0
+            continue
+        scores = [[brute_force_similarity(graph, counts, information_content, term_id1, term_id2, measure) for term_id2 in terms2] for term_id1 in terms1]
+        if method == 'max':
+            expected = max(max(term_scores) for term_scores in scores)
+        else:
+            expected = (sum(max(term_scores) for term_scores in scores) / len(terms1) +
+                        sum(max(column_scores) for column_scores in zip(*scores)) / len(terms2)) / 2
+        assert matrix[row, column] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("measure", similarity.MEASURES)
+def test_genes_of_different_namespaces_are_not_similar(semantic_similarity, measure):
+    genes, matrix = semantic_similarity.gene_similarity_matrix({'gene1': ['GO:0005634'], 'gene2': ['GO:0007005']}, measure, 'max')
+    assert matrix[0, 1] == matrix[1, 0] == 0.0
+
+
+def test_terms_without_information_content_are_alike_only_to_themselves(semantic_similarity):
+    term_pairs = [('GO:0005575', 'GO:0005575'), ('GO:0005575', 'GO:0043227')]  # The root, and a term with all of its annotations.
+    assert semantic_similarity.term_similarity(term_pairs, 'resnik').tolist() == [0.0, 0.0]
+    assert semantic_similarity.term_similarity(term_pairs, 'lin').tolist() == [1.0, 0.0]
+
+
+def brute_force_gene_counts(graph, gaf_file):
+    """Counts the genes annotated to each term or its descendants, from the lines of a GAF without a NOT qualifier."""
+    gene_terms = dict()
+    with open(gaf_file) as gaf:
+        for line in gaf:
+            columns = line.rstrip('\n').split('\t')
+            if line.startswith('!') or 'NOT' in columns[3].split('|') or columns[4] not in graph.id_index:
+                continue
+            gene_terms.setdefault(columns[1], set()).add(graph.id_index[columns[4]])
+    return {node.id: sum(1 for terms in gene_terms.values() if terms & (node.descendants | {node})) for node in graph.node_list}
+
+
+@pytest.mark.parametrize("memory_budget", [2**27, 48])
+def test_gaf_information_content(graph, memory_budget):
+    information = similarity.gaf_information_content(graph, GAF_FILE, memory_budget=memory_budget)
+    counts = dict(zip(information.term_ids, information.annotation_counts.tolist()))
+    expected_counts = brute_force_gene_counts(graph, GAF_FILE)
+    assert counts == expected_counts
+    assert counts['GO:0005575'] == 4  # Each gene is counted once per term, whichever of its terms are below it.
+    assert counts['GO:0005634'] == 1  # The NOT annotation is skipped.
+    propagated = similarity.SemanticSimilarity(graph, counts, propagated=True)
+    for term_id, content in zip(information.term_ids, information.information_content.tolist()):
+        node = graph.id_index[term_id]
+        root_count = max(counts[relative.id] for relative in node.ancestors | {node})
+        assert content == pytest.approx(math.log(root_count / counts[term_id]) if counts[term_id] else math.inf)
+        assert propagated.information_content[propagated.term_position[term_id]] == pytest.approx(content)
+
+def test_gaf_information_content_of_compressed_gaf(graph, tmp_path):
+    compressed_file = tmp_path / "annotations.gaf.gz"
+    with open(GAF_FILE, 'rb') as gaf:
+        compressed_file.write_bytes(gzip.compress(gaf.read()))
+    information = similarity.gaf_information_content(graph, str(compressed_file))
+    assert information.annotation_counts.tolist() == similarity.gaf_information_content(graph, GAF_FILE).annotation_counts.tolist()
+
+
+def test_information_content_round_trip(graph, tmp_path):
+    information = similarity.gaf_information_content(graph, GAF_FILE)
+    filename = str(tmp_path / "information_content.npz")
+    similarity.save_information_content(information, filename)
+    loaded = similarity.load_information_content(filename)
+    assert loaded.term_ids == information.term_ids
+    assert loaded.annotation_counts.tolist() == information.annotation_counts.tolist()
+    assert loaded.information_content.tolist() == information.information_content.tolist()
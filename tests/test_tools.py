@@ -0,0 +1,93 @@
+import gzip
+import os
+import stat
+import threading
+import time
+import pytest
+
+from gocats import tools
+
+
+def corrupt_gzip(path, size):
+    """Writes `size` random bytes gzip compressed, with the CRC of the data in the gzip trailer corrupted."""
+    data = bytearray(gzip.compress(os.urandom(size)))
+    data[-8] ^= 0xff
+    path.write_bytes(bytes(data))
+    return str(path)
+
+
+def test_open_input_decompresses(tmp_path):
+    path = tmp_path / "terms.txt.gz"
+    path.write_bytes(gzip.compress(b"GO:0005634\nGO:0005730\n"))
+    with tools.open_input(str(path)) as input_file:
+        assert input_file.read() == "GO:0005634\nGO:0005730\n"
+
+
+def test_corrupt_input_raises(tmp_path):
+    path = corrupt_gzip(tmp_path / "corrupt.gz", 1000)
+    with tools.open_input(path, 'rb') as input_file:
+        with pytest.raises(OSError):
+            input_file.read()
+
+
+def test_corrupt_input_closed_early(tmp_path):
+    # The error is raised by the decompressor once every prefetch slot is full and the consumer has stopped reading.
+    path = corrupt_gzip(tmp_path / "corrupt.gz", int(5.5 * tools.INPUT_BUFFER_SIZE))
+    input_file = tools.open_input(path, 'rb')
+    input_file.read(10)
+    time.sleep(0.5)
+    closer = threading.Thread(target=input_file.close, daemon=True)
+    closer.start()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+
+
+def test_atomic_output_replaces_file(tmp_path):
+    path = tmp_path / "cache" / "graph.bin"
+    with tools.atomic_output(str(path)) as output_file:
+        output_file.write(b"first")
+    with tools.atomic_output(str(path)) as output_file:
+        output_file.write(b"second")
+        assert path.read_bytes() == b"first"
+    assert path.read_bytes() == b"second"
+    assert os.listdir(str(tmp_path / "cache")) == ["graph.bin"]
+
+
+def test_atomic_output_keeps_file_on_error(tmp_path):
+    path = tmp_path / "graph.bin"
+    path.write_bytes(b"first")
+    with pytest.raises(ValueError):
+        with tools.atomic_output(str(path)) as output_file:
+            output_file.write(b"partial")
+            raise ValueError()
+    assert path.read_bytes() == b"first"
+    assert os.listdir(str(tmp_path)) == ["graph.bin"]
+
+
+def test_atomic_output_permissions(tmp_path):
+    path = tmp_path / "graph.bin"
+    with tools.atomic_output(str(path)) as output_file:
+        output_file.write(b"first")
+    assert stat.S_IMODE(os.stat(str(path)).st_mode) == 0o666 & ~tools.UMASK
+    assert tools.UMASK == os.umask(tools.UMASK)
+
+
+def test_atomic_output_closes_file_when_chmod_fails(tmp_path, monkeypatch):
+    temporary_files = []
+    mkstemp = tools.tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        temporary_files.append(mkstemp(*args, **kwargs))
+        return temporary_files[-1]
+
+    def failing_chmod(*args, **kwargs):
+        raise PermissionError()
+
+    monkeypatch.setattr(tools.tempfile, "mkstemp", recording_mkstemp)
+    monkeypatch.setattr(tools.os, "chmod", failing_chmod)
+    with pytest.raises(PermissionError):
+        with tools.atomic_output(str(tmp_path / "graph.bin")):
+            pass
+    with pytest.raises(OSError):  # The temporary file's descriptor was closed.
+        os.fstat(temporary_files[0][0])
+    assert os.listdir(str(tmp_path)) == []